@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, HealthLog, AnomalyResult, MedicalFacility, Ambulance
+from .models import User, HealthLog, AnomalyResult, MedicalFacility, Ambulance, UserBaseline, RiskRollup
 
 @admin.register(MedicalFacility)
 class MedicalFacilityAdmin(admin.ModelAdmin):
@@ -20,5 +20,15 @@ class AmbulanceAdmin(admin.ModelAdmin):
 
 @admin.register(AnomalyResult)
 class AnomalyResultAdmin(admin.ModelAdmin):
-    list_display = ('domain', 'risk_score', 'is_emergency')
-    readonly_fields = ('risk_score', 'domain', 'signal_explanation')
\ No newline at end of file
+    list_display = ('domain', 'risk_score', 'text_anomaly_score', 'is_emergency')
+    readonly_fields = ('risk_score', 'text_anomaly_score', 'domain', 'signal_explanation')
+
+@admin.register(UserBaseline)
+class UserBaselineAdmin(admin.ModelAdmin):
+    list_display = ('user', 'log_count', 'updated_at')
+    readonly_fields = ('stats', 'log_count', 'last_log', 'updated_at')
+
+@admin.register(RiskRollup)
+class RiskRollupAdmin(admin.ModelAdmin):
+    list_display = ('granularity', 'bucket', 'domain', 'region', 'count', 'mean_risk', 'emergency_count')
+    list_filter = ('granularity', 'domain', 'region')
@@ -0,0 +1,267 @@
+import atexit
+import math
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from django.db import close_old_connections, connection, transaction
+
+from .baselines import update_baselines
+from .rollups import add_results
+from .models import User, HealthLog, AnomalyResult
+from src.hea_health_signals.logger import logging
+from src.hea_health_signals.utils.metrics import METRICS, Histogram
+
+WRITE_BEHIND_RECORDS = METRICS.counter(
+    'hea_write_behind_records_total', 'Analysis records by write-behind outcome.', ('outcome',)
+)
+WRITE_BEHIND_FLUSH_SECONDS = METRICS.histogram(
+    'hea_write_behind_flush_seconds', 'Time to write one batch of analyses (one transaction).'
+)
+
+
+REGION_MAX_LENGTH = HealthLog._meta.get_field('region').max_length
+
+
+def as_float(value):
+    number = float(value)
+    # NaN/inf pass float() but are no reading (and int(inf) raises OverflowError)
+    if not math.isfinite(number):
+        raise ValueError(f"{value!r} is not a finite number")
+    return number
+
+
+def as_int(value):
+    return int(as_float(value))
+
+
+NUMERIC_FIELDS = {
+    'bmi_current': as_float, 'health_current': as_int, 'depression_current': as_int, 'typing_speed_wpm': as_int,
+}
+
+
+def clean_log_fields(data):
+    """
+    Copy of an analyze payload with the fields build_log stores cast to
+    their column types (blank -> None); TypeError/ValueError for a value
+    the HealthLog columns cannot hold.
+    """
+    data = dict(data)
+    for field, cast in NUMERIC_FIELDS.items():
+        if data.get(field) not in (None, ''):
+            data[field] = cast(data[field])
+        else:
+            data[field] = None
+    raw_text = data.get('raw_text')
+    if raw_text is not None and not isinstance(raw_text, str):
+        raise ValueError("raw_text must be a string")
+    region = data.get('region')
+    if region is not None and not (isinstance(region, str) and len(region) <= REGION_MAX_LENGTH):
+        raise ValueError(f"region must be a string of at most {REGION_MAX_LENGTH} characters")
+    return data
+
+
+def build_log(user_id, data):
+    """Unsaved HealthLog for an analyze payload (health/depression_current map to the log's signals)."""
+    return HealthLog(
+        user_id=user_id,
+        bmi_current=data.get('bmi_current'),
+        health_perception=data.get('health_current'),
+        depression_index=data.get('depression_current'),
+        raw_text=data.get('raw_text') or '',
+        typing_speed_wpm=data.get('typing_speed_wpm'),
+        region=data.get('region') or '',
+    )
+
+
+def build_result(log, analysis):
+    """Unsaved AnomalyResult for a saved log and its predict() result."""
+    risky = analysis['is_risky']
+    return AnomalyResult(
+        log=log,
+        risk_score=analysis['risk_score'],
+        domain='METABOLIC' if risky else 'NONE',
+        signal_explanation=(
+            f"Metabolic risk score {analysis['risk_score']:.2f} "
+            f"{'is at or above' if risky else 'is below'} the threshold of {analysis['threshold_used']:.2f}."
+        ),
+        ai_followup_question=analysis.get('follow_up') or '',
+    )
+
+
+def parse_public_id(value):
+    """UUID for a public_id string, or None when it is not one."""
+    try:
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def write_analyses(records):
+    """
+    Persists (public_id, payload, analysis) records in one transaction:
+    users are resolved in one query, then logs and results are inserted
+    with bulk_create and the users' baselines updated (bulk_create sends
+    no post_save) along with the risk rollups. Returns (written, unknown,
+    invalid) counts; records whose public_id matches no user, or whose
+    payload has a value a HealthLog column cannot hold, are skipped so
+    they never fail the rest of the batch.
+    """
+    valid = []
+    for public_id, data, analysis in records:
+        try:
+            valid.append((parse_public_id(public_id), clean_log_fields(data), analysis))
+        except (TypeError, ValueError) as e:
+            logging.warning(f"Write-behind analysis for {public_id} dropped: {e}")
+    invalid = len(records) - len(valid)
+
+    users = dict(User.objects.filter(public_id__in={p for p, _, _ in valid if p}).values_list('public_id', 'pk'))
+    known = [(users[public_id], data, analysis) for public_id, data, analysis in valid if public_id in users]
+    if not known:
+        return 0, len(valid), invalid
+
+    with transaction.atomic():
+        # sqlite 3.35+ and PostgreSQL return the new primary keys from bulk_create
+        logs = HealthLog.objects.bulk_create([build_log(user_id, data) for user_id, data, _ in known])
+        results = AnomalyResult.objects.bulk_create([build_result(log, analysis) for log, (_, _, analysis) in zip(logs, known)])
+        update_baselines(logs)
+        add_results(zip(logs, results))
+    return len(logs), len(valid) - len(logs), invalid
+
+
+@dataclass
+class AnalysisWriterConfig:
+    max_batch_size: int = 500
+    flush_interval_ms: float = 1000.0
+    max_queue_size: int = 10000
+    # How long submit() waits for room in a full queue before dropping the record
+    put_timeout_ms: float = 50.0
+
+
+class AnalysisWriter:
+    """
+    Write-behind persistence of analyses.
+    Views enqueue (public_id, payload, analysis) records and return at
+    once; one worker thread writes them with write_analyses as soon as
+    max_batch_size records are waiting or the oldest has waited
+    flush_interval_ms. The queue is bounded: submit() blocks for at most
+    put_timeout_ms when it is full and then drops the record (counted),
+    so a slow database sheds writes instead of stalling requests.
+    close() (also registered with atexit) flushes what is still queued.
+    """
+    def __init__(self, config=None):
+        self.config = config or AnalysisWriterConfig()
+        self._queue = queue.Queue(maxsize=self.config.max_queue_size)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stopping = False
+
+        self.batch_size = Histogram([1, 5, 10, 25, 50, 100, 250, 500, 1000])
+        self.flush_latency_seconds = Histogram([0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0])
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopping = False
+                self._worker = threading.Thread(target=self._run, name="analysis-writer", daemon=True)
+                self._worker.start()
+
+    def submit(self, public_id, data, analysis, timeout_ms=None):
+        """
+        Queues one analysis for persistence; False when it was dropped
+        because the queue stayed full. timeout_ms=0 never blocks (for the
+        event loop), None waits up to put_timeout_ms.
+        """
+        self._ensure_worker()
+        timeout_ms = self.config.put_timeout_ms if timeout_ms is None else timeout_ms
+        try:
+            self._queue.put((public_id, data, analysis, time.perf_counter()), timeout=timeout_ms / 1000.0)
+        except queue.Full:
+            WRITE_BEHIND_RECORDS.inc(outcome='dropped_full')
+            return False
+        WRITE_BEHIND_RECORDS.inc(outcome='queued')
+        return True
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first[3] + self.config.flush_interval_ms / 1000.0
+        while len(batch) < self.config.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopping = True
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        try:
+            while True:
+                batch = self._collect()
+                if batch is None:
+                    return
+                self._flush(batch)
+                if self._stopping:
+                    return
+        finally:
+            connection.close()
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        self.batch_size.observe(len(batch))
+        try:
+            close_old_connections()
+            with WRITE_BEHIND_FLUSH_SECONDS.labels().time():
+                written, unknown, invalid = write_analyses([(public_id, data, analysis) for public_id, data, analysis, _ in batch])
+        except Exception as e:
+            logging.error(f"Write-behind batch of {len(batch)} analyses failed: {e}")
+            WRITE_BEHIND_RECORDS.inc(len(batch), outcome='dropped_error')
+            return
+        WRITE_BEHIND_RECORDS.inc(written, outcome='written')
+        if unknown:
+            WRITE_BEHIND_RECORDS.inc(unknown, outcome='dropped_unknown_user')
+        if invalid:
+            WRITE_BEHIND_RECORDS.inc(invalid, outcome='dropped_invalid')
+        self.flush_latency_seconds.observe(time.perf_counter() - started)
+
+    def close(self, timeout=10.0):
+        """Flushes what is queued and stops the worker."""
+        worker = self._worker
+        if worker is not None and worker.is_alive():
+            self._queue.put(None)
+            worker.join(timeout)
+
+    def stats(self):
+        return {
+            'queue_depth': self._queue.qsize(),
+            'batch_size': self.batch_size.snapshot(),
+            'flush_latency_seconds': self.flush_latency_seconds.snapshot(),
+            'flush_latency_p99_seconds': self.flush_latency_seconds.quantile(0.99),
+            **{outcome: WRITE_BEHIND_RECORDS.value(outcome=outcome)
+               for outcome in ('queued', 'written', 'dropped_full', 'dropped_unknown_user', 'dropped_invalid', 'dropped_error')},
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_analysis_writer(config=None):
+    """Process-wide writer, created on first use and flushed at interpreter exit."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AnalysisWriter(config)
+                atexit.register(_writer.close)
+    return _writer
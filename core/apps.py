@@ -1,5 +1,22 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        # Keeps UserBaseline current on every saved HealthLog
+        from . import signals  # noqa: F401
+
+        # Warm-load the model artifacts once per process so requests only run inference
+        if not getattr(settings, 'HEA_WARM_LOAD_MODELS', True):
+            return
+        from src.hea_health_signals.pipelines.model_registry import get_model_registry
+        from src.hea_health_signals.logger import logging
+        try:
+            get_model_registry().load()
+        except Exception as e:
+            # Missing artifacts should not stop manage.py commands; the first request retries
+            logging.warning(f"Model warm-load skipped: {e}")
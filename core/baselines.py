@@ -0,0 +1,79 @@
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UserBaseline
+from src.hea_health_signals.utils import running_stats
+
+
+def ewma_alpha():
+    return getattr(settings, 'HEA_BASELINE_EWMA_ALPHA', 0.3)
+
+
+def apply_log(baseline, log, alpha):
+    """Folds one log into an in-memory baseline (no query)."""
+    for signal in UserBaseline.SIGNALS:
+        state = baseline.stats.setdefault(signal, running_stats.empty_state())
+        running_stats.update(state, getattr(log, signal), alpha)
+    baseline.log_count += 1
+    baseline.last_log_id = log.pk
+
+
+def update_baseline(log):
+    """O(1) update for one new log: the user's baseline row is locked, updated and saved."""
+    with transaction.atomic():
+        baseline, _ = UserBaseline.objects.select_for_update().get_or_create(user_id=log.user_id)
+        apply_log(baseline, log, ewma_alpha())
+        baseline.save(update_fields=['stats', 'log_count', 'last_log', 'updated_at'])
+    return baseline
+
+
+def update_baselines(logs):
+    """
+    Folds many logs (in arrival order) into their users' baselines with a
+    constant number of queries: missing rows are created, all affected rows
+    are locked and read in one query, and written back with bulk_update.
+    For paths that insert logs with bulk_create, which sends no post_save.
+    """
+    by_user = defaultdict(list)
+    for log in logs:
+        by_user[log.user_id].append(log)
+    if not by_user:
+        return 0
+
+    alpha = ewma_alpha()
+    with transaction.atomic():
+        UserBaseline.objects.bulk_create([UserBaseline(user_id=user_id) for user_id in by_user], ignore_conflicts=True)
+        baselines = list(UserBaseline.objects.select_for_update().filter(user_id__in=list(by_user)))
+        now = timezone.now()
+        for baseline in baselines:
+            for log in by_user[baseline.user_id]:
+                apply_log(baseline, log, alpha)
+            # bulk_update skips auto_now
+            baseline.updated_at = now
+        UserBaseline.objects.bulk_update(baselines, ['stats', 'log_count', 'last_log', 'updated_at'])
+    return len(by_user)
+
+
+def is_public_id(value):
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+def baseline_stats(public_id):
+    """The stats dict of the user with this public_id, or None."""
+    if not is_public_id(public_id):
+        return None
+    return UserBaseline.objects.filter(user__public_id=public_id).values_list('stats', flat=True).first()
+
+
+async def abaseline_stats(public_id):
+    if not is_public_id(public_id):
+        return None
+    return await UserBaseline.objects.filter(user__public_id=public_id).values_list('stats', flat=True).afirst()
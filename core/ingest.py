@@ -0,0 +1,143 @@
+import json
+import time
+
+from django.db import transaction
+
+from .analysis_writer import build_log, build_result, clean_log_fields, parse_public_id
+from .baselines import update_baselines
+from .rollups import add_results
+from .models import User, HealthLog, AnomalyResult
+from .text_scoring import score_log_texts
+from src.hea_health_signals.pipelines.prediction_pipeline import parse_batch, fill_from_baseline
+from src.hea_health_signals.utils.metrics import METRICS, STAGE_SECONDS
+
+INGEST_RECORDS = METRICS.counter('hea_ingest_records_total', 'Bulk-ingested HealthLog records by outcome.', ('outcome',))
+INGEST_RESOLVE_STAGE = STAGE_SECONDS.labels(stage='ingest_resolve')
+INGEST_SCORE_STAGE = STAGE_SECONDS.labels(stage='ingest_score')
+INGEST_WRITE_STAGE = STAGE_SECONDS.labels(stage='ingest_write')
+
+# HealthLog signal -> analyze payload field it stands for
+LOG_FIELDS = {'health_perception': 'health_current', 'depression_index': 'depression_current'}
+
+
+def parse_records(body, content_type=''):
+    """
+    Decodes a bulk upload: a JSON array, {"records": [...]}, or NDJSON
+    (one record per line). Returns (records, errors) where records are
+    (index, dict) pairs; entries that are not JSON objects are reported
+    by their array or line index and left out.
+    """
+    text = body.decode('utf-8') if isinstance(body, bytes) else body
+    payload = None
+    if 'ndjson' not in content_type and text.lstrip()[:1] in ('[', '{'):
+        try:
+            payload = json.loads(text)
+        except json.JSONDecodeError:
+            # Several NDJSON lines (or a malformed array, reported line by line)
+            payload = None
+        if isinstance(payload, dict):
+            # A single NDJSON line is also a JSON object
+            payload = payload['records'] if 'records' in payload else [payload]
+    if payload is not None:
+        if not isinstance(payload, list):
+            raise ValueError("Expected a JSON array, {'records': [...]} or NDJSON")
+        items = list(enumerate(payload))
+    else:
+        items = []
+        for i, line in enumerate(text.splitlines()):
+            if not line.strip():
+                continue
+            try:
+                items.append((i, json.loads(line)))
+            except ValueError as e:
+                items.append((i, e))
+
+    records, errors = [], []
+    for i, item in items:
+        if isinstance(item, dict):
+            records.append((i, item))
+        else:
+            errors.append({'index': i, 'message': str(item) if isinstance(item, Exception) else "Expected a JSON object"})
+    return records, errors
+
+
+def clean_record(record):
+    """Analyze-style payload for one upload record: log field names mapped, signals type-checked."""
+    data = dict(record)
+    for log_field, field in LOG_FIELDS.items():
+        if data.get(field) is None and data.get(log_field) is not None:
+            data[field] = data[log_field]
+    return clean_log_fields(data)
+
+
+def ingest_records(records, pipeline, scorer=None):
+    """
+    Stores a batch of HealthLog records for many users and scores them.
+    records is a list of dicts or (index, dict) pairs. Users are resolved
+    (with their baselines) in one query, missing *_past inputs are filled
+    from the baseline as it stood before the batch, every scorable row
+    goes through one predict_raw call, and logs, AnomalyResults, text
+    scores, baselines and risk rollups are written in one transaction.
+    Returns a summary dict with per-record errors and logs/s.
+    """
+    started = time.perf_counter()
+    records = [item if isinstance(item, tuple) else (i, item) for i, item in enumerate(records)]
+    errors = []
+
+    with INGEST_RESOLVE_STAGE.time():
+        public_ids = [parse_public_id(record.get('public_id')) for _, record in records]
+        users = {
+            public_id: (pk, stats)
+            for public_id, pk, stats in User.objects.filter(public_id__in={p for p in public_ids if p})
+            .values_list('public_id', 'pk', 'baseline__stats')
+        }
+        accepted = []
+        for (index, record), public_id in zip(records, public_ids):
+            if public_id not in users:
+                errors.append({'index': index, 'message': f"Unknown public_id: {record.get('public_id')}"})
+                continue
+            try:
+                data = clean_record(record)
+            except (TypeError, ValueError) as e:
+                errors.append({'index': index, 'message': str(e)})
+                continue
+            user_id, stats = users[public_id]
+            data, _ = fill_from_baseline(data, stats)
+            accepted.append((user_id, data))
+
+    with INGEST_SCORE_STAGE.time():
+        analyses = [None] * len(accepted)
+        if accepted:
+            # Rows without every model input (e.g. no age/high_bp) are stored unscored
+            raw, _ = parse_batch([data for _, data in accepted])
+            results, _ = pipeline.predict_raw(raw)
+            for i, result in enumerate(results):
+                if result is not None:
+                    result['follow_up'] = pipeline.get_empathetic_followup(result, accepted[i][1])
+                    analyses[i] = result
+
+    with INGEST_WRITE_STAGE.time(), transaction.atomic():
+        logs = HealthLog.objects.bulk_create([build_log(user_id, data) for user_id, data in accepted], batch_size=1000)
+        scored_logs = [log for log, analysis in zip(logs, analyses) if analysis is not None]
+        results = AnomalyResult.objects.bulk_create(
+            [build_result(log, analysis) for log, analysis in zip(logs, analyses) if analysis is not None], batch_size=1000
+        )
+        add_results(zip(scored_logs, results))
+        # Adds text_anomaly_score to those results and a text-only result (not rolled up) for unscored logs
+        score_log_texts([(log.pk, log.raw_text) for log in logs], scorer)
+        update_baselines(logs)
+
+    elapsed = time.perf_counter() - started
+    scored = sum(analysis is not None for analysis in analyses)
+    INGEST_RECORDS.inc(len(logs), outcome='inserted')
+    INGEST_RECORDS.inc(len(errors), outcome='rejected')
+    errors.sort(key=lambda error: error['index'])
+    return {
+        'received': len(records),
+        'inserted': len(logs),
+        'scored': scored,
+        'unscored': len(logs) - scored,
+        'errors': errors,
+        'elapsed_ms': round(elapsed * 1000, 2),
+        'logs_per_second': round(len(logs) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
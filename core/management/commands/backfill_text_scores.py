@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.models import HealthLog
+from core.text_scoring import score_log_texts
+from src.hea_health_signals.pipelines.text_anomaly import get_text_anomaly_scorer
+
+
+class Command(BaseCommand):
+    help = "Scores HealthLog.raw_text with the text anomaly model and stores the result on AnomalyResult."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Logs fetched, scored and written per batch.")
+        parser.add_argument('--rescore', action='store_true', help="Also rescore logs that already have a text score.")
+        parser.add_argument('--limit', type=int, default=None, help="Stop after this many logs.")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        scorer = get_text_anomaly_scorer()
+
+        logs = HealthLog.objects.order_by('id')
+        if not options['rescore']:
+            logs = logs.filter(Q(analysis__isnull=True) | Q(analysis__text_anomaly_score__isnull=True))
+        if options['limit']:
+            logs = logs[:options['limit']]
+
+        started = time.perf_counter()
+        batch, seen = [], 0
+        # iterator() streams rows from the cursor instead of caching the whole queryset
+        for row in logs.values_list('id', 'raw_text').iterator(chunk_size=chunk_size):
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                seen += score_log_texts(batch, scorer)
+                batch = []
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{seen} logs scored ({seen / elapsed:.0f} logs/s)")
+        if batch:
+            seen += score_log_texts(batch, scorer)
+
+        elapsed = time.perf_counter() - started
+        rate = seen / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {seen} logs in {elapsed:.1f}s ({rate:.0f} logs/s)."
+        ))
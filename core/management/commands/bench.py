@@ -0,0 +1,162 @@
+import os
+import json
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.test import override_settings
+
+from core.views import get_result_cache
+from src.hea_health_signals.pipelines.model_registry import ModelRegistry, get_model_registry
+from src.hea_health_signals.pipelines.prediction_pipeline import PredictPipeline, SCORERS, parse_batch, derive_features
+from src.hea_health_signals.pipelines.tree_ensemble import compare_latency
+from src.hea_health_signals.utils.array_store import load_frame
+from src.hea_health_signals.utils.benchmark import (
+    measure, run_http_load, environment_info, compare_results
+)
+
+# RAND column -> analyze payload field
+PAYLOAD_COLUMNS = {
+    'r10bmi': 'bmi_current', 'r9bmi': 'bmi_past',
+    'r10shlt': 'health_current', 'r9shlt': 'health_past',
+    'r10cesd': 'depression_current', 'r9cesd': 'depression_past',
+    'r10hibp': 'high_bp', 'r10agey_e': 'age',
+}
+
+
+def load_payloads(path):
+    if os.path.isdir(path):
+        # Split store written by DataIngestion
+        df = load_frame(path, columns=list(PAYLOAD_COLUMNS)).rename(columns=PAYLOAD_COLUMNS)
+    else:
+        df = pd.read_csv(path, usecols=list(PAYLOAD_COLUMNS)).rename(columns=PAYLOAD_COLUMNS)
+    df['high_bp'] = df['high_bp'].astype(int)
+    return df.to_dict(orient='records')
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    # TCP_NODELAY, so keep-alive runs don't stall on Nagle + delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = "Benchmarks PredictPipeline and /api/analyze/ and writes the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', default=os.path.join('artifacts', 'test.csv'), help="CSV or split store of RAND rows used as payloads.")
+        parser.add_argument('--repeats', type=int, default=500, help="Timed calls per micro-benchmark.")
+        parser.add_argument('--clients', type=int, default=8, help="Concurrent HTTP clients for the end-to-end run.")
+        parser.add_argument('--requests', type=int, default=2000, help="Total HTTP requests for the end-to-end run.")
+        parser.add_argument('--skip-http', action='store_true', help="Only run the in-process micro-benchmarks.")
+        parser.add_argument('--no-cache', action='store_true', help="Disable the analysis result cache during the run.")
+        parser.add_argument('--output', default=None, help="Result file (default: bench_results/bench_<timestamp>.json).")
+        parser.add_argument('--compare', default=None, help="Baseline JSON to check for regressions.")
+        parser.add_argument('--tolerance', type=float, default=0.10, help="Allowed slowdown vs baseline (fraction).")
+        parser.add_argument('--min-delta-ms', type=float, default=0.5, help="Ignore slowdowns smaller than this (noise floor).")
+        parser.add_argument('--keep-alive', action='store_true', help="Reuse HTTP connections instead of one per request.")
+
+    def handle(self, *args, **options):
+        payloads = load_payloads(options['data'])
+        repeats = options['repeats']
+        results = {}
+
+        # 1. Construction: cold artifact load vs. per-request pipeline on a warm registry
+        results['construction'] = {
+            'registry_cold_load': measure(lambda: ModelRegistry().load(), repeats=max(3, repeats // 100), warmup=1),
+            'pipeline_warm': measure(PredictPipeline, repeats=repeats),
+        }
+        self.stdout.write(f"Cold load p50: {results['construction']['registry_cold_load']['p50_ms']:.1f} ms")
+
+        # 2. Single-row predict for each scorer
+        results['predict_single'] = {}
+        for scorer in SCORERS:
+            pipeline = PredictPipeline(scorer=scorer)
+            rows = iter(range(10 ** 9))
+            results['predict_single'][scorer] = measure(lambda: pipeline.predict(payloads[next(rows) % len(payloads)]), repeats=repeats)
+            self.stdout.write(f"predict ({scorer}) p50: {results['predict_single'][scorer]['p50_ms']:.3f} ms")
+
+        # 3. Tree scorer alone: predict_proba vs. the native evaluator on the same scaled rows
+        pipeline = PredictPipeline(scorer=getattr(settings, 'HEA_SCORER', 'xgboost'))
+        if pipeline.tree_evaluator is not None:
+            raw, _ = parse_batch(payloads)
+            X = pipeline.transform_batch(derive_features(raw[~pd.isna(raw).any(axis=1)]))
+            scorer = results['tree_scorer'] = compare_latency(pipeline.model, pipeline.tree_evaluator, X, repeats=repeats)
+            self.stdout.write(
+                f"Tree scorer single row: xgboost {scorer['single_row_us']['xgboost']:.0f} us, "
+                f"native {scorer['single_row_us']['native']:.0f} us (max diff {scorer['max_abs_diff']:.1e})"
+            )
+
+        # 4. Batch throughput over the whole file
+        batch = measure(lambda: pipeline.predict_batch(payloads), repeats=max(3, repeats // 50), warmup=1)
+        batch['rows'] = len(payloads)
+        batch['rows_per_s'] = len(payloads) / (batch['mean_ms'] / 1000)
+        results['predict_batch'] = batch
+        self.stdout.write(f"predict_batch: {batch['rows_per_s']:.0f} rows/s over {len(payloads)} rows")
+
+        # 5. End-to-end HTTP latency under concurrent clients
+        if not options['skip_http']:
+            results['http_analyze'] = self.run_http(payloads, options)
+            http = results['http_analyze']
+            self.stdout.write(
+                f"/api/analyze/ x{options['clients']} clients: p50 {http['p50_ms']:.2f} ms, "
+                f"p95 {http['p95_ms']:.2f} ms, p99 {http['p99_ms']:.2f} ms, {http['throughput_rps']:.0f} req/s"
+            )
+
+        report = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'environment': environment_info(),
+            'model': get_model_registry().info(),
+            'settings': {
+                'scorer': getattr(settings, 'HEA_SCORER', 'xgboost'),
+                'result_cache': getattr(settings, 'HEA_RESULT_CACHE', False) and not options['no_cache'],
+                'coalesce': getattr(settings, 'HEA_COALESCE_PREDICTIONS', False),
+            },
+            'options': {key: options[key] for key in ('repeats', 'clients', 'requests', 'data', 'keep_alive')},
+            'results': results,
+        }
+
+        output = options['output'] or os.path.join('bench_results', f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            regressions = compare_results(report, baseline, options['tolerance'], min_delta_ms=options['min_delta_ms'])
+            for r in regressions:
+                self.stdout.write(self.style.WARNING(
+                    f"REGRESSION {r['metric']}: {r['baseline']:.3f} -> {r['current']:.3f} ms ({r['change']:+.0%})"
+                ))
+            if regressions:
+                raise CommandError(f"{len(regressions)} latency regression(s) above {options['tolerance']:.0%}")
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
+
+    def run_http(self, payloads, options):
+        # Start from an empty cache, so entries from earlier runs in this process never serve the HTTP run
+        cache = get_result_cache()
+        if cache is not None:
+            cache.clear()
+        with override_settings(HEA_RESULT_CACHE=False) if options['no_cache'] else nullcontext():
+            server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler)
+            server.set_app(get_internal_wsgi_application())
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                url = f"http://127.0.0.1:{server.server_address[1]}/api/analyze/"
+                keep_alive = options['keep_alive']
+                run_http_load(url, payloads[:50], clients=options['clients'], total_requests=min(200, options['requests']), keep_alive=keep_alive)
+                return run_http_load(url, payloads, clients=options['clients'], total_requests=options['requests'], keep_alive=keep_alive)
+            finally:
+                server.shutdown()
+                server.server_close()
+                if cache is not None:
+                    cache.clear()
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.baselines import update_baselines
+from core.models import HealthLog, UserBaseline
+
+
+class Command(BaseCommand):
+    help = "Recomputes every UserBaseline from the full HealthLog history (one pass, oldest log first)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Logs folded into baselines per batch.")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        fields = ['id', 'user_id', *UserBaseline.SIGNALS]
+
+        started = time.perf_counter()
+        batch, seen = [], 0
+        # One transaction: readers keep the old baselines until the rebuild commits, and a failure leaves them intact
+        with transaction.atomic():
+            UserBaseline.objects.all().delete()
+            # Global (timestamp, id) order keeps each user's logs in arrival order across batches
+            for log in HealthLog.objects.order_by('timestamp', 'id').only(*fields).iterator(chunk_size=chunk_size):
+                batch.append(log)
+                if len(batch) >= chunk_size:
+                    update_baselines(batch)
+                    seen += len(batch)
+                    batch = []
+            if batch:
+                update_baselines(batch)
+                seen += len(batch)
+
+        elapsed = time.perf_counter() - started
+        rate = seen / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {UserBaseline.objects.count()} baselines from {seen} logs in {elapsed:.1f}s ({rate:.0f} logs/s)."
+        ))
@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from core.models import HealthLog
+from core.rollups import parse_bound, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recomputes the hour/day risk rollups for a time range (whole UTC days) from AnomalyResult."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="ISO date or datetime; defaults to the oldest log.")
+        parser.add_argument('--end', help="ISO date or datetime (exclusive); defaults to the newest log's day.")
+
+    def handle(self, *args, **options):
+        bounds = HealthLog.objects.aggregate(first=Min('timestamp'), last=Max('timestamp'))
+        try:
+            start = parse_bound(options['start']) if options['start'] else bounds['first']
+            # Just past the newest log, so its day is included
+            end = parse_bound(options['end']) if options['end'] else bounds['last'] and bounds['last'] + timedelta(microseconds=1)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if start is None or end is None:
+            self.stdout.write("No logs to roll up.")
+            return
+
+        started = time.perf_counter()
+        start, end, written = rebuild_rollups(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} rollup rows for {start:%Y-%m-%d} to {end:%Y-%m-%d} in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_ambulance_remove_anomalyresult_ai_empathy_response_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="anomalyresult",
+            name="text_anomaly_score",
+            field=models.FloatField(blank=True, help_text="Diary text anomaly score (0.0 - 1.0)", null=True),
+        ),
+        migrations.AlterField(
+            model_name="anomalyresult",
+            name="risk_score",
+            field=models.FloatField(blank=True, help_text="Anomaly score (0.0 - 1.0)", null=True),
+        ),
+    ]
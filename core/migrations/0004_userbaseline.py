@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_anomalyresult_text_anomaly_score"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserBaseline",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("stats", models.JSONField(default=dict)),
+                ("log_count", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("last_log", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to="core.healthlog")),
+                ("user", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name="baseline", to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_userbaseline"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="healthlog",
+            index=models.Index(fields=["user", "timestamp", "id"], name="healthlog_user_timeline_idx"),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_healthlog_timeline_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="healthlog",
+            name="region",
+            field=models.CharField(blank=True, default="", max_length=50),
+        ),
+        migrations.CreateModel(
+            name="RiskRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("granularity", models.CharField(choices=[("hour", "Hour"), ("day", "Day")], max_length=4)),
+                ("bucket", models.DateTimeField()),
+                ("domain", models.CharField(choices=[("METABOLIC", "Metabolic Risk"), ("CARDIO", "Cardiovascular"), ("PSYCHO", "Psycho-Emotional"), ("NEURO", "Neurological"), ("NONE", "Stable")], max_length=20)),
+                ("region", models.CharField(blank=True, default="", max_length=50)),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("risk_sum", models.FloatField(default=0.0)),
+                ("emergency_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "constraints": [models.UniqueConstraint(fields=("granularity", "bucket", "domain", "region"), name="riskrollup_bucket_key")],
+            },
+        ),
+    ]
@@ -32,6 +32,14 @@ class HealthLog(models.Model):
     # Qualitative "Everyday Language" Input
     raw_text = models.TextField(help_text="Context-aware diary input for anomaly detection.")
     typing_speed_wpm = models.IntegerField(null=True, blank=True) # Digital Biomarker
+    # Facility region the reading came in through (gateway / clinic); '' when unknown
+    region = models.CharField(max_length=50, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            # Serves the practitioner timeline: one user's logs in (timestamp, id) order, keyset paginated
+            models.Index(fields=['user', 'timestamp', 'id'], name='healthlog_user_timeline_idx'),
+        ]
 
     def __str__(self):
         return f"Log: {self.user.username} @ {self.timestamp.strftime('%H:%M')}"
@@ -49,7 +57,10 @@ class AnomalyResult(models.Model):
         ('NONE', 'Stable')
     ]
     log = models.OneToOneField(HealthLog, on_delete=models.CASCADE, related_name="analysis")
-    risk_score = models.FloatField(help_text="Anomaly score (0.0 - 1.0)")
+    # Null for text-only results (logs without every model input)
+    risk_score = models.FloatField(null=True, blank=True, help_text="Anomaly score (0.0 - 1.0)")
+    # IsolationForest score of raw_text (see TextAnomalyScorer); null until scored
+    text_anomaly_score = models.FloatField(null=True, blank=True, help_text="Diary text anomaly score (0.0 - 1.0)")
     domain = models.CharField(max_length=20, choices=RISK_DOMAINS, default='NONE')
     
     # Explainability & Safety
@@ -57,6 +68,58 @@ class AnomalyResult(models.Model):
     ai_followup_question = models.TextField(help_text="Safe, empathetic context-gathering question.")
     is_emergency = models.BooleanField(default=False) # Triggers Ambulance Logic
 
+class UserBaseline(models.Model):
+    """
+    The person's own baseline, kept incrementally.
+    One row per user with running mean/variance (Welford), EWMA and last
+    value for each tracked HealthLog signal, so comparing a new log with
+    the baseline never scans the user's history.
+    """
+    # HealthLog field -> key in stats
+    SIGNALS = ('bmi_current', 'health_perception', 'depression_index', 'typing_speed_wpm')
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="baseline")
+    # {signal: {'n', 'mean', 'm2', 'ewma', 'last'}} (see utils.running_stats)
+    stats = models.JSONField(default=dict)
+    log_count = models.PositiveIntegerField(default=0)
+    last_log = models.ForeignKey(HealthLog, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Baseline: {self.user.username} ({self.log_count} logs)"
+
+class RiskRollup(models.Model):
+    """
+    Pre-aggregated risk-scored AnomalyResults for population dashboards
+    (text-only results have no risk_score and are left out).
+    One row per (granularity, bucket, domain, region) holding the count,
+    the risk_score sum and the emergency count, so mean risk and
+    emergency rate over any range are sums over a few rollup rows.
+    Maintained incrementally as analyses are written (see core.rollups).
+    """
+    GRANULARITIES = [('hour', 'Hour'), ('day', 'Day')]
+
+    granularity = models.CharField(max_length=4, choices=GRANULARITIES)
+    # Start of the UTC hour/day
+    bucket = models.DateTimeField()
+    domain = models.CharField(max_length=20, choices=AnomalyResult.RISK_DOMAINS)
+    region = models.CharField(max_length=50, blank=True, default='')
+    count = models.PositiveIntegerField(default=0)
+    risk_sum = models.FloatField(default=0.0)
+    emergency_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['granularity', 'bucket', 'domain', 'region'], name='riskrollup_bucket_key'),
+        ]
+
+    @property
+    def mean_risk(self):
+        return self.risk_sum / self.count if self.count else None
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:00} {self.domain}/{self.region or '-'}: {self.count}"
+
 # --- 3. GEO-LOGISTICS & TRIAGE ENGINE ---
 class MedicalFacility(models.Model):
     """
@@ -0,0 +1,147 @@
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AnomalyResult, RiskRollup
+
+GRANULARITIES = [granularity for granularity, _ in RiskRollup.GRANULARITIES]
+GROUP_FIELDS = ('bucket', 'domain', 'region')
+
+
+def _increment_sql():
+    q = connection.ops.quote_name
+    return (
+        f"UPDATE {q(RiskRollup._meta.db_table)} SET {q('count')} = {q('count')} + %s, "
+        f"{q('risk_sum')} = {q('risk_sum')} + %s, {q('emergency_count')} = {q('emergency_count')} + %s "
+        f"WHERE {q('granularity')} = %s AND {q('bucket')} = %s AND {q('domain')} = %s AND {q('region')} = %s"
+    )
+
+
+def bucket_start(timestamp, granularity):
+    """Start of the UTC hour or day holding timestamp."""
+    hour = timestamp.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return hour if granularity == 'hour' else hour.replace(hour=0)
+
+
+def add_to_rollups(rows):
+    """
+    Adds (timestamp, domain, region, risk_score, is_emergency) rows to the
+    hour and day rollups: rows are summed per bucket in memory, missing
+    rollup rows are created in one INSERT, then every touched row is
+    incremented in the database (count = count + n), so concurrent writers
+    never lose updates. Rows without a risk_score (text-only results) are
+    not risk data and are skipped. Returns the number of rollup rows touched.
+    """
+    totals = defaultdict(lambda: [0, 0.0, 0])
+    for timestamp, domain, region, risk_score, is_emergency in rows:
+        if risk_score is None:
+            continue
+        for granularity in GRANULARITIES:
+            total = totals[(granularity, bucket_start(timestamp, granularity), domain, region or '')]
+            total[0] += 1
+            total[1] += risk_score
+            total[2] += int(bool(is_emergency))
+    if not totals:
+        return 0
+
+    with transaction.atomic():
+        RiskRollup.objects.bulk_create(
+            [RiskRollup(granularity=g, bucket=b, domain=d, region=r) for g, b, d, r in totals], ignore_conflicts=True
+        )
+        # One prepared UPDATE run per key: the increments stay atomic under concurrent writers
+        # and cost a few microseconds each, where ORM update()/bulk_update() build expressions per row
+        bucket_field = RiskRollup._meta.get_field('bucket')
+        with connection.cursor() as cursor:
+            cursor.executemany(_increment_sql(), [
+                (count, risk_sum, emergencies, granularity, bucket_field.get_db_prep_value(bucket, connection), domain, region)
+                for (granularity, bucket, domain, region), (count, risk_sum, emergencies) in totals.items()
+            ])
+    return len(totals)
+
+
+def add_results(pairs):
+    """add_to_rollups for in-memory (log, result) pairs that were just written."""
+    return add_to_rollups(
+        (log.timestamp, result.domain, log.region, result.risk_score, result.is_emergency) for log, result in pairs
+    )
+
+
+def parse_bound(value):
+    """Aware datetime for an ISO date or datetime string (naive values are UTC); ValueError otherwise."""
+    parsed = parse_datetime(value if 'T' in value or ' ' in value else f'{value}T00:00')
+    if parsed is None:
+        raise ValueError(f"Not an ISO date or datetime: {value}")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed, dt_timezone.utc)
+
+
+def day_range(start, end):
+    """[start, end) widened to whole UTC days, so every hour and day bucket in it is complete."""
+    start = bucket_start(start, 'day')
+    end_day = bucket_start(end, 'day')
+    return start, end_day if end_day == end else end_day + timedelta(days=1)
+
+
+def rebuild_rollups(start, end):
+    """
+    Recomputes the rollups of [start, end) (widened to whole UTC days) from
+    the AnomalyResults with a risk_score, with one GROUP BY per granularity, replacing what was
+    there. For backfills, deletions and repairs after a failed write.
+    Returns (start, end, rollup rows written).
+    """
+    start, end = day_range(start, end)
+    results = AnomalyResult.objects.filter(log__timestamp__gte=start, log__timestamp__lt=end, risk_score__isnull=False)
+    rollups = []
+    for granularity in GRANULARITIES:
+        grouped = (
+            results.annotate(bucket=Trunc('log__timestamp', granularity, tzinfo=dt_timezone.utc), rollup_region=F('log__region'))
+            .values('bucket', 'domain', 'rollup_region')
+            .annotate(n=Count('id'), total=Sum('risk_score'), emergencies=Count('id', filter=Q(is_emergency=True)))
+            .order_by()
+        )
+        rollups.extend(
+            RiskRollup(granularity=granularity, bucket=row['bucket'], domain=row['domain'], region=row['rollup_region'],
+                       count=row['n'], risk_sum=row['total'], emergency_count=row['emergencies'])
+            for row in grouped
+        )
+    with transaction.atomic():
+        RiskRollup.objects.filter(bucket__gte=start, bucket__lt=end).delete()
+        RiskRollup.objects.bulk_create(rollups, batch_size=1000)
+    return start, end, len(rollups)
+
+
+def query_rollups(granularity, start, end, domain=None, region=None, group_by=GROUP_FIELDS):
+    """
+    Dashboard rows from the rollups of one granularity with bucket in
+    [start, end): count, mean_risk and emergency_rate per group_by
+    combination (any of bucket, domain, region; () for one total row).
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+    unknown = [field for field in group_by if field not in GROUP_FIELDS]
+    if unknown:
+        raise ValueError(f"Cannot group by {unknown}, expected any of {list(GROUP_FIELDS)}")
+
+    rollups = RiskRollup.objects.filter(granularity=granularity, bucket__gte=start, bucket__lt=end)
+    if domain:
+        rollups = rollups.filter(domain=domain)
+    if region is not None:
+        rollups = rollups.filter(region=region)
+    sums = {'n': Sum('count'), 'total': Sum('risk_sum'), 'emergencies': Sum('emergency_count')}
+    if group_by:
+        rows = rollups.values(*group_by).annotate(**sums).order_by(*group_by)
+    else:
+        rows = [rollups.aggregate(**sums)]
+    return [
+        {
+            **{field: row[field] for field in group_by},
+            'count': row['n'] or 0,
+            'mean_risk': row['total'] / row['n'] if row['n'] else None,
+            'emergency_rate': row['emergencies'] / row['n'] if row['n'] else None,
+        }
+        for row in rows
+    ]
@@ -1,18 +1,21 @@
 from rest_framework import serializers
-from .models import User, HealthLog, AnomalyResult, MedicalFacility, HealingCircle
+from .models import User, HealthLog, AnomalyResult, MedicalFacility
 
 class AnomalyResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = AnomalyResult
-        fields = ['risk_score', 'detected_category', 'signal_explanation', 'ai_empathy_response']
+        fields = ['risk_score', 'text_anomaly_score', 'domain', 'signal_explanation', 'ai_followup_question', 'is_emergency']
 
 class HealthLogSerializer(serializers.ModelSerializer):
-    # We include the analysis result inside the log response
-    analysis = AnomalyResultSerializer(source='anomalyresult', read_only=True)
+    # We include the analysis result inside the log response (None until the log is analysed)
+    analysis = AnomalyResultSerializer(read_only=True)
     
     class Meta:
         model = HealthLog
-        fields = ['id', 'timestamp', 'raw_text', 'typing_speed_wpm', 'local_weather', 'analysis']
+        fields = [
+            'id', 'timestamp', 'bmi_current', 'health_perception', 'depression_index',
+            'raw_text', 'typing_speed_wpm', 'analysis'
+        ]
 
 class MedicalFacilitySerializer(serializers.ModelSerializer):
     class Meta:
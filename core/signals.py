@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import HealthLog, AnomalyResult
+from .baselines import update_baseline
+from .rollups import add_results
+
+
+@receiver(post_save, sender=HealthLog, dispatch_uid='core.update_baseline_on_log')
+def update_baseline_on_log(sender, instance, created, raw=False, **kwargs):
+    # New logs only (edits would double count); fixtures are loaded raw
+    if created and not raw:
+        update_baseline(instance)
+
+
+@receiver(post_save, sender=AnomalyResult, dispatch_uid='core.add_result_to_rollups')
+def add_result_to_rollups(sender, instance, created, raw=False, **kwargs):
+    # Bulk paths (write-behind, bulk ingest, text scoring) add their own rows
+    if created and not raw:
+        add_results([(instance.log, instance)])
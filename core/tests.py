@@ -1,3 +1,879 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, AsyncClient, override_settings
+from django.core.management import call_command
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
 
-# Create your tests here.
+from src.hea_health_signals.pipelines.model_registry import ModelRegistry, ModelRegistryConfig, get_model_registry
+from src.hea_health_signals.pipelines.prediction_pipeline import PredictPipeline, INPUT_FIELDS, FEATURE_COLUMNS
+from src.hea_health_signals.pipelines.compiled_preprocessor import CompiledPreprocessor
+from src.hea_health_signals.pipelines.tree_ensemble import TreeEnsembleEvaluator
+from src.hea_health_signals.pipelines.batch_coalescer import PredictionCoalescer, CoalescerConfig, CoalescerOverloaded
+from src.hea_health_signals.pipelines.result_cache import AnalysisCache
+from src.hea_health_signals.pipelines.text_anomaly import get_text_anomaly_scorer
+from src.hea_health_signals.pipelines.cascade_ensemble import CascadeEnsemble, CascadeConfig, CASCADE_ROWS, write_members_manifest
+from src.hea_health_signals.components.ingestion_cache import IngestionCache, IngestionCacheConfig
+from src.hea_health_signals.components.data_ingestion import DataIngestion, DataIngestionConfig, RAND_COLUMNS, engineer_features
+from src.hea_health_signals.components.longitudinal_features import (
+    LongitudinalFeatureConfig, LongitudinalFeatureEngine, WavePanel, forward_fill, rolling_std
+)
+from src.hea_health_signals.utils.benchmark import summarize, compare_results
+from src.hea_health_signals.pipelines.stage_runner import Stage, StageRunner, StageRunnerConfig
+from src.hea_health_signals.components.hyperparameter_search import HyperparameterSearch, HyperparameterSearchConfig, plan_workers
+from src.hea_health_signals.components.quantized_training import train_quantized
+from src.hea_health_signals.components.bootstrap_evaluation import (
+    BootstrapEvaluator, BootstrapEvaluationConfig, bootstrap_weights, weighted_metrics, age_bands
+)
+from src.hea_health_signals.utils.threshold_optimizer import fbeta_curve, optimal_threshold, fit_group_thresholds
+
+from core.models import User, HealthLog, AnomalyResult, UserBaseline, RiskRollup
+from core.ingest import ingest_records
+from core.rollups import query_rollups
+from core.baselines import update_baselines
+from core.analysis_writer import AnalysisWriter, AnalysisWriterConfig, WRITE_BEHIND_RECORDS
+from src.hea_health_signals.utils import running_stats
+
+
+SAMPLE_INPUT = {
+    'bmi_current': 31.5, 'bmi_past': 29.0,
+    'health_current': 4, 'health_past': 3,
+    'depression_current': 3, 'depression_past': 1,
+    'high_bp': 1, 'age': 62,
+}
+
+
+class ModelRegistryTests(TestCase):
+    def test_concurrent_get_loads_once(self):
+        registry = ModelRegistry()
+        bundles = []
+        threads = [threading.Thread(target=lambda: bundles.append(registry.get())) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len({id(b) for b in bundles}), 1)
+        self.assertGreater(bundles[0].load_time, 0)
+        self.assertIsNotNone(bundles[0].versions['model'])
+
+    def test_reloads_when_artifacts_change(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        for name in ('model.pkl', 'preprocessor.pkl', 'threshold.txt'):
+            shutil.copy(os.path.join('artifacts', name), tmp)
+        registry = ModelRegistry(ModelRegistryConfig(
+            model_path=os.path.join(tmp, 'model.pkl'),
+            preprocessor_path=os.path.join(tmp, 'preprocessor.pkl'),
+            threshold_path=os.path.join(tmp, 'threshold.txt'),
+            reload_check_interval=0,
+        ))
+        before = registry.get()
+        self.assertFalse(registry.refresh_if_changed())
+
+        with open(os.path.join(tmp, 'threshold.txt'), 'w') as f:
+            f.write('0.2')
+        after = registry.get()
+        self.assertIsNot(before, after)
+        self.assertEqual(after.threshold, 0.2)
+        self.assertNotEqual(before.version, after.version)
+
+    def test_ignores_members_missing_from_manifest(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        for name in ('model.pkl', 'preprocessor.pkl', 'threshold.txt'):
+            shutil.copy(os.path.join('artifacts', name), tmp)
+        # Left behind by an earlier run that trained a catboost member
+        shutil.copy(os.path.join('artifacts', 'model.pkl'), os.path.join(tmp, 'model_catboost.pkl'))
+        with open(os.path.join(tmp, 'ensemble_threshold.txt'), 'w') as f:
+            f.write('0.4')
+
+        def registry():
+            return ModelRegistry(ModelRegistryConfig(
+                model_path=os.path.join(tmp, 'model.pkl'),
+                preprocessor_path=os.path.join(tmp, 'preprocessor.pkl'),
+                threshold_path=os.path.join(tmp, 'threshold.txt'),
+                ensemble_model_paths={'catboost': os.path.join(tmp, 'model_catboost.pkl')},
+                ensemble_threshold_path=os.path.join(tmp, 'ensemble_threshold.txt'),
+                ensemble_manifest_path=os.path.join(tmp, 'ensemble_members.json'),
+            ))
+
+        self.assertEqual(list(registry().get().ensemble_members), ['catboost'])
+        write_members_manifest((), os.path.join(tmp, 'ensemble_members.json'))
+        bundle = registry().get()
+        self.assertEqual(bundle.ensemble_members, {})
+        self.assertIsNone(bundle.ensemble_threshold)
+
+    def test_pipeline_reuses_registry_bundle(self):
+        first, second = PredictPipeline(), PredictPipeline()
+        self.assertIs(first.model, second.model)
+        self.assertIs(first.model, get_model_registry().get().model)
+
+
+class CompiledPreprocessorTests(TestCase):
+    def setUp(self):
+        self.preprocessor = get_model_registry().get().preprocessor
+        self.compiled = CompiledPreprocessor.from_column_transformer(self.preprocessor)
+        self.features = pd.read_csv('artifacts/test.csv')[FEATURE_COLUMNS]
+        # Exercise the imputer as well
+        self.features.iloc[::7, 1] = np.nan
+
+    def test_matches_sklearn_on_test_csv(self):
+        expected = self.preprocessor.transform(self.features).astype(np.float32)
+        np.testing.assert_array_equal(self.compiled.transform(self.features.to_numpy()), expected)
+        for i in range(0, len(self.features), 97):
+            np.testing.assert_array_equal(self.compiled.transform_row(self.features.iloc[i].to_numpy()), expected[i:i + 1])
+
+    def test_predictions_identical(self):
+        model = get_model_registry().get().model
+        expected = model.predict_proba(self.preprocessor.transform(self.features))[:, 1]
+        np.testing.assert_array_equal(model.predict_proba(self.compiled.transform(self.features.to_numpy()))[:, 1], expected)
+
+
+class TreeEnsembleEvaluatorTests(TestCase):
+    def setUp(self):
+        bundle = get_model_registry().get()
+        self.model = bundle.model
+        self.evaluator = TreeEnsembleEvaluator.from_xgboost(self.model)
+        self.X = bundle.compiled_preprocessor.transform(pd.read_csv('artifacts/test.csv')[FEATURE_COLUMNS].to_numpy())
+
+    def test_matches_predict_proba_on_test_csv(self):
+        expected = self.model.predict_proba(self.X)[:, 1]
+        np.testing.assert_allclose(self.evaluator.predict_proba(self.X)[:, 1], expected, rtol=0, atol=1e-6)
+
+    def test_missing_values_follow_default_direction(self):
+        X = self.X[:200].copy()
+        X[::3, 0] = np.nan
+        X[::4, 8] = np.nan
+        expected = self.model.predict_proba(X)[:, 1]
+        np.testing.assert_allclose(self.evaluator.predict_proba(X)[:, 1], expected, rtol=0, atol=1e-6)
+
+    def test_infinite_values_match_xgboost(self):
+        X = self.X[:200].copy()
+        X[::2, 0] = np.inf
+        X[1::4, 3] = -np.inf
+        expected = self.model.predict_proba(X)[:, 1]
+        np.testing.assert_allclose(self.evaluator.predict_proba(X)[:, 1], expected, rtol=0, atol=1e-6)
+
+    def test_bench_reports_tree_scorer_latency(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        output = os.path.join(tmp, 'bench.json')
+        call_command('bench', skip_http=True, repeats=20, output=output, stdout=io.StringIO())
+        with open(output) as f:
+            scorer = json.load(f)['results']['tree_scorer']
+        self.assertEqual(scorer['batch_rows'], self.X.shape[0])
+        for timings in (scorer['single_row_us'], scorer['batch_us']):
+            self.assertEqual(set(timings), {'xgboost', 'native'})
+            self.assertTrue(all(value > 0 for value in timings.values()))
+        self.assertLess(scorer['max_abs_diff'], 1e-6)
+
+    def test_native_scorer_matches_xgboost_scorer(self):
+        native, xgboost = PredictPipeline(scorer='native'), PredictPipeline(scorer='xgboost')
+        self.assertEqual(native.scorer, 'native')
+        self.assertAlmostEqual(native.predict(SAMPLE_INPUT)['risk_score'], xgboost.predict(SAMPLE_INPUT)['risk_score'], places=6)
+
+
+class PredictBatchTests(TestCase):
+    def test_batch_matches_single_row_predict(self):
+        pipeline = PredictPipeline()
+        payloads = [dict(SAMPLE_INPUT, bmi_current=24 + i, age=50 + i) for i in range(5)]
+        results, errors = pipeline.predict_batch(payloads)
+        self.assertEqual(errors, [])
+        for payload, result in zip(payloads, results):
+            self.assertAlmostEqual(result['risk_score'], pipeline.predict(payload)['risk_score'], places=6)
+
+    def test_columnar_input_and_row_errors(self):
+        columns = {name: [SAMPLE_INPUT[name]] * 3 for name in INPUT_FIELDS}
+        columns['bmi_past'][1] = 'n/a'
+        results, errors = PredictPipeline().predict_batch(columns)
+        self.assertIsNone(results[1])
+        self.assertEqual([e['index'] for e in errors], [1])
+        self.assertEqual(results[0], results[2])
+
+
+class ConstantMember:
+    """Stand-in ensemble member that records the rows it was asked to score."""
+    def __init__(self, prob):
+        self.prob = prob
+        self.seen = []
+
+    def predict_proba(self, X):
+        self.seen.append(X)
+        return np.column_stack([1 - np.full(len(X), self.prob), np.full(len(X), self.prob)])
+
+
+class CascadeEnsembleTests(TestCase):
+    def test_only_rows_near_threshold_reach_members(self):
+        first, second = ConstantMember(0.9), ConstantMember(0.6)
+        cascade = CascadeEnsemble({'lightgbm': first, 'catboost': second}, threshold=0.5,
+                                  ensemble_threshold=0.55, config=CascadeConfig(band=0.1))
+        features = np.arange(8.0).reshape(4, 2)
+        escalated_before = CASCADE_ROWS.value(tier='ensemble')
+
+        probs, escalated = cascade.score(features, np.array([0.1, 0.45, 0.58, 0.95]))
+        np.testing.assert_array_equal(escalated, [False, True, True, False])
+        np.testing.assert_allclose(probs, [0.1, (0.45 + 1.5) / 3, (0.58 + 1.5) / 3, 0.95])
+        # Both members scored the same two-row buffer
+        self.assertIs(first.seen[0], second.seen[0])
+        np.testing.assert_array_equal(first.seen[0], features[1:3])
+        self.assertEqual(CASCADE_ROWS.value(tier='ensemble') - escalated_before, 2)
+
+    def test_pipeline_without_members_keeps_single_tier(self):
+        pipeline = PredictPipeline(ensemble=True)
+        self.assertIsNone(pipeline.cascade)
+        self.assertNotIn('tier', pipeline.predict(SAMPLE_INPUT))
+
+
+class PredictionCoalescerTests(TestCase):
+    def test_concurrent_calls_share_batches(self):
+        coalescer = PredictionCoalescer(PredictPipeline, CoalescerConfig(max_batch_size=16, max_wait_ms=20))
+        payloads = [dict(SAMPLE_INPUT, age=40 + i) for i in range(16)]
+        futures = [coalescer.submit(payload) for payload in payloads]
+        bad = coalescer.submit(dict(SAMPLE_INPUT, bmi_current=None))
+        results = [future.result(timeout=5) for future in futures]
+        with self.assertRaises(ValueError):
+            bad.result(timeout=5)
+        coalescer.close()
+
+        pipeline = PredictPipeline()
+        for payload, result in zip(payloads, results):
+            self.assertAlmostEqual(result['risk_score'], pipeline.predict(payload)['risk_score'], places=6)
+        stats = coalescer.stats()
+        self.assertEqual(stats['batch_size']['sum'], 17)
+        self.assertLess(stats['batch_size']['count'], 17)
+
+    def test_cancelled_future_does_not_strand_its_batch(self):
+        coalescer = PredictionCoalescer(PredictPipeline, CoalescerConfig(max_batch_size=8, max_wait_ms=50))
+        self.addCleanup(coalescer.close)
+        futures = [coalescer.submit(dict(SAMPLE_INPUT, age=50 + i)) for i in range(4)]
+        # What asyncio.wrap_future does when the client disconnects
+        self.assertTrue(futures[1].cancel())
+        for i in (0, 2, 3):
+            self.assertIn('risk_score', futures[i].result(timeout=5))
+        self.assertTrue(coalescer._worker.is_alive())
+        self.assertIn('risk_score', coalescer.predict(SAMPLE_INPUT, timeout=5))
+
+    def test_timeout_and_close_fail_queued_payloads(self):
+        coalescer = PredictionCoalescer(PredictPipeline, CoalescerConfig(max_queue_size=2))
+        coalescer._ensure_worker = lambda: None  # nothing ever runs the queue
+        with self.assertRaises(CoalescerOverloaded):
+            coalescer.predict(SAMPLE_INPUT, timeout=0.05)
+        future = coalescer.submit(SAMPLE_INPUT)
+        coalescer.close(timeout=0.1)
+        with self.assertRaises(CoalescerOverloaded):
+            future.result(timeout=1)
+
+    @override_settings(HEA_COALESCE_PREDICTIONS=True, HEA_RESULT_CACHE=False)
+    def test_full_queue_returns_503(self):
+        coalescer = PredictionCoalescer(PredictPipeline, CoalescerConfig(max_queue_size=1))
+        coalescer._ensure_worker = lambda: None  # no worker, so the queue stays full
+        coalescer.submit(SAMPLE_INPUT)
+        with self.assertRaises(CoalescerOverloaded):
+            coalescer.submit(SAMPLE_INPUT)
+
+        from core import views
+        real_get_coalescer = views.get_coalescer
+        views.get_coalescer = lambda: coalescer
+        self.addCleanup(setattr, views, 'get_coalescer', real_get_coalescer)
+        response = self.client.post('/api/analyze/', data=json.dumps(SAMPLE_INPUT), content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('queue is full', response.json()['message'])
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class AnalysisCacheTests(TestCase):
+    def test_normalized_keys_share_entries(self):
+        cache = AnalysisCache()
+        as_strings = {name: str(value) for name, value in SAMPLE_INPUT.items()}
+        cache.put(cache.make_key(SAMPLE_INPUT, 'v1'), {'risk_score': 0.4})
+        self.assertEqual(cache.get(cache.make_key(as_strings, 'v1')), {'risk_score': 0.4})
+        self.assertIsNone(cache.make_key(dict(SAMPLE_INPUT, age=None), 'v1'))
+
+    def test_lru_eviction_and_ttl(self):
+        cache = AnalysisCache(max_entries=2, ttl_seconds=60)
+        keys = [cache.make_key(dict(SAMPLE_INPUT, age=age), 'v1') for age in (50, 51, 52)]
+        cache.put(keys[0], {'a': 0})
+        cache.put(keys[1], {'a': 1})
+        cache.get(keys[0])
+        cache.put(keys[2], {'a': 2})
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        cache.ttl_seconds = -1
+        cache.put(keys[0], {'a': 0})
+        self.assertIsNone(cache.get(keys[0]))
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_model_version_change_invalidates(self):
+        cache = AnalysisCache()
+        cache.put(cache.make_key(SAMPLE_INPUT, 'v1'), {'risk_score': 0.4})
+        self.assertIsNone(cache.get(cache.make_key(SAMPLE_INPUT, 'v2')))
+        self.assertIsNone(cache.get(cache.make_key(SAMPLE_INPUT, 'v1')))
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+
+class IngestionCacheTests(TestCase):
+    def test_roundtrip_and_source_change(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        dta_path = os.path.join(tmp, 'extract.dta')
+        frame = pd.DataFrame({'hhidpn': [1.0, 2.0, 3.0], 'r10diab': [0.0, 1.0, np.nan]})
+        frame.to_stata(dta_path, write_index=False)
+
+        cache = IngestionCache(IngestionCacheConfig(cache_dir=os.path.join(tmp, 'cache')))
+        columns = ['hhidpn', 'r10diab']
+        self.assertIsNone(cache.load(dta_path, columns))
+        cache.store(dta_path, columns, frame)
+        loaded = cache.load(dta_path, columns)
+        self.assertIsInstance(loaded['hhidpn'], np.memmap)
+        np.testing.assert_array_equal(loaded['r10diab'], frame['r10diab'].to_numpy())
+
+        frame.assign(hhidpn=[4.0, 5.0, 6.0]).to_stata(dta_path, write_index=False)
+        os.utime(dta_path, ns=(0, 0))
+        self.assertIsNone(cache.load(dta_path, columns))
+
+    def test_streaming_matches_cached_ingestion(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        dta_path = os.path.join(tmp, 'extract.dta')
+        rng = np.random.default_rng(0)
+        frame = pd.DataFrame({name: rng.integers(0, 5, 500).astype(float) for name in RAND_COLUMNS})
+        frame['r10diab'] = rng.integers(0, 2, 500).astype(float)
+        frame.loc[::7, 'r9bmi'] = np.nan
+        frame.loc[::11, 'r11diab'] = np.nan
+        frame.to_stata(dta_path, write_index=False)
+
+        cached = DataIngestion(DataIngestionConfig(cache_dir=os.path.join(tmp, 'cache'), chunk_size=64))
+        streamed = DataIngestion(DataIngestionConfig(streaming=True, chunk_size=64))
+        expected = cached.load_healthy_population(dta_path)
+        pd.testing.assert_frame_equal(streamed.load_healthy_population(dta_path), expected.reset_index(drop=True))
+        self.assertFalse((expected['r10diab'] != 0).any())
+
+
+class LongitudinalFeatureTests(TestCase):
+    def test_fill_and_instability_match_pandas(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(size=(8, 300))  # (waves, respondents)
+        values[rng.random(values.shape) < 0.3] = np.nan
+        filled, gap = forward_fill(values)
+        np.testing.assert_allclose(filled, pd.DataFrame(values).ffill().to_numpy())
+        self.assertTrue(((gap == 0) == ~np.isnan(values)).all())
+        std, _ = rolling_std(values, 3)
+        np.testing.assert_allclose(std, pd.DataFrame(values).rolling(3, min_periods=2).std().to_numpy())
+
+    def test_wave10_rows_match_two_wave_features(self):
+        # With wave 10 fully observed the gap-filled history agrees with engineer_features
+        rng = np.random.default_rng(1)
+        frame = pd.DataFrame({name: rng.integers(1, 5, 400).astype(float) for name in RAND_COLUMNS})
+        frame['hhidpn'] = np.arange(400.0)
+        frame['r10diab'] = rng.integers(0, 2, 400).astype(float)
+        frame.loc[::5, 'r9bmi'] = np.nan
+        frame.loc[::9, 'r11diab'] = np.nan
+        config = LongitudinalFeatureConfig(waves=(9, 10, 11))
+
+        engine = LongitudinalFeatureEngine(config)
+        result = engine.build_training_frame(WavePanel.from_columns(frame, config), base_waves=(10,))
+        expected = engineer_features(frame[frame['r10diab'] == 0].copy()).reset_index(drop=True)
+        self.assertEqual(len(result), len(expected))
+        for name in FEATURE_COLUMNS + ['r11diab']:
+            np.testing.assert_allclose(result[name], expected[name], err_msg=name)
+
+
+class StageRunnerTests(TestCase):
+    def test_only_changed_stage_and_dependents_rerun(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        calls = []
+
+        def build(scale, offset):
+            def load(inputs, params):
+                calls.append('load')
+                return {'values': np.arange(5.0) * params['scale']}
+
+            def fit(inputs, params):
+                calls.append('fit')
+                with open(os.path.join(tmp, 'model.txt'), 'w') as f:
+                    f.write(str(float(inputs['load']['values'].sum()) + params['offset']))
+                return {}
+
+            return StageRunner([
+                Stage('load', load, params={'scale': scale}),
+                Stage('fit', fit, deps=('load',), params={'offset': offset},
+                      artifacts=(os.path.join(tmp, 'model.txt'),)),
+            ], StageRunnerConfig(cache_dir=os.path.join(tmp, 'cache')))
+
+        build(2, 0).run()
+        self.assertEqual([row['status'] for row in build(2, 0).run()], ['cached', 'cached'])
+        build(2, 1).run()
+        self.assertEqual(calls, ['load', 'fit', 'fit'])
+
+        report = build(2, 0).run()
+        self.assertEqual([row['status'] for row in report], ['cached', 'restored'])
+        with open(os.path.join(tmp, 'model.txt')) as f:
+            self.assertEqual(f.read(), '20.0')
+
+        build(3, 0).run()
+        self.assertEqual(calls[-2:], ['load', 'fit'])
+
+    def test_downstream_stage_reads_outputs_memory_mapped(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        received = []
+        StageRunner([
+            Stage('load', lambda inputs, params: {'values': np.arange(5.0)}),
+            Stage('fit', lambda inputs, params: received.append(inputs['load']['values']), deps=('load',)),
+        ], StageRunnerConfig(cache_dir=os.path.join(tmp, 'cache'))).run()
+        self.assertIsInstance(received[0], np.memmap)
+        np.testing.assert_array_equal(received[0], np.arange(5.0))
+
+
+class ThresholdOptimizerTests(TestCase):
+    def test_curve_matches_sklearn_at_every_threshold(self):
+        from sklearn.metrics import fbeta_score
+        rng = np.random.default_rng(0)
+        y = rng.integers(0, 2, 400)
+        scores = np.round(rng.random(400), 2)  # plenty of ties
+        curve = fbeta_curve(y, scores, beta=2)
+        for threshold, value in zip(curve['thresholds'], curve['fbeta']):
+            self.assertAlmostEqual(value, fbeta_score(y, scores >= threshold, beta=2, zero_division=0))
+
+        best, best_f2 = optimal_threshold(y, scores, beta=2)
+        self.assertEqual(best_f2, curve['fbeta'].max())
+        self.assertAlmostEqual(best_f2, fbeta_score(y, scores >= best, beta=2))
+
+    def test_group_without_positives_falls_back(self):
+        y = np.array([0, 1, 1, 0, 0, 0])
+        scores = np.array([0.1, 0.8, 0.6, 0.3, 0.2, 0.9])
+        groups = np.array(['a', 'a', 'a', 'b', 'b', 'b'])
+        fitted = fit_group_thresholds(y, scores, groups, min_samples=1, min_positives=1, fallback=0.5)
+        self.assertEqual(fitted['a']['threshold'], 0.6)
+        self.assertTrue(fitted['a']['fitted'])
+        self.assertEqual(fitted['b']['threshold'], 0.5)
+        self.assertFalse(fitted['b']['fitted'])
+
+
+class BootstrapEvaluationTests(TestCase):
+    def test_weighted_metrics_match_sklearn_on_resample(self):
+        from sklearn.metrics import average_precision_score, fbeta_score, roc_auc_score
+        rng = np.random.default_rng(0)
+        y = (rng.random(600) < 0.2).astype(float)
+        scores = np.round(np.clip(rng.normal(0.3 + 0.2 * y, 0.15), 0, 1), 2)  # rounded: many ties
+        order = np.argsort(-scores, kind='mergesort')
+        y, scores = y[order], scores[order]
+
+        weights = bootstrap_weights(rng, y.size, 3)
+        metrics = weighted_metrics(y, scores, 0.35, weights)
+        for b in range(3):
+            rows = np.repeat(np.arange(y.size), weights[b].astype(int))
+            expected = [
+                fbeta_score(y[rows], scores[rows] >= 0.35, beta=2),
+                average_precision_score(y[rows], scores[rows]),
+                roc_auc_score(y[rows], scores[rows]),
+            ]
+            np.testing.assert_allclose(metrics[b], expected, rtol=1e-6)
+
+    def test_report_independent_of_worker_count(self):
+        rng = np.random.default_rng(1)
+        y = (rng.random(400) < 0.3).astype(float)
+        scores = rng.random(400)
+        groups = {'ragender': rng.integers(1, 3, 400).astype(str), 'age_band': age_bands(rng.normal(60, 10, 400))}
+        reports = [
+            BootstrapEvaluator(BootstrapEvaluationConfig(n_replicates=60, chunk_size=25, max_workers=workers))
+            .evaluate(y, scores, 0.5, groups)['segments']
+            for workers in (1, 2)
+        ]
+        self.assertEqual(reports[0], reports[1])
+        self.assertEqual(set(reports[0]), {'overall', 'ragender=1', 'ragender=2', 'age_band=<55',
+                                           'age_band=55-64', 'age_band=65-74', 'age_band=75+'})
+        interval = reports[0]['overall']['metrics']['roc_auc']
+        self.assertLessEqual(interval['low'], interval['high'])
+
+
+class HyperparameterSearchTests(TestCase):
+    def test_plan_workers_splits_cores(self):
+        self.assertEqual(plan_workers(20, cpu_count=8), (8, 1))
+        self.assertEqual(plan_workers(2, cpu_count=8), (2, 4))
+        self.assertEqual(plan_workers(20, cpu_count=8, n_jobs_per_trial=4), (2, 4))
+
+    def test_resumes_from_checkpoint(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(300, 4))
+        y = (X[:, 0] + rng.normal(scale=0.5, size=300) > 0.8).astype(float)
+        config = HyperparameterSearchConfig(
+            n_trials=2, n_splits=3, max_rounds=50, early_stopping_rounds=5, max_workers=1,
+            checkpoint_path=os.path.join(tmp, 'trials.jsonl'),
+        )
+        first = HyperparameterSearch(config).run(X, y)
+        self.assertIn('n_estimators', first['best_params'])
+
+        config.n_trials = 3
+        HyperparameterSearch(config).run(X, y)
+        with open(config.checkpoint_path) as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+
+class QuantizedTrainingTests(TestCase):
+    def test_chunked_modes_match_dense_fit(self):
+        import xgboost as xgb
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(3000, 6))
+        y = (X[:, 0] + X[:, 1] > 1).astype(float)
+        params = {'n_estimators': 20, 'max_depth': 3, 'learning_rate': 0.1, 'random_state': 42}
+        dense = xgb.XGBClassifier(scale_pos_weight=2.0, **params).fit(X, y).predict_proba(X)
+        for mode in ('quantile', 'external'):
+            model = train_quantized(X, y, params, 2.0, mode=mode, chunk_rows=700)
+            self.assertIsInstance(model, xgb.XGBClassifier)
+            np.testing.assert_allclose(model.predict_proba(X), dense, atol=1e-6)
+
+
+class TextAnomalyTests(TestCase):
+    def test_batched_scores_match_model_predict(self):
+        scorer = get_text_anomaly_scorer()
+        texts = pd.read_csv(os.path.join('artifacts', 'data.csv'))['log_text'].tolist()
+        scorer.config.batch_size, default_batch = 7, scorer.config.batch_size
+        self.addCleanup(setattr, scorer.config, 'batch_size', default_batch)
+        scores, flagged = scorer.score(texts)
+        np.testing.assert_allclose(scores, -scorer.model.score_samples(scorer.vectorizer.transform(texts)))
+        np.testing.assert_array_equal(flagged, scorer.model.predict(scorer.vectorizer.transform(texts)) == -1)
+
+    def test_backfill_scores_every_log_and_keeps_existing_results(self):
+        user = User.objects.create(username='diarist')
+        texts = ['Slept well, feeling fine.', 'Chest feels tight and I keep forgetting words.', '', 'Normal day.'] * 3
+        logs = HealthLog.objects.bulk_create([HealthLog(user=user, raw_text=text) for text in texts])
+        AnomalyResult.objects.create(log=logs[0], risk_score=0.9, domain='CARDIO',
+                                     signal_explanation='model', ai_followup_question='question')
+
+        call_command('backfill_text_scores', chunk_size=5, stdout=io.StringIO())
+        self.assertEqual(AnomalyResult.objects.filter(text_anomaly_score__isnull=True).count(), 0)
+        self.assertEqual(AnomalyResult.objects.count(), len(texts))
+        existing = AnomalyResult.objects.get(log=logs[0])
+        self.assertEqual((existing.risk_score, existing.domain), (0.9, 'CARDIO'))
+        expected, _ = get_text_anomaly_scorer().score(texts)
+        stored = AnomalyResult.objects.order_by('log_id').values_list('text_anomaly_score', flat=True)
+        np.testing.assert_allclose(list(stored), expected)
+
+
+class UserBaselineTests(TestCase):
+    def make_logs(self, user, count, bulk=False):
+        rng = np.random.default_rng(len(user.username))
+        logs = [HealthLog(user=user, raw_text='entry', bmi_current=float(rng.normal(28, 3)),
+                          health_perception=int(rng.integers(1, 6)), depression_index=None if i % 4 == 0 else int(rng.integers(0, 9)),
+                          typing_speed_wpm=int(rng.integers(20, 80))) for i in range(count)]
+        if bulk:
+            return HealthLog.objects.bulk_create(logs)
+        for log in logs:
+            log.save()
+        return logs
+
+    def test_signal_keeps_welford_and_ewma_in_step_with_history(self):
+        user = User.objects.create(username='steady')
+        logs = self.make_logs(user, 25)
+        baseline = UserBaseline.objects.get(user=user)
+        self.assertEqual((baseline.log_count, baseline.last_log_id), (25, logs[-1].pk))
+        for signal in UserBaseline.SIGNALS:
+            history = pd.Series([getattr(log, signal) for log in logs], dtype=float).dropna()
+            state = baseline.stats[signal]
+            self.assertEqual(state['n'], len(history))
+            self.assertAlmostEqual(state['mean'], history.mean())
+            self.assertAlmostEqual(running_stats.variance(state), history.var(ddof=1))
+            self.assertAlmostEqual(state['ewma'], history.ewm(alpha=0.3, adjust=False).mean().iloc[-1])
+
+    def test_bulk_update_matches_per_log_path(self):
+        per_log, bulk = User.objects.create(username='one'), User.objects.create(username='two')
+        logs = self.make_logs(per_log, 12)
+        for log in logs:
+            log.pk, log.user = None, bulk
+        HealthLog.objects.bulk_create(logs)
+        self.assertFalse(UserBaseline.objects.filter(user=bulk).exists())
+        update_baselines(logs[:5])
+        update_baselines(logs[5:])
+        self.assertEqual(UserBaseline.objects.get(user=bulk).stats, UserBaseline.objects.get(user=per_log).stats)
+
+        call_command('rebuild_baselines', chunk_size=7, stdout=io.StringIO())
+        self.assertEqual(UserBaseline.objects.get(user=bulk).stats, UserBaseline.objects.get(user=per_log).stats)
+
+    @override_settings(HEA_PERSIST_ANALYSES=False)
+    def test_analyze_fills_missing_past_fields_from_baseline(self):
+        user = User.objects.create(username='returning')
+        self.make_logs(user, 6)
+        stats = UserBaseline.objects.get(user=user).stats
+        payload = {k: v for k, v in SAMPLE_INPUT.items() if k not in ('bmi_past', 'depression_past')}
+        payload['public_id'] = str(user.public_id)
+        response = self.client.post('/api/analyze/', data=json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['analysis']['baseline'], {
+            'bmi_past': stats['bmi_current']['ewma'], 'depression_past': stats['depression_index']['ewma'],
+        })
+
+        # The same values sent explicitly hit the cached result, which carries no one's baseline
+        explicit = dict(payload, bmi_past=stats['bmi_current']['ewma'], depression_past=stats['depression_index']['ewma'])
+        del explicit['public_id']
+        response = self.client.post('/api/analyze/', data=json.dumps(explicit), content_type='application/json')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertNotIn('baseline', response.json()['analysis'])
+
+
+class AnalysisWriterTests(TransactionTestCase):
+    def test_batches_are_written_with_results_and_baselines(self):
+        user = User.objects.create(username='wearer')
+        analysis = {'is_risky': True, 'risk_score': 0.8, 'threshold_used': 0.4, 'follow_up': 'How are you?'}
+        written_before = WRITE_BEHIND_RECORDS.value(outcome='written')
+        unknown_before = WRITE_BEHIND_RECORDS.value(outcome='dropped_unknown_user')
+
+        writer = AnalysisWriter(AnalysisWriterConfig(max_batch_size=3, flush_interval_ms=5))
+        for i in range(7):
+            self.assertTrue(writer.submit(str(user.public_id), dict(SAMPLE_INPUT, bmi_current=30.0 + i), analysis))
+        writer.submit('00000000-0000-0000-0000-000000000000', SAMPLE_INPUT, analysis)
+        writer.submit('not-a-uuid', SAMPLE_INPUT, analysis)
+        writer.close()
+
+        self.assertEqual(HealthLog.objects.filter(user=user).count(), 7)
+        self.assertEqual(AnomalyResult.objects.filter(log__user=user, domain='METABOLIC').count(), 7)
+        self.assertEqual(UserBaseline.objects.get(user=user).stats['bmi_current']['mean'], 33.0)
+        self.assertEqual(WRITE_BEHIND_RECORDS.value(outcome='written') - written_before, 7)
+        self.assertEqual(WRITE_BEHIND_RECORDS.value(outcome='dropped_unknown_user') - unknown_before, 2)
+        self.assertGreaterEqual(writer.stats()['batch_size']['count'], 3)
+
+    def test_bad_record_is_dropped_without_failing_its_batch(self):
+        user = User.objects.create(username='typo')
+        analysis = {'is_risky': False, 'risk_score': 0.1, 'threshold_used': 0.4, 'follow_up': ''}
+        invalid_before = WRITE_BEHIND_RECORDS.value(outcome='dropped_invalid')
+        error_before = WRITE_BEHIND_RECORDS.value(outcome='dropped_error')
+
+        writer = AnalysisWriter(AnalysisWriterConfig(max_batch_size=10, flush_interval_ms=50))
+        payloads = [SAMPLE_INPUT, dict(SAMPLE_INPUT, health_current='3.5'), dict(SAMPLE_INPUT, depression_current='low'),
+                    dict(SAMPLE_INPUT, region=['north']), dict(SAMPLE_INPUT, bmi_current='27.5')]
+        for payload in payloads:
+            writer.submit(str(user.public_id), payload, analysis)
+        writer.close()
+
+        stored = sorted(HealthLog.objects.filter(user=user).values_list('bmi_current', 'health_perception'))
+        self.assertEqual(stored, [(27.5, 4), (31.5, 3), (31.5, 4)])
+        self.assertEqual(AnomalyResult.objects.filter(log__user=user).count(), 3)
+        self.assertEqual(WRITE_BEHIND_RECORDS.value(outcome='dropped_invalid') - invalid_before, 2)
+        self.assertEqual(WRITE_BEHIND_RECORDS.value(outcome='dropped_error') - error_before, 0)
+
+
+class BulkIngestTests(TestCase):
+    def test_ndjson_and_json_uploads_match_single_row_scoring(self):
+        alice, bob = User.objects.create(username='alice'), User.objects.create(username='bob')
+        records = [
+            dict(SAMPLE_INPUT, public_id=str(alice.public_id), raw_text='Slept badly again.', typing_speed_wpm=41),
+            dict(SAMPLE_INPUT, public_id=str(bob.public_id), bmi_current=24.0, raw_text='Fine.'),
+            {'public_id': str(bob.public_id), 'bmi_current': 24.5, 'health_perception': 3, 'raw_text': 'No age given.'},
+            {'public_id': '00000000-0000-0000-0000-000000000000', 'bmi_current': 20.0},
+            {'public_id': str(alice.public_id), 'bmi_current': 'heavy'},
+        ]
+        body = '\n'.join(json.dumps(record) for record in records) + '\nnot json\n'
+        response = self.client.post('/api/logs/bulk/', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual((summary['received'], summary['inserted'], summary['scored'], summary['unscored']), (6, 3, 2, 1))
+        self.assertEqual([error['index'] for error in summary['errors']], [3, 4, 5])
+
+        expected = PredictPipeline().predict(records[0])['risk_score']
+        stored = AnomalyResult.objects.get(log__user=alice)
+        self.assertAlmostEqual(stored.risk_score, expected, places=6)
+        self.assertEqual(stored.domain, 'METABOLIC' if stored.risk_score >= PredictPipeline().threshold else 'NONE')
+        self.assertIsNotNone(stored.text_anomaly_score)
+        self.assertEqual(AnomalyResult.objects.filter(log__user=bob).count(), 2)
+        self.assertEqual(UserBaseline.objects.get(user=bob).log_count, 2)
+
+        response = self.client.post('/api/logs/bulk/', data=json.dumps({'records': records[1:2]}), content_type='application/json')
+        self.assertEqual(response.json()['inserted'], 1)
+        self.assertEqual(HealthLog.objects.filter(user=bob).count(), 3)
+
+    def test_non_finite_values_are_rejected_per_record(self):
+        user = User.objects.create(username='overflow')
+        records = [
+            dict(SAMPLE_INPUT, public_id=str(user.public_id), health_current=float('inf')),
+            dict(SAMPLE_INPUT, public_id=str(user.public_id), bmi_current='NaN'),
+            dict(SAMPLE_INPUT, public_id=str(user.public_id), typing_speed_wpm='-inf'),
+            dict(SAMPLE_INPUT, public_id=str(user.public_id)),
+        ]
+        # json.dumps writes inf as the Infinity literal, which json.loads reads back
+        response = self.client.post('/api/logs/bulk/', data=json.dumps(records), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual(summary['inserted'], 1)
+        self.assertEqual([error['index'] for error in summary['errors']], [0, 1, 2])
+
+
+class PatientTimelineTests(TestCase):
+    def setUp(self):
+        self.patient = User.objects.create(username='patient')
+        self.url = f'/api/patients/{self.patient.public_id}/timeline/'
+        logs = HealthLog.objects.bulk_create([HealthLog(user=self.patient, raw_text=f'day {i}') for i in range(12)])
+        # Shared timestamps so the id tie-break decides the order
+        for i, log in enumerate(logs):
+            HealthLog.objects.filter(pk=log.pk).update(timestamp=logs[0].timestamp.replace(minute=i // 3))
+        AnomalyResult.objects.create(log=logs[-1], risk_score=0.7, domain='METABOLIC', signal_explanation='x', ai_followup_question='y')
+
+    def test_pages_walk_the_history_newest_first_without_gaps(self):
+        self.client.force_login(User.objects.create(username='doctor', is_practitioner=True))
+        seen, cursor = [], None
+        while True:
+            # session, practitioner, patient, then one query for the page and its analyses
+            with self.assertNumQueries(4):
+                response = self.client.get(self.url, {'limit': 5, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            seen.extend(log['id'] for log in body['results'])
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+        expected = list(HealthLog.objects.filter(user=self.patient).order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        first = self.client.get(self.url, {'limit': 1}).json()['results'][0]
+        self.assertEqual(first['analysis']['domain'], 'METABOLIC')
+
+    def test_practitioner_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.client.force_login(self.patient)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class RiskRollupTests(TestCase):
+    def rollup_rows(self):
+        return sorted(
+            (row[:5], round(row[5], 9)) for row in RiskRollup.objects.values_list(
+                'granularity', 'bucket', 'domain', 'region', 'count', 'risk_sum')
+        )
+
+    def setUp(self):
+        user = User.objects.create(username='cohort')
+        records = [dict(SAMPLE_INPUT, public_id=str(user.public_id), bmi_current=22.0 + i, region=('north', 'south')[i % 2])
+                   for i in range(10)]
+        records.append({'public_id': str(user.public_id), 'bmi_current': 25.0, 'raw_text': 'No model inputs.'})
+        ingest_records(records, PredictPipeline())
+        log = HealthLog.objects.create(user=user, raw_text='clinic visit', region='north')
+        AnomalyResult.objects.create(log=log, risk_score=0.95, domain='CARDIO', is_emergency=True,
+                                     signal_explanation='x', ai_followup_question='y')
+
+    def test_incremental_rollups_match_rebuild(self):
+        incremental = self.rollup_rows()
+        # The text-only result of the unscored record has no risk_score and is not rolled up
+        self.assertEqual(AnomalyResult.objects.filter(risk_score__isnull=True).count(), 1)
+        self.assertEqual(sum(count for (granularity, *_, count), _ in incremental if granularity == 'day'),
+                         AnomalyResult.objects.filter(risk_score__isnull=False).count())
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_query_matches_group_by_over_results(self):
+        # Move half the history to yesterday and rebuild that range
+        day = HealthLog.objects.earliest('timestamp').timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+        HealthLog.objects.filter(region='south').update(timestamp=day - pd.Timedelta(hours=3))
+        call_command('rebuild_rollups', start=(day - pd.Timedelta(days=1)).isoformat(), end=(day + pd.Timedelta(days=1)).isoformat(),
+                     stdout=io.StringIO())
+
+        self.client.force_login(User.objects.create(username='analyst', is_practitioner=True))
+        response = self.client.get('/api/rollups/', {
+            'granularity': 'day', 'start': (day - pd.Timedelta(days=1)).date().isoformat(),
+            'end': (day + pd.Timedelta(days=1)).date().isoformat(), 'group_by': 'bucket,region',
+        })
+        self.assertEqual(response.status_code, 200)
+        rows = response.json()['results']
+        results = pd.DataFrame(AnomalyResult.objects.filter(risk_score__isnull=False).values('log__region', 'risk_score', 'is_emergency'))
+        expected = results.groupby('log__region').agg(count=('risk_score', 'size'), mean_risk=('risk_score', 'mean'),
+                                                     emergency_rate=('is_emergency', 'mean'))
+        self.assertEqual([row['region'] for row in rows], ['south', 'north'])
+        for row in rows:
+            self.assertEqual(row['count'], expected.loc[row['region'], 'count'])
+            self.assertAlmostEqual(row['mean_risk'], expected.loc[row['region'], 'mean_risk'])
+            self.assertAlmostEqual(row['emergency_rate'], expected.loc[row['region'], 'emergency_rate'])
+
+        total, = query_rollups('hour', day - pd.Timedelta(days=1), day + pd.Timedelta(days=1), group_by=())
+        self.assertEqual(total['count'], len(results))
+
+
+class BenchmarkUtilsTests(TestCase):
+    def test_summarize_reports_milliseconds(self):
+        samples = np.linspace(0.001, 0.1, 100)
+        summary = summarize(samples)
+        self.assertEqual(summary['n'], 100)
+        self.assertAlmostEqual(summary['p50_ms'], np.percentile(samples, 50) * 1000)
+        self.assertAlmostEqual(summary['p99_ms'], np.percentile(samples, 99) * 1000)
+        self.assertAlmostEqual(summary['ops_per_s'], 1 / samples.mean())
+        self.assertEqual(summarize([]), {'n': 0})
+
+    def test_compare_ignores_changes_below_noise_floor(self):
+        baseline = {'results': {'transform': {'p99_ms': 0.2, 'p50_ms': 0.1}, 'http': {'p99_ms': 10.0, 'n': 5}}}
+        current = {'results': {'transform': {'p99_ms': 0.236, 'p50_ms': 0.1}, 'http': {'p99_ms': 12.0, 'n': 9}}}
+        regressions = compare_results(current, baseline, tolerance=0.10)
+        self.assertEqual([r['metric'] for r in regressions], ['http.p99_ms'])
+        self.assertAlmostEqual(regressions[0]['change'], 0.2)
+        self.assertEqual(len(compare_results(current, baseline, tolerance=0.10, min_delta_ms=0)), 2)
+
+
+class AnalyzeEndpointTests(TestCase):
+    def test_analyze_returns_analysis(self):
+        response = self.client.post('/api/analyze/', data=json.dumps(SAMPLE_INPUT), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        analysis = response.json()['analysis']
+        self.assertIn('risk_score', analysis)
+        self.assertIn('follow_up', analysis)
+
+    def test_repeated_payload_served_from_cache(self):
+        body = json.dumps(dict(SAMPLE_INPUT, age=77.25))
+        first = self.client.post('/api/analyze/', data=body, content_type='application/json')
+        second = self.client.post('/api/analyze/', data=body, content_type='application/json')
+        self.assertFalse(first.has_header('X-Cache'))
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.json(), second.json())
+
+    def test_model_info_reports_versions(self):
+        response = self.client.get('/api/model/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('load_time_ms', response.json()['model'])
+
+    def test_batch_endpoint_reports_per_row_errors(self):
+        payloads = [SAMPLE_INPUT, dict(SAMPLE_INPUT, age=None), SAMPLE_INPUT]
+        response = self.client.post('/api/analyze/batch/', data=json.dumps(payloads), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([r['index'] for r in body['results']], [0, 2])
+        self.assertEqual([e['index'] for e in body['errors']], [1])
+        self.assertIn('categories', body['results'][0]['analysis'])
+
+    def test_batch_endpoint_rejects_malformed_columns(self):
+        columns = {name: [SAMPLE_INPUT[name]] * 2 for name in INPUT_FIELDS}
+        for bad, column in ((dict(columns, bmi_current=5), 'bmi_current'), (dict(columns, age=[62]), 'age')):
+            response = self.client.post('/api/analyze/batch/', data=json.dumps({'columns': bad}), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(f"'{column}'", response.json()['message'])
+
+    async def test_async_endpoint_matches_sync(self):
+        client = AsyncClient()
+        response = await client.post('/api/analyze/async/', data=json.dumps(SAMPLE_INPUT), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        analysis = response.json()['analysis']
+        self.assertAlmostEqual(analysis['risk_score'], PredictPipeline(scorer='native').predict(SAMPLE_INPUT)['risk_score'], places=6)
+        self.assertIn('follow_up', analysis)
+
+    def test_metrics_exports_stages_and_errors(self):
+        self.client.post('/api/analyze/', data=json.dumps(dict(SAMPLE_INPUT, age=66.5)), content_type='application/json')
+        self.client.post('/api/analyze/', data=json.dumps(dict(SAMPLE_INPUT, age=None)), content_type='application/json')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        for stage in ('parse', 'features', 'transform', 'predict_proba', 'categories', 'follow_up'):
+            self.assertIn(f'hea_stage_duration_seconds_count{{stage="{stage}"}}', body)
+        self.assertIn('hea_requests_total{endpoint="analyze",status="500"}', body)
+        self.assertIn('hea_request_errors_total{endpoint="analyze",exception="TypeError"}', body)
+        self.assertIn('hea_model_load_seconds', body)
+
+    @override_settings(HEA_COALESCE_PREDICTIONS=True, HEA_RESULT_CACHE=False)
+    def test_runtime_latency_histograms_are_in_seconds(self):
+        self.client.post('/api/analyze/', data=json.dumps(SAMPLE_INPUT), content_type='application/json')
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('hea_coalescer_queue_wait_seconds_bucket{le="0.0001"}', body)
+        self.assertIn('hea_coalescer_batch_seconds_count', body)
+        self.assertNotIn('milliseconds', body)
+        stats = self.client.get('/api/model/').json()['coalescer']
+        self.assertLess(stats['batch_latency_seconds']['sum'], 5)
@@ -0,0 +1,36 @@
+from .models import AnomalyResult
+from src.hea_health_signals.pipelines.text_anomaly import get_text_anomaly_scorer
+
+TEXT_FLAG_EXPLANATION = "Diary wording is unusual compared with typical entries (text anomaly score {score:.2f})."
+TEXT_FLAG_FOLLOWUP = "Today's entry reads a little differently from usual. Would you like to share more about how you've been feeling?"
+
+
+def score_log_texts(log_texts, scorer=None):
+    """
+    Scores a batch of (log_id, raw_text) pairs and stores text_anomaly_score
+    on each log's AnomalyResult with a single upsert: logs without a result
+    get a text-only one (no risk_score, so the risk rollups leave it out),
+    existing results only have text_anomaly_score overwritten. Returns the
+    number of logs written.
+    """
+    log_texts = list(log_texts)
+    if not log_texts:
+        return 0
+    scorer = scorer or get_text_anomaly_scorer()
+    scores, flagged = scorer.score([text for _, text in log_texts])
+
+    results = [
+        AnomalyResult(
+            log_id=log_id,
+            text_anomaly_score=score,
+            domain='NONE',
+            signal_explanation=TEXT_FLAG_EXPLANATION.format(score=score) if is_flagged else '',
+            ai_followup_question=TEXT_FLAG_FOLLOWUP if is_flagged else '',
+        )
+        for (log_id, _), score, is_flagged in zip(log_texts, scores.tolist(), flagged.tolist())
+    ]
+    # INSERT ... ON CONFLICT (log_id) DO UPDATE SET text_anomaly_score
+    AnomalyResult.objects.bulk_create(
+        results, update_conflicts=True, unique_fields=['log'], update_fields=['text_anomaly_score']
+    )
+    return len(results)
@@ -0,0 +1,43 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+from .models import HealthLog
+from .serializers import HealthLogSerializer
+
+
+def encode_cursor(log):
+    """Opaque cursor for the position just after this log (newest-first order)."""
+    raw = f"{log.timestamp.isoformat()}|{log.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(timestamp, id) of an encode_cursor value; ValueError when it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def timeline_page(user, cursor=None, limit=50):
+    """
+    One page of the user's logs, newest first, with their analyses.
+    Keyset pagination on (timestamp, id): the next page starts strictly
+    after the last row returned, so every page is an index range scan on
+    healthlog_user_timeline_idx plus limit + 1 rows, however deep it is.
+    The analysis comes along in the same query (select_related).
+    Returns (serialized logs, next cursor or None).
+    """
+    logs = HealthLog.objects.filter(user=user)
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        # timestamp <= t bounds the index range; the OR only trims the rows sharing t
+        logs = logs.filter(Q(timestamp__lt=timestamp) | Q(id__lt=pk), timestamp__lte=timestamp)
+    page = list(logs.select_related('analysis').order_by('-timestamp', '-id')[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return HealthLogSerializer(page[:limit], many=True).data, next_cursor
@@ -4,4 +4,11 @@ from . import views
 urlpatterns = [
     path('', views.index, name='index'),
     path('api/analyze/', views.analyze_signals, name='analyze_signals'),
+    path('api/analyze/async/', views.analyze_signals_async, name='analyze_signals_async'),
+    path('api/analyze/batch/', views.analyze_signals_batch, name='analyze_signals_batch'),
+    path('api/logs/bulk/', views.ingest_logs, name='ingest_logs'),
+    path('api/patients/<uuid:public_id>/timeline/', views.patient_timeline, name='patient_timeline'),
+    path('api/rollups/', views.risk_rollups, name='risk_rollups'),
+    path('api/model/', views.model_info, name='model_info'),
+    path('metrics', views.metrics, name='metrics'),
 ]
\ No newline at end of file
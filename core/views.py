@@ -1,37 +1,447 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings
+from .baselines import baseline_stats, abaseline_stats
+from .analysis_writer import AnalysisWriterConfig, get_analysis_writer
+from .ingest import parse_records, ingest_records
+from .models import User
+from .timeline import timeline_page
+from .rollups import GROUP_FIELDS, parse_bound, query_rollups
 import json
 import sys
 import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Ensure we can find the src folder
 sys.path.append(os.getcwd())
-from src.hea_health_signals.pipelines.prediction_pipeline import PredictPipeline
+from src.hea_health_signals.pipelines.prediction_pipeline import (
+    PredictPipeline, INPUT_FIELDS, BASELINE_FIELDS, batch_rows, parse_batch, fill_from_baseline
+)
+from src.hea_health_signals.pipelines.model_registry import get_model_registry
+from src.hea_health_signals.pipelines.batch_coalescer import CoalescerConfig, CoalescerOverloaded, get_prediction_coalescer
+from src.hea_health_signals.pipelines.result_cache import get_analysis_cache
+from src.hea_health_signals.pipelines.cascade_ensemble import cascade_stats
+from src.hea_health_signals.exception import CustomException
+from src.hea_health_signals.utils.metrics import METRICS, STAGE_SECONDS, histogram_samples
+
+REQUESTS = METRICS.counter('hea_requests_total', 'HTTP requests by endpoint and status code.', ('endpoint', 'status'))
+REQUEST_ERRORS = METRICS.counter('hea_request_errors_total', 'Failed requests by endpoint and exception type.', ('endpoint', 'exception'))
+REQUEST_SECONDS = METRICS.histogram('hea_request_duration_seconds', 'End-to-end view latency.', labelnames=('endpoint',))
+PARSE_STAGE = STAGE_SECONDS.labels(stage='parse')
+CACHE_STAGE = STAGE_SECONDS.labels(stage='cache_lookup')
+CATEGORIES_STAGE = STAGE_SECONDS.labels(stage='categories')
+FOLLOW_UP_STAGE = STAGE_SECONDS.labels(stage='follow_up')
+BASELINE_STAGE = STAGE_SECONDS.labels(stage='baseline_lookup')
+
+def instrumented(endpoint):
+    """Records latency and status-code counts for a sync or async view."""
+    def decorator(view):
+        timer = REQUEST_SECONDS.labels(endpoint=endpoint)
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                with timer.time():
+                    response = await view(request, *args, **kwargs)
+                REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+                return response
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with timer.time():
+                response = view(request, *args, **kwargs)
+            REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+            return response
+        return wrapper
+    return decorator
+
+def record_error(endpoint, error):
+    # PredictPipeline wraps failures in CustomException; label with the original type
+    if isinstance(error, CustomException) and error.args and isinstance(error.args[0], BaseException):
+        error = error.args[0]
+    REQUEST_ERRORS.inc(endpoint=endpoint, exception=type(error).__name__)
+
+def build_pipeline():
+    return PredictPipeline(
+        scorer=getattr(settings, 'HEA_SCORER', 'xgboost'),
+        ensemble=getattr(settings, 'HEA_ENSEMBLE', False),
+        ensemble_band=getattr(settings, 'HEA_ENSEMBLE_BAND', 0.1),
+    )
+
+def get_coalescer():
+    return get_prediction_coalescer(build_pipeline, CoalescerConfig(
+        max_batch_size=getattr(settings, 'HEA_COALESCE_MAX_BATCH', 64),
+        max_wait_ms=getattr(settings, 'HEA_COALESCE_MAX_WAIT_MS', 2.0),
+    ))
+
+def get_result_cache():
+    if not getattr(settings, 'HEA_RESULT_CACHE', False):
+        return None
+    return get_analysis_cache(
+        max_entries=getattr(settings, 'HEA_RESULT_CACHE_SIZE', 10000),
+        ttl_seconds=getattr(settings, 'HEA_RESULT_CACHE_TTL', 300),
+    )
+
+def needs_baseline(data):
+    """True when the payload names a user and leaves a *_past field for the baseline to fill."""
+    return bool(data.get('public_id')) and any(data.get(field) in (None, '') for field in BASELINE_FIELDS)
+
+def get_writer():
+    return get_analysis_writer(AnalysisWriterConfig(
+        max_batch_size=getattr(settings, 'HEA_PERSIST_MAX_BATCH', 500),
+        flush_interval_ms=getattr(settings, 'HEA_PERSIST_FLUSH_MS', 1000.0),
+        max_queue_size=getattr(settings, 'HEA_PERSIST_MAX_QUEUE', 10000),
+    ))
+
+def persist_analysis(data, analysis, timeout_ms=None):
+    """Hands the analysis to the write-behind writer; only payloads naming a user (public_id) become a HealthLog."""
+    if getattr(settings, 'HEA_PERSIST_ANALYSES', False) and data.get('public_id'):
+        get_writer().submit(data['public_id'], data, analysis, timeout_ms)
+
+def overloaded_response(error):
+    response = JsonResponse({'status': 'error', 'message': str(error)}, status=503)
+    response['Retry-After'] = str(getattr(settings, 'HEA_OVERLOAD_RETRY_AFTER', 1))
+    return response
+
+def with_baseline(analysis, filled):
+    """
+    Response copy of analysis naming the *_past values filled from this
+    user's baseline. Cached results never carry them: the cache key only
+    sees the filled values, so another request can hit the same entry.
+    """
+    return {**analysis, 'baseline': filled} if filled else analysis
+
+def cached_response(analysis):
+    response = JsonResponse({'status': 'success', 'analysis': analysis})
+    response['X-Cache'] = 'HIT'
+    return response
+
+_inference_executor = None
+_inference_executor_lock = threading.Lock()
+
+def get_inference_executor():
+    """Bounded pool the async views hand blocking model work to."""
+    global _inference_executor
+    if _inference_executor is None:
+        with _inference_executor_lock:
+            if _inference_executor is None:
+                _inference_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'HEA_INFERENCE_THREADS', 4),
+                    thread_name_prefix='hea-inference',
+                )
+    return _inference_executor
 
 def index(request):
     return render(request, 'index.html')
 
+def score_domains(result, data):
+    # 1. Add Multi-Domain Risk scoring (Requirement)
+    return {
+        'metabolic': round(result['risk_score'] * 100, 1),
+        'psycho_emotional': round(float(data['depression_current']) * 12.5, 1),
+        'cardiovascular': 75.0 if int(data['high_bp']) == 1 else 20.0
+    }
+
+def add_domain_insights(pipeline, result, data):
+    with CATEGORIES_STAGE.time():
+        result['categories'] = score_domains(result, data)
+
+    # 2. Add Empathetic Follow-up (Requirement)
+    with FOLLOW_UP_STAGE.time():
+        result['follow_up'] = pipeline.get_empathetic_followup(result, data)
+    return result
+
 @csrf_exempt
+@instrumented('analyze')
 def analyze_signals(request):
     if request.method == 'POST':
         try:
-            data = json.loads(request.body)
-            pipeline = PredictPipeline()
-            result = pipeline.predict(data)
-            
-            # 1. Add Multi-Domain Risk scoring (Requirement)
-            result['categories'] = {
-                'metabolic': round(result['risk_score'] * 100, 1),
-                'psycho_emotional': round(float(data['depression_current']) * 12.5, 1),
-                'cardiovascular': 75.0 if int(data['high_bp']) == 1 else 20.0
-            }
-            
-            # 2. Add Empathetic Follow-up (Requirement)
-            result['follow_up'] = pipeline.get_empathetic_followup(result, data)
+            with PARSE_STAGE.time():
+                data = json.loads(request.body)
+            filled = {}
+            if needs_baseline(data):
+                with BASELINE_STAGE.time():
+                    data, filled = fill_from_baseline(data, baseline_stats(data['public_id']))
+            pipeline = build_pipeline()
+
+            with CACHE_STAGE.time():
+                cache = get_result_cache()
+                cache_key = cache.make_key(data, pipeline.model_version) if cache else None
+                cached = cache.get(cache_key) if cache else None
+            if cached is not None:
+                persist_analysis(data, cached)
+                return cached_response(with_baseline(cached, filled))
+
+            if getattr(settings, 'HEA_COALESCE_PREDICTIONS', False):
+                result = get_coalescer().predict(data, timeout=getattr(settings, 'HEA_COALESCE_TIMEOUT', 5.0))
+            else:
+                result = pipeline.predict(data)
+            result = add_domain_insights(pipeline, result, data)
+            if cache:
+                cache.put(cache_key, result)
+            persist_analysis(data, result)
             
-            return JsonResponse({'status': 'success', 'analysis': result})
+            return JsonResponse({'status': 'success', 'analysis': with_baseline(result, filled)})
+        except CoalescerOverloaded as e:
+            record_error('analyze', e)
+            return overloaded_response(e)
         except Exception as e:
+            record_error('analyze', e)
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
     
-    return JsonResponse({'status': 'error', 'message': 'Only POST allowed'}, status=405)
\ No newline at end of file
+    return JsonResponse({'status': 'error', 'message': 'Only POST allowed'}, status=405)
+
+@csrf_exempt
+@instrumented('analyze_async')
+async def analyze_signals_async(request):
+    """
+    ASGI variant of analyze_signals: parsing and response building stay on the
+    event loop, predict and the follow-up run on the bounded inference pool.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Only POST allowed'}, status=405)
+
+    try:
+        with PARSE_STAGE.time():
+            data = json.loads(request.body)
+        filled = {}
+        if needs_baseline(data):
+            with BASELINE_STAGE.time():
+                data, filled = fill_from_baseline(data, await abaseline_stats(data['public_id']))
+        loop = asyncio.get_running_loop()
+        executor = get_inference_executor()
+        pipeline = build_pipeline()
+
+        with CACHE_STAGE.time():
+            cache = get_result_cache()
+            cache_key = cache.make_key(data, pipeline.model_version) if cache else None
+            cached = cache.get(cache_key) if cache else None
+        if cached is not None:
+            persist_analysis(data, cached, timeout_ms=0)
+            return cached_response(with_baseline(cached, filled))
+
+        if getattr(settings, 'HEA_COALESCE_PREDICTIONS', False):
+            # The coalescer already runs inference on its own thread
+            result = await asyncio.wrap_future(get_coalescer().submit(data))
+        else:
+            result = await loop.run_in_executor(executor, pipeline.predict, data)
+
+        with CATEGORIES_STAGE.time():
+            result['categories'] = score_domains(result, data)
+        with FOLLOW_UP_STAGE.time():
+            result['follow_up'] = await loop.run_in_executor(executor, pipeline.get_empathetic_followup, result, data)
+        if cache:
+            cache.put(cache_key, result)
+        # Never block the event loop on a full write-behind queue
+        persist_analysis(data, result, timeout_ms=0)
+
+        return JsonResponse({'status': 'success', 'analysis': with_baseline(result, filled)})
+    except CoalescerOverloaded as e:
+        record_error('analyze_async', e)
+        return overloaded_response(e)
+    except Exception as e:
+        record_error('analyze_async', e)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@csrf_exempt
+@instrumented('analyze_batch')
+def analyze_signals_batch(request):
+    """
+    Scores a cohort in one call. Body is a JSON list of analyze payloads,
+    {"records": [...]} or columnar {"columns": {"bmi_current": [...], ...}}.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Only POST allowed'}, status=405)
+
+    try:
+        with PARSE_STAGE.time():
+            body = json.loads(request.body)
+        if isinstance(body, dict):
+            inputs = body.get('columns', body.get('records'))
+        else:
+            inputs = body
+        if inputs is None:
+            return JsonResponse({'status': 'error', 'message': "Expected a list, 'records' or 'columns'"}, status=400)
+
+        n_rows = batch_rows(inputs)
+        max_rows = getattr(settings, 'HEA_BATCH_MAX_ROWS', 10000)
+        if n_rows > max_rows:
+            return JsonResponse({'status': 'error', 'message': f'Batch too large ({n_rows} > {max_rows} rows)'}, status=413)
+
+        pipeline = build_pipeline()
+        raw, errors = parse_batch(inputs)
+        results, errors = pipeline.predict_raw(raw, errors)
+
+        analyses = []
+        for i, result in enumerate(results):
+            if result is None:
+                continue
+            data = dict(zip(INPUT_FIELDS, raw[i].tolist()))
+            analyses.append({'index': i, 'analysis': add_domain_insights(pipeline, result, data)})
+
+        return JsonResponse({'status': 'success', 'count': n_rows, 'results': analyses, 'errors': errors})
+    except ValueError as e:
+        record_error('analyze_batch', e)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        record_error('analyze_batch', e)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@csrf_exempt
+@instrumented('ingest_logs')
+def ingest_logs(request):
+    """
+    Bulk HealthLog upload for device gateways and clinic syncs. Body is
+    NDJSON (one record per line) or a JSON array / {"records": [...]};
+    each record has a public_id, the HealthLog signals (bmi_current,
+    health_perception or health_current, depression_index or
+    depression_current, typing_speed_wpm, raw_text) and optionally the
+    remaining analyze inputs. Records with every model input are scored.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Only POST allowed'}, status=405)
+
+    try:
+        with PARSE_STAGE.time():
+            records, parse_errors = parse_records(request.body, request.content_type or '')
+        n_rows = len(records) + len(parse_errors)
+        max_rows = getattr(settings, 'HEA_INGEST_MAX_ROWS', 10000)
+        if n_rows > max_rows:
+            return JsonResponse({'status': 'error', 'message': f'Upload too large ({n_rows} > {max_rows} records)'}, status=413)
+
+        summary = ingest_records(records, build_pipeline())
+        summary['received'] = n_rows
+        summary['errors'] = sorted(parse_errors + summary['errors'], key=lambda error: error['index'])
+        return JsonResponse({'status': 'success', **summary})
+    except (ValueError, UnicodeDecodeError) as e:
+        record_error('ingest_logs', e)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        record_error('ingest_logs', e)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@instrumented('patient_timeline')
+def patient_timeline(request, public_id):
+    """
+    A patient's HealthLogs with their analyses, newest first, for
+    practitioners. Pass the returned next_cursor as ?cursor= for the next
+    page; ?limit= sets the page size (up to HEA_TIMELINE_MAX_LIMIT).
+    """
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'message': 'Only GET allowed'}, status=405)
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'Authentication required'}, status=401)
+    if not request.user.is_practitioner:
+        return JsonResponse({'status': 'error', 'message': 'Practitioner access only'}, status=403)
+
+    try:
+        limit = int(request.GET.get('limit', 50))
+        max_limit = getattr(settings, 'HEA_TIMELINE_MAX_LIMIT', 200)
+        if not 1 <= limit <= max_limit:
+            raise ValueError(f"limit must be between 1 and {max_limit}")
+        patient = User.objects.filter(public_id=public_id).first()
+        if patient is None:
+            return JsonResponse({'status': 'error', 'message': 'Unknown patient'}, status=404)
+
+        logs, next_cursor = timeline_page(patient, request.GET.get('cursor'), limit)
+        return JsonResponse({'status': 'success', 'results': logs, 'next_cursor': next_cursor})
+    except ValueError as e:
+        record_error('patient_timeline', e)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        record_error('patient_timeline', e)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+def parse_time_param(request, name):
+    value = request.GET.get(name)
+    if not value:
+        raise ValueError(f"'{name}' is required (ISO date or datetime)")
+    return parse_bound(value)
+
+@instrumented('risk_rollups')
+def risk_rollups(request):
+    """
+    Population dashboard figures from the hour/day risk rollups: count,
+    mean risk_score and emergency rate for buckets in [start, end),
+    grouped by any of bucket, domain and region (?group_by=domain,region)
+    and optionally filtered by ?domain= and ?region=.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'message': 'Only GET allowed'}, status=405)
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'Authentication required'}, status=401)
+    if not request.user.is_practitioner:
+        return JsonResponse({'status': 'error', 'message': 'Practitioner access only'}, status=403)
+
+    try:
+        group_by = request.GET.get('group_by')
+        group_by = tuple(field for field in group_by.split(',') if field) if group_by is not None else GROUP_FIELDS
+        rows = query_rollups(
+            request.GET.get('granularity', 'day'),
+            parse_time_param(request, 'start'),
+            parse_time_param(request, 'end'),
+            domain=request.GET.get('domain'),
+            region=request.GET.get('region'),
+            group_by=group_by,
+        )
+        return JsonResponse({'status': 'success', 'results': rows})
+    except ValueError as e:
+        record_error('risk_rollups', e)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        record_error('risk_rollups', e)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+def model_info(request):
+    """Load time and artifact versions of the warm-loaded model."""
+    try:
+        payload = {'status': 'success', 'model': get_model_registry().info()}
+        if getattr(settings, 'HEA_COALESCE_PREDICTIONS', False):
+            payload['coalescer'] = get_coalescer().stats()
+        cache = get_result_cache()
+        if cache:
+            payload['result_cache'] = cache.stats()
+        if getattr(settings, 'HEA_ENSEMBLE', False):
+            payload['cascade'] = cascade_stats()
+        if getattr(settings, 'HEA_PERSIST_ANALYSES', False):
+            payload['write_behind'] = get_writer().stats()
+        return JsonResponse(payload)
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+def collect_runtime_metrics():
+    """Prometheus collector for the result cache, the prediction coalescer and the write-behind queue."""
+    families = []
+    cache = get_result_cache()
+    if cache:
+        stats = cache.stats()
+        families.append(('hea_result_cache_events_total', 'counter', 'Analysis cache lookups and removals.', [
+            ('hea_result_cache_events_total', {'event': event}, stats[event])
+            for event in ('hits', 'misses', 'evictions', 'expirations', 'invalidations')
+        ]))
+        families.append(('hea_result_cache_entries', 'gauge', 'Analyses currently cached.', [
+            ('hea_result_cache_entries', {}, stats['entries'])
+        ]))
+    if getattr(settings, 'HEA_COALESCE_PREDICTIONS', False):
+        coalescer = get_coalescer()
+        families.append(('hea_coalescer_batch_size', 'histogram', 'Payloads per coalesced predict_batch call.',
+                         list(histogram_samples('hea_coalescer_batch_size', coalescer.batch_size))))
+        families.append(('hea_coalescer_queue_wait_seconds', 'histogram', 'Time payloads wait before their batch runs.',
+                         list(histogram_samples('hea_coalescer_queue_wait_seconds', coalescer.queue_wait_seconds))))
+        families.append(('hea_coalescer_batch_seconds', 'histogram', 'Time to score one coalesced batch.',
+                         list(histogram_samples('hea_coalescer_batch_seconds', coalescer.batch_latency_seconds))))
+    if getattr(settings, 'HEA_PERSIST_ANALYSES', False):
+        families.append(('hea_write_behind_queue_depth', 'gauge', 'Analyses waiting to be written.', [
+            ('hea_write_behind_queue_depth', {}, get_writer().stats()['queue_depth'])
+        ]))
+    return families
+
+METRICS.register_collector(collect_runtime_metrics)
+
+def metrics(request):
+    """Prometheus text exposition of request, stage, cache and model metrics."""
+    return HttpResponse(METRICS.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
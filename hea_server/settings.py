@@ -124,4 +124,52 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
-AUTH_USER_MODEL = 'core.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'core.User'
+
+# Hea inference settings
+# Load model.pkl / preprocessor.pkl / threshold.txt once at startup (CoreConfig.ready)
+HEA_WARM_LOAD_MODELS = True
+
+# Maximum rows accepted by /api/analyze/batch/ in one request
+HEA_BATCH_MAX_ROWS = 10000
+# Maximum records accepted by /api/logs/bulk/ in one upload
+HEA_INGEST_MAX_ROWS = 10000
+# Largest page size of /api/patients/<public_id>/timeline/
+HEA_TIMELINE_MAX_LIMIT = 200
+
+# Tree scorer used by PredictPipeline: 'xgboost' (predict_proba) or 'native' (flat-array evaluator)
+HEA_SCORER = 'native'
+
+# Cascade ensemble: rows whose XGBoost score is within HEA_ENSEMBLE_BAND of the
+# threshold are rescored with the LightGBM/CatBoost members found in artifacts/
+HEA_ENSEMBLE = False
+HEA_ENSEMBLE_BAND = 0.1
+
+# Micro-batch concurrent /api/analyze/ calls into one predict_batch
+# (useful with threaded/ASGI workers; a sync worker only ever has one request in flight)
+HEA_COALESCE_PREDICTIONS = False
+HEA_COALESCE_MAX_BATCH = 64
+HEA_COALESCE_MAX_WAIT_MS = 2.0
+# Seconds a sync analyze call waits for its coalesced prediction before answering 503
+HEA_COALESCE_TIMEOUT = 5.0
+# Retry-After (seconds) sent with the 503 returned when the coalescer queue is full
+HEA_OVERLOAD_RETRY_AFTER = 1
+
+# Threads the async analyze view (api/analyze/async/) uses for model work
+HEA_INFERENCE_THREADS = 4
+
+# LRU + TTL cache of full analyses, keyed on the 8 inputs + model version
+HEA_RESULT_CACHE = True
+HEA_RESULT_CACHE_SIZE = 10000
+HEA_RESULT_CACHE_TTL = 300
+
+# Smoothing factor of the per-user EWMA baseline (UserBaseline); higher follows recent logs faster.
+# /api/analyze/ fills missing *_past fields from it when the payload carries a public_id
+HEA_BASELINE_EWMA_ALPHA = 0.3
+
+# Record analyses that carry a public_id as HealthLog + AnomalyResult, written behind the
+# request in batches (one bulk_create transaction per HEA_PERSIST_MAX_BATCH or HEA_PERSIST_FLUSH_MS)
+HEA_PERSIST_ANALYSES = True
+HEA_PERSIST_MAX_BATCH = 500
+HEA_PERSIST_FLUSH_MS = 1000.0
+HEA_PERSIST_MAX_QUEUE = 10000
@@ -9,26 +9,42 @@ DATA_PATH = r"..\Datasets\randhrs1992_2022v1.dta"
 # If the folder is actually inside src, keep it as:
 # DATA_PATH = r"Datasets\randhrs1992_2022v1.dta"
 
-def load_rand_data(filepath):
+def load_rand_data(filepath, columns=None, chunksize=None):
+    """
+    Returns (df, variable_labels) from a single StataReader.
+    Pass columns to decode only what you need; with chunksize the file is
+    read chunk by chunk and df is an iterator of DataFrames instead.
+    """
     print(f"Loading from: {os.path.abspath(filepath)}")
-    print("This takes memory! Please wait...")
-    
+
     # Check if file exists first to avoid confusing errors
     if not os.path.exists(filepath):
         print(f"ERROR: File not found at {filepath}")
         print("Current working directory is:", os.getcwd())
         return None, None
 
-    # Load Data
-    df = pd.read_stata(filepath)
-    
-    # Get labels using an iterator to avoid re-reading the whole file
-    reader = pd.io.stata.StataReader(filepath)
+    reader = pd.read_stata(filepath, columns=columns, iterator=True)
+    # Labels come from the header, so read them from the same reader
     variable_labels = reader.variable_labels()
-    
+
+    if chunksize is not None:
+        return iter_chunks(reader, chunksize), variable_labels
+
+    print("This takes memory! Please wait...")
+    with reader:
+        df = reader.read()
+
     print(f"SUCCESS: Loaded {df.shape[0]} people and {df.shape[1]} variables.")
     return df, variable_labels
 
+def iter_chunks(reader, chunksize):
+    with reader:
+        while True:
+            try:
+                yield reader.get_chunk(chunksize)
+            except StopIteration:
+                return
+
 if __name__ == "__main__":
     df, labels = load_rand_data(DATA_PATH)
     
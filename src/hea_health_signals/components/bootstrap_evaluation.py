@@ -0,0 +1,231 @@
+import os
+import sys
+import json
+import time
+from datetime import datetime
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src.hea_health_signals.exception import CustomException
+from src.hea_health_signals.logger import logging
+
+METRIC_NAMES = ('fbeta', 'pr_auc', 'roc_auc')
+
+# Upper edges are exclusive: <55, 55-64, 65-74, 75+
+DEFAULT_AGE_BINS = (55, 65, 75)
+
+
+@dataclass
+class BootstrapEvaluationConfig:
+    n_replicates: int = 2000
+    confidence: float = 0.95
+    beta: float = 2.0
+    # Replicates per task; bounds each worker's (chunk, n) weight matrix
+    chunk_size: int = 200
+    max_workers: int = None
+    random_state: int = 42
+    # Subgroups smaller than this are reported without intervals
+    min_group_size: int = 30
+    age_bins: tuple = DEFAULT_AGE_BINS
+    report_path: str = os.path.join('artifacts', 'evaluation_report.json')
+
+
+def age_bands(ages, bins=DEFAULT_AGE_BINS):
+    """Labels like '<55', '55-64', '75+' for each age."""
+    labels = [f"<{bins[0]}"] + [f"{low}-{high - 1}" for low, high in zip(bins[:-1], bins[1:])] + [f"{bins[-1]}+"]
+    return np.asarray(labels, dtype=object)[np.digitize(np.asarray(ages, dtype=np.float64), bins)]
+
+
+def audit_groups(frame, bins=DEFAULT_AGE_BINS, gender_column='ragender', age_column='r10agey_e'):
+    """{'ragender': labels, 'age_band': labels} for the rows of a split frame (columns that exist)."""
+    groups = {}
+    if gender_column in frame:
+        groups[gender_column] = np.asarray(frame[gender_column]).astype(np.int64).astype(str)
+    if age_column in frame:
+        groups['age_band'] = age_bands(frame[age_column], bins)
+    return groups
+
+
+def bootstrap_weights(rng, n, n_replicates):
+    """
+    Resamples as an (n_replicates, n) index matrix and turns it into counts:
+    weights[b, i] is how often row i was drawn in replicate b. The metrics
+    below work on these weights, so no resampled copy of the data is built.
+    Counts are exact in float32 up to 2**24 rows.
+    """
+    idx = rng.integers(0, n, size=(n_replicates, n))
+    offsets = (np.arange(n_replicates) * n)[:, None]
+    counts = np.bincount((idx + offsets).ravel(), minlength=n_replicates * n)
+    return counts.reshape(n_replicates, n).astype(np.float32)
+
+
+def weighted_metrics(y, scores, threshold, weights, beta=2.0):
+    """
+    F-beta at "score >= threshold", average precision (PR-AUC, as in
+    sklearn's average_precision_score) and ROC-AUC for each row of weights,
+    with tied scores handled like sklearn. Rows must be sorted by
+    descending score. Replicates without positives (or negatives) get NaN
+    for the AUCs. Returns an (n_replicates, 3) array in METRIC_NAMES order.
+    """
+    y = np.asarray(y) == 1
+    # Cumulative weights along the score order give every threshold's counts at once
+    total_cum = np.cumsum(weights, axis=1, dtype=np.float32)
+    tp_cum = np.cumsum(weights * y, axis=1, dtype=np.float32)
+    positive_weight = tp_cum[:, -1].astype(np.float64)
+    negative_weight = total_cum[:, -1].astype(np.float64) - positive_weight
+
+    # The flagged rows are a prefix of the sorted order
+    flagged = int(np.searchsorted(-scores, -threshold, side='right'))
+    tp = tp_cum[:, flagged - 1].astype(np.float64) if flagged else np.zeros(weights.shape[0])
+    fp = total_cum[:, flagged - 1].astype(np.float64) - tp if flagged else np.zeros(weights.shape[0])
+    fn = positive_weight - tp
+    beta2 = beta * beta
+    denominator = (1 + beta2) * tp + beta2 * fn + fp
+    fbeta = np.divide((1 + beta2) * tp, denominator, out=np.zeros_like(tp), where=denominator > 0)
+
+    # Counts at the last position of each run of tied scores
+    last = np.r_[np.flatnonzero(np.diff(scores)), scores.size - 1]
+    tp_at = tp_cum[:, last]
+    total_at = total_cum[:, last]
+    tp_step = np.diff(tp_at, axis=1, prepend=np.float32(0))
+    fp_step = np.diff(total_at, axis=1, prepend=np.float32(0)) - tp_step
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Leading groups with no weight have tp_step = 0, so their precision never counts
+        precision = tp_at / np.maximum(total_at, 1)
+        pr_auc = np.einsum('ij,ij->i', tp_step, precision, dtype=np.float64) / positive_weight
+        # Trapezoids under the ROC staircase: each negative step times the mean TP height across it
+        tp_mid = tp_at - tp_step / 2
+        roc_auc = np.einsum('ij,ij->i', fp_step, tp_mid, dtype=np.float64) / (positive_weight * negative_weight)
+
+    pr_auc[positive_weight == 0] = np.nan
+    roc_auc[(positive_weight == 0) | (negative_weight == 0)] = np.nan
+    return np.column_stack([fbeta, pr_auc, roc_auc])
+
+
+# Set once per worker process by _init_worker so the arrays are not re-pickled per task
+_worker_data = {}
+
+
+def _init_worker(y, scores, threshold, segments, beta):
+    _worker_data.update(y=y, scores=scores, threshold=threshold, segments=segments, beta=beta)
+
+
+def _run_chunk(segment, seed, n_replicates):
+    rows = _worker_data['segments'][segment]
+    weights = bootstrap_weights(np.random.default_rng(seed), rows.size, n_replicates)
+    metrics = weighted_metrics(_worker_data['y'][rows], _worker_data['scores'][rows],
+                               _worker_data['threshold'], weights, _worker_data['beta'])
+    return segment, metrics
+
+
+class BootstrapEvaluator:
+    """
+    Bootstrap confidence intervals for F-beta (at the served threshold),
+    PR-AUC and ROC-AUC, overall and for each subgroup. Every segment is
+    resampled within itself. Replicates are split into seeded chunks and
+    run on a process pool; chunk seeds come from one SeedSequence, so the
+    result does not depend on the number of workers.
+    """
+    def __init__(self, config=None):
+        self.config = config or BootstrapEvaluationConfig()
+
+    def segments(self, n, groups=None):
+        segments = {'overall': np.arange(n)}
+        for name, labels in (groups or {}).items():
+            labels = np.asarray(labels)
+            for value in sorted(set(labels.tolist()), key=str):
+                segments[f"{name}={value}"] = np.flatnonzero(labels == value)
+        return segments
+
+    def summarize(self, estimate, replicates):
+        alpha = (1 - self.config.confidence) / 2
+        summary = {}
+        for j, name in enumerate(METRIC_NAMES):
+            values = replicates[:, j] if replicates is not None else np.empty(0)
+            values = values[~np.isnan(values)]
+            summary[name] = {
+                'estimate': None if np.isnan(estimate[j]) else float(estimate[j]),
+                'low': float(np.quantile(values, alpha)) if values.size else None,
+                'high': float(np.quantile(values, 1 - alpha)) if values.size else None,
+                'std': float(values.std(ddof=1)) if values.size > 1 else None,
+                'replicates': int(values.size),
+            }
+        return summary
+
+    def evaluate(self, y, scores, threshold, groups=None):
+        """
+        y, scores: labels and model probabilities; groups: {name: label per row}.
+        Returns the report dict (also the JSON written by write_report).
+        """
+        try:
+            cfg = self.config
+            started = time.perf_counter()
+            # Sorted by descending score once; every segment keeps that order
+            scores = np.asarray(scores, dtype=np.float64).ravel()
+            order = np.argsort(-scores, kind='mergesort')
+            scores = scores[order]
+            y = np.asarray(y, dtype=np.float64).ravel()[order]
+            groups = {name: np.asarray(labels)[order] for name, labels in (groups or {}).items()}
+            segments = self.segments(y.size, groups)
+
+            # Segments large enough for intervals get their replicates split into seeded chunks
+            tasks = []
+            seeds = iter(np.random.SeedSequence(cfg.random_state).spawn(
+                len(segments) * -(-cfg.n_replicates // cfg.chunk_size)
+            ))
+            for name, rows in segments.items():
+                if rows.size < cfg.min_group_size:
+                    continue
+                for start in range(0, cfg.n_replicates, cfg.chunk_size):
+                    tasks.append((name, next(seeds), min(cfg.chunk_size, cfg.n_replicates - start)))
+
+            results = {name: [] for name in segments}
+            workers = max(1, min(cfg.max_workers or os.cpu_count() or 1, len(tasks)))
+            logging.info(f"Bootstrap: {cfg.n_replicates} replicates x {len(segments)} segments "
+                         f"({len(tasks)} chunks on {workers} processes)")
+            if workers == 1:
+                _init_worker(y, scores, threshold, segments, cfg.beta)
+                for task in tasks:
+                    name, metrics = _run_chunk(*task)
+                    results[name].append(metrics)
+            else:
+                with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                         initargs=(y, scores, threshold, segments, cfg.beta)) as pool:
+                    for name, metrics in pool.map(_run_chunk, *zip(*tasks)):
+                        results[name].append(metrics)
+
+            report_segments = {}
+            for name, rows in segments.items():
+                estimate = weighted_metrics(y[rows], scores[rows], threshold, np.ones((1, rows.size), np.float32), cfg.beta)[0]
+                replicates = np.concatenate(results[name]) if results[name] else None
+                report_segments[name] = {
+                    'n': int(rows.size),
+                    'positives': int(y[rows].sum()),
+                    'flagged_rate': float((scores[rows] >= threshold).mean()) if rows.size else None,
+                    'metrics': self.summarize(estimate, replicates),
+                }
+
+            return {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'threshold': float(threshold),
+                'beta': cfg.beta,
+                'confidence': cfg.confidence,
+                'n_replicates': cfg.n_replicates,
+                'random_state': cfg.random_state,
+                'seconds': round(time.perf_counter() - started, 3),
+                'segments': report_segments,
+            }
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def write_report(self, report, path=None):
+        path = path or self.config.report_path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+        logging.info(f"Evaluation report written to {path}")
+        return path
@@ -4,103 +4,232 @@ import pandas as pd
 import numpy as np
 from src.hea_health_signals.exception import CustomException
 from src.hea_health_signals.logger import logging
+from src.hea_health_signals.components.ingestion_cache import IngestionCache, IngestionCacheConfig
+from src.hea_health_signals.components.longitudinal_features import (
+    LongitudinalFeatureConfig, LongitudinalFeatureEngine, WavePanel, required_columns
+)
+from src.hea_health_signals.utils.array_store import save_frame
 from dataclasses import dataclass
 
+# Columns needed for feature engineering
+RAND_COLUMNS = [
+    'hhidpn',
+    'r11diab', 'r10diab',      # Target (2012) & History (2010)
+    'r10bmi', 'r9bmi',         # BMI (2010 vs 2008)
+    'r10shlt', 'r9shlt',       # Self-Rated Health
+    'r10cesd', 'r9cesd',       # Depression Score
+    'r10hibp',                 # Blood Pressure
+    'r10agey_e',               # Age
+    'r10smokev',               # Smoking
+    'r10drink',                # Alcohol
+    'ragender'                 # Gender (for Fairness)
+]
+
 @dataclass
 class DataIngestionConfig:
-    train_data_path: str = os.path.join('artifacts', "train.csv")
-    test_data_path: str = os.path.join('artifacts', "test.csv")
+    # Binary train/test splits: one .npy per column + schema.json (see utils.array_store)
+    train_data_path: str = os.path.join('artifacts', "train_split")
+    test_data_path: str = os.path.join('artifacts', "test_split")
+    # Optional CSV copies for inspection; the pipeline itself never reads them
+    export_csv: bool = False
+    train_csv_path: str = os.path.join('artifacts', "train.csv")
+    test_csv_path: str = os.path.join('artifacts', "test.csv")
     raw_data_path: str = os.path.join('artifacts', "rand_cleaned.csv")
+    # Memory-mapped per-column copy of the .dta extract (see IngestionCache)
+    use_cache: bool = True
+    cache_dir: str = os.path.join('artifacts', 'ingestion_cache')
+    # Streaming mode reads the .dta chunk by chunk and never holds the full extract
+    streaming: bool = False
+    chunk_size: int = 50000
+    test_size: float = 0.2
+    random_state: int = 42
+    # wave10: the 2010 -> 2012 cohort; all_waves: every wave pair N -> N+1 (see longitudinal_features)
+    cohort: str = 'wave10'
+
+
+def engineer_features(df_clean):
+    """
+    Builds the model features for rows that were healthy in 2010.
+    Every step is row-wise, so this gives the same result on the whole
+    population or on one chunk of it.
+    """
+    # A. Ratios (Better than subtraction for scaling)
+    # Add small epsilon (0.1) to avoid divide by zero
+    df_clean['r9bmi'] = df_clean['r9bmi'].fillna(df_clean['r10bmi']) # Fill missing history
+    df_clean['bmi_ratio'] = df_clean['r10bmi'] / (df_clean['r9bmi'] + 0.1)
+
+    # B. Health Decline (Worsening perception)
+    # r10shlt is 1-5 (5 is Poor). Positive diff = Worsening health.
+    df_clean['r9shlt'] = df_clean['r9shlt'].fillna(df_clean['r10shlt'])
+    df_clean['health_decline'] = df_clean['r10shlt'] - df_clean['r9shlt']
+
+    # C. Mental Health Shift
+    df_clean['r9cesd'] = df_clean['r9cesd'].fillna(df_clean['r10cesd'])
+    df_clean['cesd_change'] = df_clean['r10cesd'] - df_clean['r9cesd']
+
+    # D. Interaction Terms (High Impact for XGBoost)
+    df_clean['age_bmi_interact'] = df_clean['r10agey_e'] * df_clean['r10bmi']
+    df_clean['bp_bmi_interact'] = df_clean['r10hibp'] * df_clean['r10bmi'] # The "Deadly Duo"
+    df_clean['psycho_somatic'] = df_clean['r10cesd'] * df_clean['r10shlt'] # Depression + Physical Pain
+
+    # CLEANUP
+    # Must have a target in 2012
+    df_clean = df_clean.dropna(subset=['r11diab'])
+    df_clean = df_clean.fillna(0) # Simple imputation for remaining gaps
+    return df_clean
+
+
+def iter_healthy_chunks(dta_path, columns=RAND_COLUMNS, chunk_size=50000):
+    """
+    Streams the .dta file and yields engineered feature frames, one per chunk.
+    Only the requested columns are decoded, and rows that already had
+    diabetes in 2010 are dropped before any feature is computed, so memory
+    is bounded by chunk_size rather than by the size of the release.
+    """
+    with pd.read_stata(dta_path, columns=columns, convert_categoricals=False, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            healthy = chunk[chunk['r10diab'] == 0]
+            if not healthy.empty:
+                yield engineer_features(healthy.copy())
+
 
 class DataIngestion:
-    def __init__(self):
-        self.ingestion_config = DataIngestionConfig()
+    def __init__(self, ingestion_config=None):
+        self.ingestion_config = ingestion_config or DataIngestionConfig()
+
+    def read_columns(self, dta_path, columns):
+        """
+        Reads only the given columns. read_stata decodes every column of
+        whatever it reads, so going chunk by chunk keeps the full-width
+        frame from ever being in memory at once.
+        """
+        # Load without converting categories (keep as numbers)
+        with pd.read_stata(dta_path, columns=columns, convert_categoricals=False,
+                           chunksize=self.ingestion_config.chunk_size) as reader:
+            return pd.concat(list(reader), ignore_index=True)
+
+    def load_columns(self, dta_path, columns):
+        """
+        Returns {column: array} for the requested .dta columns. With the cache
+        enabled the .dta is parsed only once per (file hash, column list);
+        later runs memory-map the stored .npy columns.
+        """
+        if not self.ingestion_config.use_cache:
+            df = self.read_columns(dta_path, columns)
+            return {name: df[name].to_numpy() for name in columns}
 
-    def initiate_data_ingestion(self):
+        cache = IngestionCache(IngestionCacheConfig(cache_dir=self.ingestion_config.cache_dir))
+        cached = cache.load(dta_path, columns)
+        if cached is None:
+            logging.info("Ingestion cache miss, parsing .dta file...")
+            df = self.read_columns(dta_path, columns)
+            cache.store(dta_path, columns, df)
+            del df
+            cached = cache.load(dta_path, columns)
+        return cached
+
+    def load_healthy_population(self, dta_path):
+        """Engineered features for everyone healthy in 2010 (streamed or via the column cache)."""
+        if self.ingestion_config.streaming:
+            logging.info(f"Streaming .dta in chunks of {self.ingestion_config.chunk_size} rows")
+            chunks = list(iter_healthy_chunks(dta_path, RAND_COLUMNS, self.ingestion_config.chunk_size))
+            if not chunks:
+                return engineer_features(pd.DataFrame(columns=RAND_COLUMNS, dtype=float))
+            return pd.concat(chunks, ignore_index=True)
+
+        columns = self.load_columns(dta_path, RAND_COLUMNS)
+        # (only the healthy rows are copied out of the memory-mapped columns)
+        healthy = np.asarray(columns['r10diab']) == 0
+        df_clean = pd.DataFrame({name: columns[name][healthy] for name in RAND_COLUMNS})
+        return engineer_features(df_clean)
+
+    @staticmethod
+    def available_columns(dta_path):
+        """Variable names in the .dta, read from the header only."""
+        with pd.read_stata(dta_path, iterator=True) as reader:
+            return list(reader.variable_labels())
+
+    def load_all_waves(self, dta_path, feature_config=None):
+        """
+        One row per (respondent, wave N) healthy at N with an outcome at N+1,
+        for every wave pair in the release. Base features keep the two-wave
+        names, so DataTransformation works on it unchanged.
+        """
+        feature_config = feature_config or LongitudinalFeatureConfig()
+        present = set(self.available_columns(dta_path))
+        # ragender is time-invariant and kept for fairness checks
+        static = [name for name in ('ragender',) if name in present]
+        columns = [name for name in required_columns(feature_config) + static if name in present]
+        logging.info(f"Loading {len(columns)} longitudinal columns across {len(feature_config.waves)} waves")
+
+        loaded = self.load_columns(dta_path, columns)
+        panel = WavePanel.from_columns(loaded, feature_config)
+        engine = LongitudinalFeatureEngine(feature_config)
+        return engine.build_training_frame(panel, static_columns={name: loaded[name] for name in static})
+
+    @staticmethod
+    def find_dataset():
+        # Checks for dataset in multiple likely locations
+        possible_paths = [
+            r"Datasets\randhrs1992_2022v1.dta",
+            r"..\Datasets\randhrs1992_2022v1.dta",
+            r"../Datasets/randhrs1992_2022v1.dta"
+        ]
+        for p in possible_paths:
+            if os.path.exists(p):
+                return p
+        raise FileNotFoundError(f"Could not find RAND file in: {possible_paths}")
+
+    def split(self, df_clean):
+        from sklearn.model_selection import train_test_split, GroupShuffleSplit
+        config = self.ingestion_config
+        if config.cohort == 'all_waves':
+            # A respondent appears once per wave pair; keep all of their rows on one side
+            splitter = GroupShuffleSplit(n_splits=1, test_size=config.test_size, random_state=config.random_state)
+            train_idx, test_idx = next(splitter.split(df_clean, groups=df_clean['hhidpn']))
+            return df_clean.iloc[train_idx], df_clean.iloc[test_idx]
+
+        # Stratified Split (Keep sick ratio same in train/test)
+        return train_test_split(
+            df_clean,
+            test_size=config.test_size,
+            random_state=config.random_state,
+            stratify=df_clean['r11diab']
+        )
+
+    def initiate_data_ingestion(self, dta_path=None):
         logging.info("Starting Real Data Ingestion (RAND HRS)")
         try:
             # 1. PATH CONFIGURATION
-            # Checks for dataset in multiple likely locations
-            possible_paths = [
-                r"Datasets\randhrs1992_2022v1.dta",
-                r"..\Datasets\randhrs1992_2022v1.dta",
-                r"../Datasets/randhrs1992_2022v1.dta"
-            ]
-            
-            dta_path = None
-            for p in possible_paths:
-                if os.path.exists(p):
-                    dta_path = p
-                    break
-            
-            if dta_path is None:
-                raise FileNotFoundError(f"Could not find RAND file in: {possible_paths}")
-
+            dta_path = dta_path or self.find_dataset()
             logging.info(f"Reading .dta file from {dta_path}...")
-            
-            # 2. LOAD SPECIFIC COLUMNS (For Feature Engineering)
-            cols_to_use = [
-                'hhidpn', 
-                'r11diab', 'r10diab',      # Target (2012) & History (2010)
-                'r10bmi', 'r9bmi',         # BMI (2010 vs 2008)
-                'r10shlt', 'r9shlt',       # Self-Rated Health
-                'r10cesd', 'r9cesd',       # Depression Score
-                'r10hibp',                 # Blood Pressure
-                'r10agey_e',               # Age
-                'r10smokev',               # Smoking
-                'r10drink',                # Alcohol
-                'ragender'                 # Gender (for Fairness)
-            ]
-            
-            # Load without converting categories (keep as numbers)
-            df = pd.read_stata(dta_path, columns=cols_to_use, convert_categoricals=False)
-
-            # 3. FILTERING: "The Hidden Signal"
-            # We only train on people who were HEALTHY (0) in 2010
-            # We want to predict who GETS SICK (1) in 2012
-            df_clean = df[df['r10diab'] == 0].copy()
-            logging.info(f"Healthy Population (2010): {df_clean.shape[0]}")
-
-            # 4. ROBUST FEATURE ENGINEERING
-            # A. Ratios (Better than subtraction for scaling)
-            # Add small epsilon (0.1) to avoid divide by zero
-            df_clean['r9bmi'] = df_clean['r9bmi'].fillna(df_clean['r10bmi']) # Fill missing history
-            df_clean['bmi_ratio'] = df_clean['r10bmi'] / (df_clean['r9bmi'] + 0.1)
-            
-            # B. Health Decline (Worsening perception)
-            # r10shlt is 1-5 (5 is Poor). Positive diff = Worsening health.
-            df_clean['r9shlt'] = df_clean['r9shlt'].fillna(df_clean['r10shlt'])
-            df_clean['health_decline'] = df_clean['r10shlt'] - df_clean['r9shlt']
-            
-            # C. Mental Health Shift
-            df_clean['r9cesd'] = df_clean['r9cesd'].fillna(df_clean['r10cesd'])
-            df_clean['cesd_change'] = df_clean['r10cesd'] - df_clean['r9cesd']
-            
-            # D. Interaction Terms (High Impact for XGBoost)
-            df_clean['age_bmi_interact'] = df_clean['r10agey_e'] * df_clean['r10bmi']
-            df_clean['bp_bmi_interact'] = df_clean['r10hibp'] * df_clean['r10bmi'] # The "Deadly Duo"
-            df_clean['psycho_somatic'] = df_clean['r10cesd'] * df_clean['r10shlt'] # Depression + Physical Pain
-
-            # 5. CLEANUP
-            # Must have a target in 2012
-            df_clean = df_clean.dropna(subset=['r11diab'])
-            df_clean = df_clean.fillna(0) # Simple imputation for remaining gaps
+
+            # 2-5. LOAD, FILTER & ENGINEER
+            # We only train on people who were HEALTHY (0) at the base wave
+            # We want to predict who GETS SICK (1) by the next wave
+            if self.ingestion_config.cohort == 'all_waves':
+                df_clean = self.load_all_waves(dta_path)
+                logging.info(f"Healthy person-waves with a next-wave target: {df_clean.shape[0]}")
+            elif self.ingestion_config.cohort == 'wave10':
+                df_clean = self.load_healthy_population(dta_path)
+                logging.info(f"Healthy Population (2010) with a 2012 target: {df_clean.shape[0]}")
+            else:
+                raise ValueError(f"Unknown cohort {self.ingestion_config.cohort!r}")
 
             # 6. SAVE ARTIFACTS
-            os.makedirs(os.path.dirname(self.ingestion_config.train_data_path), exist_ok=True)
-            
-            # Stratified Split (Keep sick ratio same in train/test)
-            from sklearn.model_selection import train_test_split
-            train_df, test_df = train_test_split(df_clean, test_size=0.2, random_state=42, stratify=df_clean['r11diab'])
+            train_df, test_df = self.split(df_clean)
+            train_df = train_df.reset_index(drop=True)
+            test_df = test_df.reset_index(drop=True)
 
-            train_df.to_csv(self.ingestion_config.train_data_path, index=False)
-            test_df.to_csv(self.ingestion_config.test_data_path, index=False)
+            save_frame(self.ingestion_config.train_data_path, train_df, metadata={'source': dta_path})
+            save_frame(self.ingestion_config.test_data_path, test_df, metadata={'source': dta_path})
+            if self.ingestion_config.export_csv:
+                train_df.to_csv(self.ingestion_config.train_csv_path, index=False)
+                test_df.to_csv(self.ingestion_config.test_csv_path, index=False)
 
             logging.info(f"Ingestion Complete. Train: {train_df.shape}, Test: {test_df.shape}")
-            return (
-                self.ingestion_config.train_data_path,
-                self.ingestion_config.test_data_path
-            )
+            # The frames are handed to the next stage directly; the stores are for reruns
+            return train_df, test_df
 
         except Exception as e:
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
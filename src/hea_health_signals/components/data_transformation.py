@@ -7,35 +7,42 @@ from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 import joblib
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from src.hea_health_signals.exception import CustomException
 from src.hea_health_signals.logger import logging
+from src.hea_health_signals.utils.array_store import save_arrays, load_arrays, load_frame
+
+# EXACT FEATURES FROM INGESTION
+FEATURE_COLUMNS = [
+    'r10bmi',
+    'bmi_ratio',
+    'r10shlt',
+    'health_decline',
+    'r10cesd',
+    'cesd_change',
+    'r10hibp',
+    'r10agey_e',
+    'age_bmi_interact',
+    'bp_bmi_interact',
+    'psycho_somatic'
+]
 
 @dataclass
 class DataTransformationConfig:
     preprocessor_obj_file_path = os.path.join('artifacts', 'preprocessor.pkl')
+    train_arrays_path = os.path.join('artifacts', 'train_transformed')
+    test_arrays_path = os.path.join('artifacts', 'test_transformed')
+    feature_columns: list = field(default_factory=lambda: list(FEATURE_COLUMNS))
+    target_column: str = "r11diab"
 
 class DataTransformation:
-    def __init__(self):
-        self.data_transformation_config = DataTransformationConfig()
+    def __init__(self, data_transformation_config=None):
+        self.data_transformation_config = data_transformation_config or DataTransformationConfig()
 
     def get_data_transformer_object(self):
         try:
-            # EXACT FEATURES FROM INGESTION
-            numerical_columns = [
-                'r10bmi', 
-                'bmi_ratio', 
-                'r10shlt', 
-                'health_decline',
-                'r10cesd', 
-                'cesd_change', 
-                'r10hibp', 
-                'r10agey_e', 
-                'age_bmi_interact', 
-                'bp_bmi_interact', 
-                'psycho_somatic'
-            ]
-            
+            numerical_columns = self.data_transformation_config.feature_columns
+
             num_pipeline = Pipeline(
                 steps=[
                     ("imputer", SimpleImputer(strategy="median")),
@@ -56,45 +63,63 @@ class DataTransformation:
         except Exception as e:
             raise CustomException(e, sys)
             
-    def initiate_data_transformation(self, train_path, test_path):
+    def initiate_data_transformation(self, train_data, test_data):
+        """
+        Fits the preprocessor and returns (X_train, y_train, X_test, y_test,
+        preprocessor_path). train_data/test_data are the DataFrames handed
+        over by DataIngestion, or paths to the split stores it persisted.
+        """
         try:
-            train_df = pd.read_csv(train_path)
-            test_df = pd.read_csv(test_path)
+            train_df = self.as_frame(train_data)
+            test_df = self.as_frame(test_data)
 
             logging.info("Obtaining preprocessing object")
             preprocessing_obj = self.get_data_transformer_object()
 
-            target_column_name = "r11diab"
-            
+            target_column_name = self.data_transformation_config.target_column
             # Explicit Feature Selection to avoid column mismatch errors
-            feature_cols = [
-                'r10bmi', 'bmi_ratio', 'r10shlt', 'health_decline',
-                'r10cesd', 'cesd_change', 'r10hibp', 'r10agey_e', 
-                'age_bmi_interact', 'bp_bmi_interact', 'psycho_somatic'
-            ]
-            
+            feature_cols = self.data_transformation_config.feature_columns
+
             input_feature_train_df = train_df[feature_cols]
-            target_feature_train_df = train_df[target_column_name]
+            target_feature_train = train_df[target_column_name].to_numpy(dtype=np.float64)
 
             input_feature_test_df = test_df[feature_cols]
-            target_feature_test_df = test_df[target_column_name]
+            target_feature_test = test_df[target_column_name].to_numpy(dtype=np.float64)
 
             logging.info("Applying preprocessing object")
 
             input_feature_train_arr = preprocessing_obj.fit_transform(input_feature_train_df)
             input_feature_test_arr = preprocessing_obj.transform(input_feature_test_df)
 
-            train_arr = np.c_[input_feature_train_arr, np.array(target_feature_train_df)]
-            test_arr = np.c_[input_feature_test_arr, np.array(target_feature_test_df)]
-
             os.makedirs(os.path.dirname(self.data_transformation_config.preprocessor_obj_file_path), exist_ok=True)
             joblib.dump(preprocessing_obj, self.data_transformation_config.preprocessor_obj_file_path)
 
+            # Features and target stay separate arrays (no np.c_ copy)
+            metadata = {'feature_names': feature_cols, 'target': target_column_name}
+            save_arrays(self.data_transformation_config.train_arrays_path,
+                        {'X': input_feature_train_arr, 'y': target_feature_train}, metadata)
+            save_arrays(self.data_transformation_config.test_arrays_path,
+                        {'X': input_feature_test_arr, 'y': target_feature_test}, metadata)
+
             return (
-                train_arr,
-                test_arr,
+                input_feature_train_arr,
+                target_feature_train,
+                input_feature_test_arr,
+                target_feature_test,
                 self.data_transformation_config.preprocessor_obj_file_path,
             )
             
         except Exception as e:
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
+
+    @staticmethod
+    def as_frame(data):
+        if isinstance(data, pd.DataFrame):
+            return data
+        return load_frame(data)
+
+    @staticmethod
+    def load_transformed(path, mmap_mode='r'):
+        """(X, y) persisted by initiate_data_transformation, memory-mapped by default."""
+        arrays = load_arrays(path, ['X', 'y'], mmap_mode=mmap_mode)
+        return arrays['X'], arrays['y']
@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import time
+import hashlib
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import xgboost as xgb
+from sklearn.model_selection import StratifiedKFold
+from src.hea_health_signals.exception import CustomException
+from src.hea_health_signals.logger import logging
+
+# Ranges around the hand-tuned settings in ModelTrainer
+DEFAULT_SEARCH_SPACE = {
+    'learning_rate': {'low': 0.01, 'high': 0.2, 'log': True},
+    'max_depth': [3, 4, 5, 6],
+    'min_child_weight': [1, 3, 5, 10],
+    'subsample': {'low': 0.6, 'high': 1.0},
+    'colsample_bytree': {'low': 0.6, 'high': 1.0},
+}
+
+@dataclass
+class HyperparameterSearchConfig:
+    search_space: dict = field(default_factory=lambda: dict(DEFAULT_SEARCH_SPACE))
+    n_trials: int = 20
+    n_splits: int = 5
+    max_rounds: int = 2000             # upper bound; early stopping picks the real count
+    early_stopping_rounds: int = 50
+    max_workers: int = None            # concurrent trials (default: derived from CPU count)
+    n_jobs_per_trial: int = None       # XGBoost threads per trial (default: cores / workers)
+    random_state: int = 42
+    checkpoint_path: str = os.path.join('artifacts', 'hyperparameter_search.jsonl')
+
+
+def sample_trials(search_space, n_trials, random_state=42):
+    """
+    Deterministic random samples from the space. A list is a categorical
+    choice, {'low', 'high', 'log'} a continuous range. The same seed always
+    gives the same trials, which is what lets a search resume.
+    """
+    rng = np.random.default_rng(random_state)
+    trials = []
+    for _ in range(n_trials):
+        params = {}
+        for name, spec in sorted(search_space.items()):
+            if isinstance(spec, (list, tuple)):
+                value = spec[int(rng.integers(len(spec)))]
+                params[name] = value.item() if hasattr(value, 'item') else value
+            elif spec.get('log'):
+                params[name] = float(np.exp(rng.uniform(np.log(spec['low']), np.log(spec['high']))))
+            else:
+                params[name] = float(rng.uniform(spec['low'], spec['high']))
+        trials.append(params)
+    return trials
+
+
+def trial_id(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def plan_workers(n_trials, cpu_count=None, max_workers=None, n_jobs_per_trial=None):
+    """
+    Splits the cores between concurrent trials and XGBoost threads.
+    Histogram boosting on this dataset scales poorly past a few threads,
+    so trials get the cores first and any cores left over go to n_jobs.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    if n_jobs_per_trial:
+        workers = max(1, cpu_count // n_jobs_per_trial)
+    else:
+        workers = cpu_count
+    workers = max(1, min(workers, n_trials, max_workers or workers))
+    n_jobs = n_jobs_per_trial or max(1, cpu_count // workers)
+    return workers, n_jobs
+
+
+# Set once per worker process by _init_worker so the arrays are not re-pickled per trial
+_worker_data = {}
+
+
+def _init_worker(X, y, folds):
+    _worker_data.update(X=X, y=y, folds=folds)
+
+
+def _run_trial(params, base_params, max_rounds, early_stopping_rounds, n_jobs):
+    X, y, folds = _worker_data['X'], _worker_data['y'], _worker_data['folds']
+    started = time.perf_counter()
+    scores, rounds = [], []
+    for train_idx, valid_idx in folds:
+        y_fold = y[train_idx]
+        model = xgb.XGBClassifier(
+            **base_params,
+            **params,
+            n_estimators=max_rounds,
+            early_stopping_rounds=early_stopping_rounds,
+            eval_metric='aucpr',
+            scale_pos_weight=(y_fold == 0).sum() / max((y_fold == 1).sum(), 1),
+            n_jobs=n_jobs,
+        )
+        model.fit(X[train_idx], y_fold, eval_set=[(X[valid_idx], y[valid_idx])], verbose=False)
+        scores.append(float(model.best_score))
+        rounds.append(int(model.best_iteration) + 1)
+    return {
+        'params': params,
+        'aucpr_mean': float(np.mean(scores)),
+        'aucpr_std': float(np.std(scores)),
+        'fold_aucpr': scores,
+        'best_rounds': rounds,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+class HyperparameterSearch:
+    """
+    Stratified k-fold random search for the XGBoost model, one trial per
+    process. Every finished trial is appended to a JSONL checkpoint, and
+    trials already in the checkpoint are skipped, so an interrupted search
+    picks up where it stopped.
+    """
+    def __init__(self, config=None, base_params=None):
+        self.config = config or HyperparameterSearchConfig()
+        # Fixed settings shared by every trial (e.g. random_state, tree_method)
+        self.base_params = dict(base_params or {})
+
+    def fingerprint(self, X, y):
+        """Identifies the data and CV setup, so a checkpoint from another run is never reused."""
+        digest = hashlib.sha1()
+        digest.update(np.ascontiguousarray(X).tobytes())
+        digest.update(np.ascontiguousarray(y).tobytes())
+        digest.update(json.dumps({
+            'n_splits': self.config.n_splits,
+            'max_rounds': self.config.max_rounds,
+            'early_stopping_rounds': self.config.early_stopping_rounds,
+            'random_state': self.config.random_state,
+            'base_params': self.base_params,
+        }, sort_keys=True, default=str).encode())
+        return digest.hexdigest()[:16]
+
+    def load_checkpoint(self, fingerprint=None):
+        done = {}
+        path = self.config.checkpoint_path
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by an interrupted write; that trial just reruns
+                        continue
+                    if fingerprint is None or record.get('fingerprint') == fingerprint:
+                        done[record['trial_id']] = record
+        return done
+
+    def _append_checkpoint(self, record):
+        path = self.config.checkpoint_path
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def run(self, X, y):
+        """
+        Returns {'best_params', 'best_score', 'trials'}. best_params includes
+        n_estimators, set to the mean early-stopped round count of the best trial.
+        """
+        try:
+            cfg = self.config
+            X = np.ascontiguousarray(X, dtype=np.float32)
+            y = np.asarray(y, dtype=np.float64)
+            folds = list(StratifiedKFold(cfg.n_splits, shuffle=True, random_state=cfg.random_state).split(X, y))
+
+            fingerprint = self.fingerprint(X, y)
+            trials = sample_trials(cfg.search_space, cfg.n_trials, cfg.random_state)
+            done = self.load_checkpoint(fingerprint)
+            pending = [params for params in trials if trial_id(params) not in done]
+            logging.info(f"Hyperparameter search: {len(trials)} trials, {len(trials) - len(pending)} from checkpoint")
+
+            if pending:
+                workers, n_jobs = plan_workers(len(pending), max_workers=cfg.max_workers, n_jobs_per_trial=cfg.n_jobs_per_trial)
+                logging.info(f"Running {len(pending)} trials on {workers} processes x {n_jobs} XGBoost threads")
+                with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(X, y, folds)) as pool:
+                    futures = {
+                        pool.submit(_run_trial, params, self.base_params, cfg.max_rounds, cfg.early_stopping_rounds, n_jobs): params
+                        for params in pending
+                    }
+                    try:
+                        for future in as_completed(futures):
+                            record = dict(future.result(), trial_id=trial_id(futures[future]), fingerprint=fingerprint)
+                            self._append_checkpoint(record)
+                            done[record['trial_id']] = record
+                            logging.info(f"Trial {record['trial_id']}: aucpr {record['aucpr_mean']:.4f} "
+                                         f"rounds {record['best_rounds']} ({record['seconds']:.1f}s)")
+                    except BaseException:
+                        # Finished trials are already checkpointed; drop the queued ones
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        raise
+
+            results = sorted((done[trial_id(params)] for params in trials), key=lambda r: r['aucpr_mean'], reverse=True)
+            best = results[0]
+            best_params = dict(best['params'], n_estimators=int(round(np.mean(best['best_rounds']))))
+            logging.info(f"Best trial {best['trial_id']}: aucpr {best['aucpr_mean']:.4f} params {best_params}")
+            return {'best_params': best_params, 'best_score': best['aucpr_mean'], 'trials': results}
+
+        except Exception as e:
+            raise CustomException(e, sys)
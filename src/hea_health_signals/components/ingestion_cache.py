@@ -0,0 +1,59 @@
+import os
+import hashlib
+from dataclasses import dataclass
+import numpy as np
+from src.hea_health_signals.logger import logging
+from src.hea_health_signals.utils.array_store import save_arrays, load_arrays, read_schema
+from src.hea_health_signals.utils.common import file_sha256
+
+
+@dataclass
+class IngestionCacheConfig:
+    cache_dir: str = os.path.join('artifacts', 'ingestion_cache')
+
+
+class IngestionCache:
+    """
+    Columnar cache of the RAND extract.
+    Each (source file hash, column list) pair is stored once as one .npy
+    file per column plus a schema sidecar, so later runs memory-map exactly the
+    columns they need instead of parsing the multi-gigabyte .dta again.
+    """
+    def __init__(self, config=None):
+        self.config = config or IngestionCacheConfig()
+
+    def _hash_index_path(self):
+        return os.path.join(self.config.cache_dir, 'source_hashes.json')
+
+    def source_hash(self, source_path):
+        """SHA-256 of the source file, memoized by (path, size, mtime)."""
+        return file_sha256(source_path, self._hash_index_path())
+
+    def key(self, source_path, columns):
+        payload = self.source_hash(source_path) + '\n' + '\n'.join(columns)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def entry_dir(self, source_path, columns):
+        return os.path.join(self.config.cache_dir, self.key(source_path, columns))
+
+    def load(self, source_path, columns, mmap_mode='r'):
+        """Returns {column: memory-mapped array} or None on a cache miss."""
+        entry = self.entry_dir(source_path, columns)
+        schema = read_schema(entry)
+        if schema is None:
+            return None
+        logging.info(f"Ingestion cache hit: {entry} ({schema['metadata']['rows']} rows)")
+        return load_arrays(entry, columns, mmap_mode=mmap_mode)
+
+    def store(self, source_path, columns, frame):
+        """Writes the columns of frame (DataFrame or dict of arrays) as one .npy per column."""
+        entry = self.entry_dir(source_path, columns)
+        arrays = {name: np.asarray(frame[name]) for name in columns}
+        rows = len(arrays[columns[0]]) if columns else 0
+        save_arrays(entry, arrays, metadata={
+            'source': os.path.abspath(source_path),
+            'source_sha256': self.source_hash(source_path),
+            'rows': rows,
+        })
+        logging.info(f"Ingestion cache stored: {entry} ({rows} rows, {len(columns)} columns)")
+        return entry
@@ -0,0 +1,210 @@
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+# RAND HRS 1992-2022 release: waves 1..16, two years apart
+RAND_WAVES = tuple(range(1, 17))
+
+# Engine name -> column name the model pipeline already uses for the base wave
+LEGACY_FEATURE_NAMES = {
+    'bmi': 'r10bmi',
+    'shlt': 'r10shlt',
+    'shlt_velocity': 'health_decline',
+    'cesd': 'r10cesd',
+    'cesd_velocity': 'cesd_change',
+    'hibp': 'r10hibp',
+    'agey_e': 'r10agey_e',
+    'smokev': 'r10smokev',
+    'drink': 'r10drink',
+}
+
+
+@dataclass
+class LongitudinalFeatureConfig:
+    # RAND suffixes: r{wave}{signal}
+    signals: tuple = ('bmi', 'shlt', 'cesd', 'hibp', 'agey_e', 'smokev', 'drink')
+    # Signals that also get velocity / acceleration / instability features
+    trend_signals: tuple = ('bmi', 'shlt', 'cesd')
+    target: str = 'diab'
+    waves: tuple = RAND_WAVES
+    window: int = 3
+    id_column: str = 'hhidpn'
+
+
+def wave_column(signal, wave):
+    return f"r{wave}{signal}"
+
+
+def target_column(config, legacy_names=True):
+    """Name of the N+1 outcome column; r11diab keeps DataTransformation's default target."""
+    return f"r11{config.target}" if legacy_names else f"next_{config.target}"
+
+
+def required_columns(config):
+    names = [config.id_column]
+    for wave in config.waves:
+        names.extend(wave_column(signal, wave) for signal in config.signals + (config.target,))
+    return names
+
+
+class WavePanel:
+    """
+    The wide rNxxx columns reshaped once into values[signal, wave, respondent].
+    Respondents are the innermost axis so every per-wave step below works on
+    contiguous memory. Columns missing from the release (e.g. a signal not
+    asked in wave 1) are NaN.
+    """
+    def __init__(self, ids, values, waves, signals):
+        self.ids = ids
+        self.values = values
+        self.waves = tuple(waves)
+        self.signals = tuple(signals)
+
+    @classmethod
+    def from_columns(cls, columns, config):
+        """columns: DataFrame or {name: array}, as returned by DataIngestion.load_columns."""
+        ids = np.asarray(columns[config.id_column])
+        signals = config.signals + (config.target,)
+        values = np.full((len(signals), len(config.waves), ids.shape[0]), np.nan)
+        for s, signal in enumerate(signals):
+            for w, wave in enumerate(config.waves):
+                name = wave_column(signal, wave)
+                if name in columns:
+                    values[s, w] = columns[name]
+        return cls(ids, values, config.waves, signals)
+
+    def signal(self, name):
+        """(waves, respondents) array for one signal."""
+        return self.values[self.signals.index(name)]
+
+
+def forward_fill(values):
+    """
+    Carries the last observed value forward along the wave axis (axis -2).
+    Returns (filled, gap) where gap counts the waves since that observation
+    (0 = observed in this wave, NaN = never observed yet). Loops over the
+    waves only; each step is one operation across all respondents.
+    """
+    filled = values.copy()
+    gap = np.where(np.isnan(values), np.nan, 0.0)
+    for w in range(1, values.shape[-2]):
+        missing = np.isnan(values[..., w, :])
+        filled[..., w, :] = np.where(missing, filled[..., w - 1, :], values[..., w, :])
+        gap[..., w, :] = np.where(missing, gap[..., w - 1, :] + 1, 0.0)
+    return filled, gap
+
+
+def rolling_std(values, window):
+    """
+    Sample std (ddof=1, like DataFrame.std) over the trailing `window` waves
+    of a (waves, respondents) array, ignoring gaps. Position w covers waves
+    w-window+1..w; NaN where fewer than two observations fall in the window.
+    Returns (std, count).
+    """
+    n_waves = values.shape[0]
+    observed = ~np.isnan(values)
+    zeroed = np.where(observed, values, 0.0)
+
+    # Trailing window sums built from `window` shifted adds
+    count = np.zeros(values.shape)
+    total = np.zeros(values.shape)
+    for k in range(min(window, n_waves)):
+        count[k:] += observed[:n_waves - k]
+        total[k:] += zeroed[:n_waves - k]
+    mean = total / np.maximum(count, 1)
+
+    # Second pass around the window mean (more stable than sum of squares)
+    squares = np.zeros(values.shape)
+    for k in range(min(window, n_waves)):
+        deviation = zeroed[:n_waves - k] - mean[k:]
+        squares[k:] += np.where(observed[:n_waves - k], deviation * deviation, 0.0)
+    std = np.sqrt(squares / np.maximum(count - 1, 1))
+    std[count < 2] = np.nan
+    return std, count
+
+
+class LongitudinalFeatureEngine:
+    """
+    Computes trend features for every wave at once on a WavePanel and
+    turns them into one training row per (respondent, wave N) where the
+    respondent had no diabetes at N and has an answer at N+1.
+    """
+    def __init__(self, config=None):
+        self.config = config or LongitudinalFeatureConfig()
+
+    def compute(self, panel):
+        """
+        {feature name: (waves, respondents) array} for every wave. Levels
+        are gap-filled; velocity and acceleration are first and second
+        differences of the filled history.
+        """
+        filled, gap = forward_fill(panel.values)
+        features = {}
+        for s, signal in enumerate(panel.signals):
+            if signal == self.config.target:
+                continue
+            level = filled[s]
+            features[signal] = level
+            if signal not in self.config.trend_signals:
+                continue
+            velocity = np.full_like(level, np.nan)
+            velocity[1:] = level[1:] - level[:-1]
+            acceleration = np.full_like(level, np.nan)
+            acceleration[1:] = velocity[1:] - velocity[:-1]
+            instability, observed = rolling_std(panel.values[s], self.config.window)
+            features[f"{signal}_velocity"] = velocity
+            features[f"{signal}_acceleration"] = acceleration
+            features[f"{signal}_instability"] = instability
+            features[f"{signal}_observed"] = observed
+            features[f"{signal}_gap"] = gap[s]
+
+        # Same derived terms as the two-wave pipeline, for any wave
+        if 'bmi' in features:
+            bmi = features['bmi']
+            prev_bmi = bmi.copy()
+            prev_bmi[1:] = bmi[:-1]
+            prev_bmi = np.where(np.isnan(prev_bmi), bmi, prev_bmi)
+            features['bmi_ratio'] = bmi / (prev_bmi + 0.1)
+            if 'agey_e' in features:
+                features['age_bmi_interact'] = features['agey_e'] * bmi
+            if 'hibp' in features:
+                features['bp_bmi_interact'] = features['hibp'] * bmi
+        if 'cesd' in features and 'shlt' in features:
+            features['psycho_somatic'] = features['cesd'] * features['shlt']
+        return features
+
+    def build_training_frame(self, panel, base_waves=None, legacy_names=True, static_columns=None):
+        """
+        Long-format frame with one row per eligible (respondent, base wave N):
+        id, wave (N), target (diabetes at N+1) and the features as of N.
+        Built for all wave pairs in one vectorized gather. With legacy_names
+        the base features keep the names the model pipeline expects
+        (r10bmi, health_decline, ...). static_columns ({name: per-respondent
+        array}, e.g. ragender) are copied onto each of the respondent's rows.
+        """
+        config = self.config
+        features = self.compute(panel)
+        diabetes = panel.signal(config.target)
+
+        allowed = np.array([base_waves is None or wave in base_waves for wave in panel.waves[:-1]], dtype=bool)
+        eligible = (diabetes[:-1] == 0) & ~np.isnan(diabetes[1:]) & allowed[:, None]
+        # Flat positions into any (waves, respondents) array; one take() per feature
+        flat = np.flatnonzero(eligible)
+        waves, rows = np.divmod(flat, len(panel.ids))
+
+        def gather(values, offset=0):
+            # Same imputation as the two-wave pipeline (fillna(0)); *_observed/*_gap keep the missingness visible
+            out = np.ravel(values).take(flat + offset)
+            out[np.isnan(out)] = 0.0
+            return out
+
+        frame = {
+            config.id_column: panel.ids[rows],
+            'wave': np.asarray(panel.waves)[waves],
+            target_column(config, legacy_names): gather(diabetes, offset=len(panel.ids)),
+        }
+        for name, values in features.items():
+            frame[LEGACY_FEATURE_NAMES.get(name, name) if legacy_names else name] = gather(values)
+        for name, values in (static_columns or {}).items():
+            frame[name] = np.nan_to_num(np.asarray(values)[rows], nan=0.0)
+        return pd.DataFrame(frame, copy=False)
@@ -5,30 +5,65 @@ import pandas as pd
 from sklearn.metrics import classification_report, fbeta_score
 from src.hea_health_signals.exception import CustomException
 from src.hea_health_signals.logger import logging
+from src.hea_health_signals.utils.threshold_optimizer import optimal_threshold, fit_group_thresholds
+from src.hea_health_signals.components.bootstrap_evaluation import BootstrapEvaluator
 
 class ModelEvaluation:
-    def __init__(self):
-        pass
+    def __init__(self, beta=2.0, bootstrap=None):
+        self.beta = beta
+        # BootstrapEvaluationConfig for confidence intervals (None = point estimates only)
+        self.bootstrap = bootstrap
 
-    def initiate_model_evaluation(self, train_array, test_array):
+    def initiate_model_evaluation(self, X_test, y_test, groups=None, audit_groups=None):
+        """
+        Scores the saved model at the saved threshold, and reports the best
+        threshold this data would pick. With groups (e.g. ragender per row)
+        it also fits a threshold per subgroup. With a bootstrap config it
+        adds confidence intervals, overall and for each of audit_groups
+        ({name: label per row}, see bootstrap_evaluation.audit_groups), and
+        writes them to the JSON report.
+        """
         try:
             logging.info("Loading Model and Threshold...")
             model_path = os.path.join("artifacts", "model.pkl")
             thresh_path = os.path.join("artifacts", "threshold.txt")
-            
+
             model = joblib.load(model_path)
             with open(thresh_path, 'r') as f:
                 threshold = float(f.read().strip())
 
-            X_test = test_array[:, :-1]
-            y_test = test_array[:, -1]
-
             probs = model.predict_proba(X_test)[:, 1]
             preds = (probs >= threshold).astype(int)
 
-            f2 = fbeta_score(y_test, preds, beta=2)
+            f2 = fbeta_score(y_test, preds, beta=self.beta)
             logging.info(f"Independent Evaluation F2-Score: {f2}")
             print(f"Independent Eval F2: {f2}")
 
+            best_threshold, best_f2 = optimal_threshold(y_test, probs, beta=self.beta)
+            logging.info(f"Best threshold on this data: {best_threshold} (F{self.beta:g} {best_f2:.4f})")
+
+            report = {
+                'threshold': threshold,
+                'fbeta': f2,
+                'best_threshold': best_threshold,
+                'best_fbeta': best_f2,
+            }
+            if groups is not None:
+                report['groups'] = fit_group_thresholds(y_test, probs, groups, beta=self.beta, fallback=threshold)
+                for group, result in report['groups'].items():
+                    logging.info(f"Group {group}: threshold {result['threshold']} F{self.beta:g} {result['fbeta']:.4f} (n={result['n']})")
+
+            if self.bootstrap is not None:
+                evaluator = BootstrapEvaluator(self.bootstrap)
+                bootstrap_report = evaluator.evaluate(y_test, probs, threshold, audit_groups)
+                report['bootstrap_report_path'] = evaluator.write_report(bootstrap_report)
+                for segment, result in bootstrap_report['segments'].items():
+                    summary = ", ".join(
+                        f"{name} {m['estimate']:.4f} [{m['low']:.4f}, {m['high']:.4f}]"
+                        for name, m in result['metrics'].items() if m['low'] is not None
+                    )
+                    print(f"{segment:<18} n={result['n']:<6} {summary}")
+            return report
+
         except Exception as e:
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
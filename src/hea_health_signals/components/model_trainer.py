@@ -1,72 +1,186 @@
 import os
 import sys
-from dataclasses import dataclass
+import json
+from datetime import datetime
+from dataclasses import dataclass, field
 import numpy as np
 
 # XGBoost for winning metrics
 import xgboost as xgb
-from sklearn.metrics import fbeta_score, roc_auc_score, precision_recall_curve, auc, classification_report
+from sklearn.metrics import roc_auc_score, precision_recall_curve, auc, classification_report, fbeta_score
 from src.hea_health_signals.exception import CustomException
 from src.hea_health_signals.logger import logging
+from src.hea_health_signals.utils.threshold_optimizer import optimal_threshold
+from src.hea_health_signals.components.hyperparameter_search import HyperparameterSearch, HyperparameterSearchConfig
+from src.hea_health_signals.components.quantized_training import train_quantized, resolve_mode
+from src.hea_health_signals.utils.benchmark import ResourceTracker
+from src.hea_health_signals.pipelines.cascade_ensemble import ENSEMBLE_MEMBERS, member_path, manifest_path, write_members_manifest
 import joblib
 
+# Optimized for PR-AUC; scale_pos_weight is set from the training data
+XGB_PARAMS = {
+    'n_estimators': 600,            # High trees
+    'learning_rate': 0.02,          # Slow learning
+    'max_depth': 4,                 # Prevent overfitting
+    'min_child_weight': 5,          # Conservative
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'eval_metric': 'aucpr',         # Optimize Precision-Recall Area
+    'random_state': 42,
+}
+
+# Second-tier cascade members, with the settings from research/trials.ipynb
+ENSEMBLE_MEMBER_PARAMS = {
+    'lightgbm': {'n_estimators': 500, 'learning_rate': 0.01, 'max_depth': 5, 'is_unbalance': True, 'random_state': 42},
+    'catboost': {'iterations': 500, 'learning_rate': 0.01, 'depth': 6, 'auto_class_weights': 'Balanced',
+                 'verbose': 0, 'random_state': 42},
+}
+
+
+def build_ensemble_member(name, params):
+    """Unfitted member model; raises ImportError if its library is not installed."""
+    if name == 'lightgbm':
+        import lightgbm as lgb
+        return lgb.LGBMClassifier(**params)
+    if name == 'catboost':
+        from catboost import CatBoostClassifier
+        return CatBoostClassifier(**params)
+    raise ValueError(f"Unknown ensemble member {name!r}; expected one of {ENSEMBLE_MEMBERS}")
+
+
 @dataclass
 class ModelTrainerConfig:
     trained_model_file_path = os.path.join("artifacts", "model.pkl")
     threshold_file_path = os.path.join("artifacts", "threshold.txt")
+    xgb_params: dict = field(default_factory=lambda: dict(XGB_PARAMS))
+    # Beta=2 weighs Recall 2x higher than Precision
+    threshold_beta: float = 2.0
+    # HyperparameterSearchConfig to tune xgb_params by CV before the final fit (None = use xgb_params as is)
+    search: object = None
+    # dense: XGBClassifier.fit; quantile: QuantileDMatrix from float32;
+    # external: chunked external-memory DMatrix; auto: quantile if it fits in RAM
+    training_mode: str = 'dense'
+    chunk_rows: int = 100000
+    max_bin: int = 256
+    # One JSON line per run with wall time and peak RSS
+    training_report_path = os.path.join("artifacts", "training_runs.jsonl")
+    # Cascade members trained next to XGBoost (e.g. ('catboost', 'lightgbm')); empty = XGBoost only
+    ensemble_members: tuple = ()
+    ensemble_params: dict = field(default_factory=lambda: {name: dict(p) for name, p in ENSEMBLE_MEMBER_PARAMS.items()})
+    # Band reported for the cascade at training time (serving uses HEA_ENSEMBLE_BAND)
+    ensemble_band: float = 0.1
+    ensemble_threshold_file_path = os.path.join("artifacts", "ensemble_threshold.txt")
+    ensemble_manifest_file_path = manifest_path()
 
 class ModelTrainer:
-    def __init__(self):
-        self.model_trainer_config = ModelTrainerConfig()
+    def __init__(self, model_trainer_config=None):
+        self.model_trainer_config = model_trainer_config or ModelTrainerConfig()
 
-    def initiate_model_trainer(self, train_array, test_array):
-        try:
-            logging.info("Split training and test input data")
-            X_train, y_train, X_test, y_test = (
-                train_array[:, :-1],
-                train_array[:, -1],
-                test_array[:, :-1],
-                test_array[:, -1]
-            )
+    def search_hyperparameters(self, X_train, y_train, xgb_params):
+        """Cross-validated search on the training split only; returns the winning XGBoost params."""
+        logging.info("Searching hyperparameters...")
+        search_config = self.model_trainer_config.search
+        # Settings not being searched stay fixed across trials
+        fixed = {
+            key: value for key, value in xgb_params.items()
+            if key not in search_config.search_space and key not in ('n_estimators', 'eval_metric')
+        }
+        result = HyperparameterSearch(search_config, base_params=fixed).run(X_train, y_train)
+        print(f"Best CV PR-AUC {result['best_score']:.4f} with {result['best_params']}")
+        return result['best_params']
+
+    def write_training_report(self, report):
+        report['timestamp'] = datetime.now().isoformat(timespec='seconds')
+        logging.info(f"Training took {report['wall_s']:.2f}s, peak RSS {report['peak_rss_mb']:.0f} MB ({report['mode']} mode)")
+        print(f"Training: {report['wall_s']:.2f}s wall, peak RSS {report['peak_rss_mb']:.0f} MB ({report['mode']} mode)")
+        path = self.model_trainer_config.training_report_path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(json.dumps(report, default=str) + '\n')
+
+    def train_ensemble_members(self, X_train, y_train, X_test, y_test, xgb_probs, xgb_threshold):
+        """
+        Fits the configured cascade members, saves them as model_<name>.pkl
+        and picks the threshold for the averaged score. Serving treats
+        members as optional, but one listed here must have its library
+        installed.
+        """
+        config = self.model_trainer_config
+        member_probs = []
+        for name in config.ensemble_members:
+            member = build_ensemble_member(name, config.ensemble_params.get(name, {}))
+            logging.info(f"Fitting ensemble member {name}...")
+            member.fit(X_train, y_train)
+            member_probs.append(member.predict_proba(X_test)[:, 1])
+            joblib.dump(member, member_path(name))
+            logging.info(f"Ensemble member saved to {member_path(name)}")
 
+        beta = config.threshold_beta
+        averaged = (xgb_probs + sum(member_probs)) / (1 + len(member_probs))
+        ensemble_threshold, ensemble_f = optimal_threshold(y_test, averaged, beta=beta)
+        if ensemble_threshold is None:
+            ensemble_threshold = xgb_threshold
+        with open(config.ensemble_threshold_file_path, "w") as f:
+            f.write(str(ensemble_threshold))
+
+        # What the serving cascade would do on the test split
+        escalated = np.abs(xgb_probs - xgb_threshold) <= config.ensemble_band
+        cascade = np.where(escalated, averaged >= ensemble_threshold, xgb_probs >= xgb_threshold).astype(int)
+        cascade_f = fbeta_score(y_test, cascade, beta=beta)
+        print(f"Full ensemble F{beta:g}: {ensemble_f:.4f} (threshold {ensemble_threshold:.3f})")
+        print(f"Cascade F{beta:g}:       {cascade_f:.4f} ({escalated.mean():.1%} of rows escalated at band {config.ensemble_band})")
+        return ensemble_threshold
+
+    def remove_stale_ensemble_artifacts(self):
+        """Deletes member files (and the ensemble threshold) left by earlier runs that this run did not retrain."""
+        config = self.model_trainer_config
+        stale = [member_path(name) for name in ENSEMBLE_MEMBERS if name not in config.ensemble_members]
+        if not config.ensemble_members:
+            stale.append(config.ensemble_threshold_file_path)
+        for path in stale:
+            if os.path.exists(path):
+                os.remove(path)
+                logging.info(f"Removed stale ensemble artifact {path}")
+
+    def initiate_model_trainer(self, X_train, y_train, X_test, y_test):
+        try:
             # 1. DYNAMIC IMBALANCE RATIO
             num_healthy = (y_train == 0).sum()
             num_sick = (y_train == 1).sum()
             ratio = num_healthy / num_sick
             logging.info(f"Training XGBoost. Imbalance Ratio: {ratio:.2f}")
 
-            # 2. CONFIGURE XGBOOST (Optimized for PR-AUC)
-            model = xgb.XGBClassifier(
-                scale_pos_weight=ratio,      # Aggressive balancing
-                n_estimators=600,            # High trees
-                learning_rate=0.02,          # Slow learning
-                max_depth=4,                 # Prevent overfitting
-                min_child_weight=5,          # Conservative
-                subsample=0.8,
-                colsample_bytree=0.8,
-                eval_metric='aucpr',         # Optimize Precision-Recall Area
-                use_label_encoder=False,
-                random_state=42
-            )
-            
-            logging.info("Fitting Model...")
-            model.fit(X_train, y_train)
+            xgb_params = dict(self.model_trainer_config.xgb_params)
+            if self.model_trainer_config.search is not None:
+                xgb_params.update(self.search_hyperparameters(X_train, y_train, xgb_params))
+
+            # 2. CONFIGURE & FIT XGBOOST (Optimized for PR-AUC)
+            mode = resolve_mode(self.model_trainer_config.training_mode, X_train)
+            logging.info(f"Fitting Model ({mode} mode)...")
+            with ResourceTracker() as usage:
+                if mode == 'dense':
+                    model = xgb.XGBClassifier(
+                        scale_pos_weight=ratio,      # Aggressive balancing
+                        use_label_encoder=False,
+                        **xgb_params
+                    )
+                    model.fit(X_train, y_train)
+                else:
+                    model = train_quantized(
+                        X_train, y_train, xgb_params, ratio, mode=mode,
+                        chunk_rows=self.model_trainer_config.chunk_rows,
+                        max_bin=self.model_trainer_config.max_bin,
+                    )
+            self.write_training_report(dict(usage.report(), mode=mode, rows=int(X_train.shape[0]), params=xgb_params))
 
             # 3. THRESHOLD OPTIMIZATION (Maximize F2-Score)
-            logging.info("Optimizing Threshold for F2-Score...")
+            logging.info(f"Optimizing Threshold for F{self.model_trainer_config.threshold_beta:g}-Score...")
             probs = model.predict_proba(X_test)[:, 1]
             
-            best_threshold = 0.5
-            best_f2 = 0.0
-
-            # Scan thresholds
-            for t in np.linspace(0.05, 0.5, 50):
-                preds_temp = (probs >= t).astype(int)
-                # Beta=2 weighs Recall 2x higher than Precision
-                score = fbeta_score(y_test, preds_temp, beta=2)
-                if score > best_f2:
-                    best_f2 = score
-                    best_threshold = t
+            # Exact optimum over every distinct probability (one sort + cumsums)
+            best_threshold, best_f2 = optimal_threshold(y_test, probs, beta=self.model_trainer_config.threshold_beta)
+            if best_threshold is None:
+                raise ValueError("No threshold yields a true positive on the test split")
 
             # 4. FINAL EVALUATION
             final_preds = (probs >= best_threshold).astype(int)
@@ -77,7 +191,7 @@ class ModelTrainer:
             print(f"\n==========================================")
             print(f"🏆 WINNING METRICS (Threshold {best_threshold:.3f})")
             print(f"==========================================")
-            print(f"MAX F2-SCORE:  {best_f2:.4f}")
+            print(f"MAX F{self.model_trainer_config.threshold_beta:g}-SCORE:  {best_f2:.4f}")
             print(f"PR-AUC:        {pr_auc:.4f}")
             print(f"ROC-AUC:       {roc_auc:.4f}")
             print(f"------------------------------------------")
@@ -93,6 +207,11 @@ class ModelTrainer:
 
             logging.info(f"Model saved to {self.model_trainer_config.trained_model_file_path}")
             logging.info(f"Threshold {best_threshold} saved to {self.model_trainer_config.threshold_file_path}")
+
+            if self.model_trainer_config.ensemble_members:
+                self.train_ensemble_members(X_train, y_train, X_test, y_test, probs, best_threshold)
+            self.remove_stale_ensemble_artifacts()
+            write_members_manifest(self.model_trainer_config.ensemble_members, self.model_trainer_config.ensemble_manifest_file_path)
             
             return self.model_trainer_config.trained_model_file_path
 
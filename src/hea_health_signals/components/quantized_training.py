@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import xgboost as xgb
+from src.hea_health_signals.logger import logging
+
+TRAINING_MODES = ('dense', 'quantile', 'external', 'auto')
+
+# sklearn-style names used in params.yaml -> native xgb.train names
+NATIVE_PARAM_NAMES = {'random_state': 'seed', 'n_jobs': 'nthread'}
+
+
+class ChunkIter(xgb.DataIter):
+    """
+    Feeds (X, y) to XGBoost in row chunks. X can be a read-only memmap (the
+    persisted transformation output), so only one float32 chunk at a time
+    is materialized; XGBoost pages its quantized copy to cache_prefix.
+    """
+    def __init__(self, X, y, chunk_rows, cache_prefix=None):
+        self.X = X
+        self.y = y
+        self.chunk_rows = chunk_rows
+        self._start = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._start >= self.X.shape[0]:
+            return False
+        stop = self._start + self.chunk_rows
+        input_data(
+            data=np.ascontiguousarray(self.X[self._start:stop], dtype=np.float32),
+            label=np.asarray(self.y[self._start:stop], dtype=np.float32),
+        )
+        self._start = stop
+        return True
+
+    def reset(self):
+        self._start = 0
+
+
+def native_params(xgb_params, scale_pos_weight):
+    """Splits sklearn-style params into (xgb.train params, num_boost_round)."""
+    params = {'objective': 'binary:logistic', 'tree_method': 'hist', 'scale_pos_weight': scale_pos_weight}
+    num_rounds = 100
+    for key, value in xgb_params.items():
+        if key == 'n_estimators':
+            num_rounds = int(value)
+        elif value is not None:
+            params[NATIVE_PARAM_NAMES.get(key, key)] = value
+    return params, num_rounds
+
+
+def matrix_bytes(X):
+    """float32 footprint of X once it is in a DMatrix."""
+    return int(X.shape[0]) * int(X.shape[1]) * 4
+
+
+def available_memory_bytes():
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def resolve_mode(mode, X, memory_fraction=0.5):
+    """'auto' -> 'quantile' if the float32 matrix uses under memory_fraction of free RAM, else 'external'."""
+    if mode not in TRAINING_MODES:
+        raise ValueError(f"Unknown training mode {mode!r}; expected one of {TRAINING_MODES}")
+    if mode != 'auto':
+        return mode
+    available = available_memory_bytes()
+    if available is None or matrix_bytes(X) < available * memory_fraction:
+        return 'quantile'
+    return 'external'
+
+
+def train_quantized(X, y, xgb_params, scale_pos_weight, mode='quantile', chunk_rows=100000, max_bin=256, cache_dir=None):
+    """
+    Trains with the histogram method on a quantized DMatrix and returns an
+    XGBClassifier, so model.pkl keeps the same type as the dense path.
+
+    quantile: in-memory QuantileDMatrix built from float32 chunks.
+    external: ExtMemQuantileDMatrix over ChunkIter, with pages cached on disk.
+    """
+    params, num_rounds = native_params(xgb_params, scale_pos_weight)
+    params['max_bin'] = max_bin
+    cache_root = None
+    try:
+        if mode == 'quantile':
+            # Built batch by batch, so no full float32 copy of X is ever made
+            dtrain = xgb.QuantileDMatrix(ChunkIter(X, y, chunk_rows), max_bin=max_bin)
+        elif mode == 'external':
+            cache_root = tempfile.mkdtemp(prefix='xgb-extmem-', dir=cache_dir)
+            dtrain = xgb.ExtMemQuantileDMatrix(
+                ChunkIter(X, y, chunk_rows, cache_prefix=os.path.join(cache_root, 'cache')), max_bin=max_bin
+            )
+        else:
+            raise ValueError(f"train_quantized does not handle mode {mode!r}")
+
+        logging.info(f"Training {num_rounds} rounds on {type(dtrain).__name__} ({dtrain.num_row()} rows)")
+        booster = xgb.train(params, dtrain, num_boost_round=num_rounds)
+    finally:
+        if cache_root is not None:
+            shutil.rmtree(cache_root, ignore_errors=True)
+
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(booster.save_raw('ubj')))
+    return model
@@ -0,0 +1,178 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from src.hea_health_signals.logger import logging
+from src.hea_health_signals.utils.metrics import Histogram
+
+
+class CoalescerOverloaded(Exception):
+    """The coalescer is full or too slow to answer; callers should shed the request (e.g. HTTP 503)."""
+
+
+@dataclass
+class CoalescerConfig:
+    max_batch_size: int = 64
+    max_wait_ms: float = 2.0
+    max_queue_size: int = 10000
+
+
+class PredictionCoalescer:
+    """
+    Micro-batches concurrent single-row predictions.
+    Callers enqueue a payload and block on their own Future; one worker
+    thread flushes the queue through PredictPipeline.predict_batch as soon
+    as max_batch_size payloads are waiting or the oldest one has waited
+    max_wait_ms, whichever comes first.
+    """
+    def __init__(self, pipeline_factory, config=None):
+        self.pipeline_factory = pipeline_factory
+        self.config = config or CoalescerConfig()
+        self._queue = queue.Queue(maxsize=self.config.max_queue_size)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stopping = False
+
+        self.batch_size = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        # Seconds, like the Prometheus stage histograms
+        self.queue_wait_seconds = Histogram([0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1])
+        self.batch_latency_seconds = Histogram([0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1])
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopping = False
+                self._worker = threading.Thread(target=self._run, name="prediction-coalescer", daemon=True)
+                self._worker.start()
+
+    def submit(self, payload):
+        """Queues one analyze payload; the Future resolves to the predict() style result."""
+        self._ensure_worker()
+        future = Future()
+        # Fail fast when saturated so callers shed load instead of piling up
+        try:
+            self._queue.put_nowait((payload, future, time.perf_counter()))
+        except queue.Full:
+            raise CoalescerOverloaded(
+                f"Prediction queue is full ({self.config.max_queue_size} waiting), retry shortly"
+            ) from None
+        return future
+
+    def predict(self, payload, timeout=None):
+        """Blocking submit(); CoalescerOverloaded when no result arrives within timeout seconds."""
+        future = self.submit(payload)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Still queued: the worker skips it. Already running: its result is discarded
+            future.cancel()
+            raise CoalescerOverloaded(f"No prediction within {timeout}s, retry shortly") from None
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first[2] + self.config.max_wait_ms / 1000.0
+        while len(batch) < self.config.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Past the deadline, still take whatever is already queued
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopping = True
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            try:
+                self._flush(batch)
+            except Exception as e:
+                # One bad batch must not end the worker and strand every later caller
+                logging.error(f"Coalesced batch of {len(batch)} could not be delivered: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            if self._stopping:
+                return
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        # Drops futures cancelled while queued (e.g. a disconnected async client); the rest
+        # are marked running, so they can no longer be cancelled before their result is set
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        for _, _, enqueued in batch:
+            self.queue_wait_seconds.observe(started - enqueued)
+        self.batch_size.observe(len(batch))
+
+        try:
+            results, errors = self.pipeline_factory().predict_batch([payload for payload, _, _ in batch])
+        except Exception as e:
+            logging.error(f"Coalesced batch of {len(batch)} failed: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        messages = {error['index']: error['message'] for error in errors}
+        for i, (_, future, _) in enumerate(batch):
+            if results[i] is not None:
+                future.set_result(results[i])
+            else:
+                future.set_exception(ValueError(messages.get(i, 'Invalid input')))
+        self.batch_latency_seconds.observe(time.perf_counter() - started)
+
+    def close(self, timeout=5.0):
+        """
+        Flushes what is queued and stops the worker. Payloads still queued
+        once it has stopped (or when the queue had no room for the stop
+        marker) fail with CoalescerOverloaded instead of never resolving.
+        """
+        worker = self._worker
+        if worker is not None and worker.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            worker.join(timeout)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(CoalescerOverloaded("Prediction coalescer closed before this payload ran"))
+
+    def stats(self):
+        return {
+            'queue_depth': self._queue.qsize(),
+            'batch_size': self.batch_size.snapshot(),
+            'queue_wait_seconds': self.queue_wait_seconds.snapshot(),
+            'queue_wait_p99_seconds': self.queue_wait_seconds.quantile(0.99),
+            'batch_latency_seconds': self.batch_latency_seconds.snapshot(),
+        }
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_prediction_coalescer(pipeline_factory, config=None):
+    """Process-wide coalescer, created on first use."""
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = PredictionCoalescer(pipeline_factory, config)
+    return _coalescer
@@ -0,0 +1,127 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import numpy as np
+from src.hea_health_signals.utils.metrics import METRICS, STAGE_SECONDS
+
+# Optional second-tier members, in the order their scores are averaged
+ENSEMBLE_MEMBERS = ('lightgbm', 'catboost')
+
+CASCADE_TIERS = ('xgboost', 'ensemble')
+
+CASCADE_ROWS = METRICS.counter(
+    'hea_cascade_rows_total', 'Rows scored by each tier of the cascade ensemble.', labelnames=('tier',)
+)
+MEMBER_CALLS = METRICS.counter(
+    'hea_cascade_member_calls_total', 'predict_proba calls made to second-tier ensemble members.', labelnames=('member',)
+)
+MEMBERS_STAGE = STAGE_SECONDS.labels(stage='ensemble_members')
+
+
+def member_path(name, directory='artifacts'):
+    return os.path.join(directory, f"model_{name}.pkl")
+
+
+def manifest_path(directory='artifacts'):
+    return os.path.join(directory, 'ensemble_members.json')
+
+
+def write_members_manifest(names, path=None):
+    """Records which members the last training run produced; the registry serves only those."""
+    path = path or manifest_path()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'members': list(names)}, f)
+
+
+def read_members_manifest(path=None):
+    """Member names from the manifest, or None when there is none (artifacts from before it existed)."""
+    path = path or manifest_path()
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return tuple(json.load(f)['members'])
+
+
+@dataclass
+class CascadeConfig:
+    # Rows whose XGBoost score is within band of the threshold go to the second tier
+    band: float = 0.1
+    # Threads for the second-tier members (default: one per member)
+    max_workers: int = None
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_member_executor(max_workers):
+    """Process-wide pool for member calls; LightGBM and CatBoost release the GIL while predicting."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hea-ensemble')
+    return _executor
+
+
+class CascadeEnsemble:
+    """
+    Two-tier scorer. XGBoost scores every row; only rows it is unsure about
+    (score within band of the threshold) are also scored by the other
+    members, concurrently, on one shared copy of the scaled features. Their
+    probabilities are averaged with XGBoost's and compared with the
+    ensemble threshold.
+    """
+    def __init__(self, members, threshold, ensemble_threshold=None, config=None):
+        self.members = dict(members)
+        self.threshold = threshold
+        self.ensemble_threshold = threshold if ensemble_threshold is None else ensemble_threshold
+        self.config = config or CascadeConfig()
+
+    def uncertain(self, base_probs):
+        return np.abs(base_probs - self.threshold) <= self.config.band
+
+    def score(self, data_scaled, base_probs):
+        """
+        Returns (probs, escalated): final probabilities and a boolean mask
+        of the rows that went to the second tier.
+        """
+        probs = np.array(base_probs, dtype=np.float64)
+        escalated = self.uncertain(probs)
+        n_escalated = int(escalated.sum())
+        CASCADE_ROWS.inc(probs.shape[0] - n_escalated, tier='xgboost')
+        if n_escalated == 0 or not self.members:
+            return probs, np.zeros(probs.shape[0], dtype=bool)
+        CASCADE_ROWS.inc(n_escalated, tier='ensemble')
+
+        # One read-only buffer shared by every member
+        features = np.ascontiguousarray(data_scaled[escalated], dtype=np.float64)
+        features.setflags(write=False)
+        with MEMBERS_STAGE.time():
+            member_probs = self._run_members(features)
+        probs[escalated] = (probs[escalated] + sum(member_probs)) / (1 + len(member_probs))
+        return probs, escalated
+
+    def _run_members(self, features):
+        for name in self.members:
+            MEMBER_CALLS.inc(member=name)
+        if len(self.members) == 1:
+            model, = self.members.values()
+            return [model.predict_proba(features)[:, 1]]
+        executor = get_member_executor(self.config.max_workers or len(ENSEMBLE_MEMBERS))
+        futures = [executor.submit(model.predict_proba, features) for model in self.members.values()]
+        return [future.result()[:, 1] for future in futures]
+
+
+def cascade_stats():
+    """Rows per tier and member calls since process start."""
+    rows = {tier: CASCADE_ROWS.value(tier=tier) for tier in CASCADE_TIERS}
+    total = sum(rows.values())
+    return {
+        'rows': rows,
+        'escalation_rate': round(rows['ensemble'] / total, 4) if total else 0.0,
+        'member_calls': {name: MEMBER_CALLS.value(member=name) for name in ENSEMBLE_MEMBERS},
+    }
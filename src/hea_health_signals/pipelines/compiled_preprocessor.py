@@ -0,0 +1,87 @@
+import threading
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+
+class CompiledPreprocessor:
+    """
+    Pandas-free replacement for the fitted preprocessor.pkl.
+    The median imputer + standard scaler from DataTransformation collapse
+    into: x -> (where(isnan(x), median, x) - mean) / scale. The arithmetic is
+    done in float64 exactly as sklearn does it and only the result is
+    stored as float32 (the dtype XGBoost converts every input to anyway).
+    """
+    def __init__(self, feature_names, medians, mean, scale):
+        self.feature_names = list(feature_names)
+        self.medians = np.asarray(medians, dtype=np.float64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.n_features = len(self.feature_names)
+        # Per-thread scratch/output buffers so concurrent requests never share one
+        self._buffers = threading.local()
+
+    @classmethod
+    def from_column_transformer(cls, preprocessor):
+        """Extracts the fitted statistics; raises ValueError for unsupported layouts."""
+        if not isinstance(preprocessor, ColumnTransformer):
+            raise ValueError("Expected a fitted ColumnTransformer")
+        transformers = [t for t in preprocessor.transformers_ if t[0] != 'remainder' or t[1] != 'drop']
+        if len(transformers) != 1:
+            raise ValueError("Only a single numeric pipeline can be compiled")
+
+        _, pipeline, columns = transformers[0]
+        if not isinstance(pipeline, Pipeline) or len(pipeline.steps) != 2:
+            raise ValueError("Expected Pipeline(imputer, scaler)")
+        imputer, scaler = pipeline.steps[0][1], pipeline.steps[1][1]
+        if not isinstance(imputer, SimpleImputer) or not isinstance(scaler, StandardScaler):
+            raise ValueError("Expected SimpleImputer followed by StandardScaler")
+        if imputer.add_indicator or not (isinstance(imputer.missing_values, float) and np.isnan(imputer.missing_values)):
+            raise ValueError("Only NaN imputation without indicators can be compiled")
+
+        medians = np.asarray(imputer.statistics_, dtype=np.float64)
+        if np.isnan(medians).any():
+            # sklearn drops all-missing columns, which changes the output width
+            raise ValueError("Imputer has undefined statistics")
+
+        n_features = len(columns)
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+        return cls(columns, medians, mean, scale)
+
+    def _thread_buffers(self):
+        buffers = getattr(self._buffers, 'value', None)
+        if buffers is None:
+            buffers = (np.empty(self.n_features, dtype=np.float64),
+                       np.empty((1, self.n_features), dtype=np.float32))
+            self._buffers.value = buffers
+        return buffers
+
+    def transform_row(self, values):
+        """
+        Transforms one row (sequence ordered like feature_names) into this
+        thread's preallocated (1, n_features) float32 buffer. The returned
+        array is reused by the next call on the same thread.
+        """
+        scratch, out = self._thread_buffers()
+        scratch[:] = values
+        np.copyto(scratch, self.medians, where=np.isnan(scratch))
+        scratch -= self.mean
+        scratch /= self.scale
+        out[0, :] = scratch
+        return out
+
+    def transform(self, X, out=None):
+        """Transforms an (n, n_features) matrix into a float32 array."""
+        X = np.array(X, dtype=np.float64)
+        missing = np.isnan(X)
+        if missing.any():
+            X[missing] = np.broadcast_to(self.medians, X.shape)[missing]
+        X -= self.mean
+        X /= self.scale
+        if out is None:
+            return X.astype(np.float32)
+        out[...] = X
+        return out
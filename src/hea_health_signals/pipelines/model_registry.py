@@ -0,0 +1,239 @@
+import os
+import sys
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, field
+import joblib
+from src.hea_health_signals.exception import CustomException
+from src.hea_health_signals.logger import logging
+from src.hea_health_signals.pipelines.compiled_preprocessor import CompiledPreprocessor
+from src.hea_health_signals.pipelines.tree_ensemble import TreeEnsembleEvaluator
+from src.hea_health_signals.pipelines.cascade_ensemble import ENSEMBLE_MEMBERS, member_path, manifest_path, read_members_manifest
+from src.hea_health_signals.utils.metrics import METRICS
+
+
+@dataclass
+class ModelRegistryConfig:
+    model_path: str = os.path.join('artifacts', 'model.pkl')
+    preprocessor_path: str = os.path.join('artifacts', 'preprocessor.pkl')
+    threshold_path: str = os.path.join('artifacts', 'threshold.txt')
+    default_threshold: float = 0.33
+    # Optional second-tier models for the cascade ensemble; missing files are skipped
+    ensemble_model_paths: dict = field(default_factory=lambda: {name: member_path(name) for name in ENSEMBLE_MEMBERS})
+    ensemble_threshold_path: str = os.path.join('artifacts', 'ensemble_threshold.txt')
+    # Members of the last training run; files of members it did not train are ignored
+    ensemble_manifest_path: str = field(default_factory=manifest_path)
+    # Seconds between artifact stat() checks; None disables hot reload
+    reload_check_interval: float = 5.0
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """Immutable snapshot of everything the request path needs for inference."""
+    model: object
+    preprocessor: object
+    threshold: float
+    compiled_preprocessor: object = None
+    tree_evaluator: object = None
+    # {name: model} of the members that loaded, and the threshold for their averaged score
+    ensemble_members: dict = field(default_factory=dict)
+    ensemble_threshold: float = None
+    versions: dict = field(default_factory=dict)
+    load_time: float = 0.0
+    loaded_at: float = 0.0
+
+    @property
+    def version(self):
+        """Single identifier for the artifact set, used to key cached results."""
+        names = ('model', 'preprocessor', 'threshold') + tuple(sorted(self.ensemble_members))
+        return '-'.join(str(self.versions.get(name)) for name in names)
+
+
+def read_threshold(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r') as f:
+        return float(f.read().strip())
+
+
+def load_ensemble_members(paths, listed=None):
+    """
+    Loads the member models that exist, restricted to the names listed in
+    the training manifest when there is one; one that cannot be unpickled
+    (e.g. lightgbm not installed) is skipped.
+    """
+    members = {}
+    for name, path in paths.items():
+        if not os.path.exists(path) or (listed is not None and name not in listed):
+            continue
+        try:
+            members[name] = joblib.load(path)
+        except ImportError as e:
+            logging.warning(f"Ensemble member {name} not loaded: {e}")
+    return members
+
+
+def artifact_version(path):
+    """Short content hash of an artifact file (None if it does not exist)."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class ModelRegistry:
+    """
+    Process-wide holder of the trained artifacts.
+    Loads model, preprocessor and threshold once and hands the same
+    bundle to every request; safe to call from concurrent threads.
+    Artifact files are stat()ed at most every reload_check_interval
+    seconds and the bundle is swapped when one of them changes.
+    """
+    def __init__(self, config=None):
+        self.config = config or ModelRegistryConfig()
+        self._lock = threading.RLock()
+        self._bundle = None
+        self._stamp = None
+        self._last_check = 0.0
+        self.reloads = 0
+
+    @property
+    def is_loaded(self):
+        return self._bundle is not None
+
+    def load(self, force=False):
+        # Double-checked so concurrent first requests trigger a single load
+        if self._bundle is not None and not force:
+            return self._bundle
+        with self._lock:
+            if self._bundle is not None and not force:
+                return self._bundle
+            try:
+                start = time.perf_counter()
+                stamp = self._artifact_stamp()
+                model = joblib.load(self.config.model_path)
+                preprocessor = joblib.load(self.config.preprocessor_path)
+
+                threshold = read_threshold(self.config.threshold_path, self.config.default_threshold)
+                ensemble_members = load_ensemble_members(
+                    self.config.ensemble_model_paths, read_members_manifest(self.config.ensemble_manifest_path)
+                )
+                ensemble_threshold = read_threshold(self.config.ensemble_threshold_path) if ensemble_members else None
+
+                try:
+                    compiled_preprocessor = CompiledPreprocessor.from_column_transformer(preprocessor)
+                except ValueError as e:
+                    logging.warning(f"Preprocessor not compiled, using sklearn transform: {e}")
+                    compiled_preprocessor = None
+
+                try:
+                    tree_evaluator = TreeEnsembleEvaluator.from_xgboost(model)
+                except Exception as e:
+                    # Any export failure falls back to XGBoost instead of failing the load
+                    logging.warning(f"Native tree evaluator unavailable, using predict_proba: {e}")
+                    tree_evaluator = None
+
+                versions = {
+                    'model': artifact_version(self.config.model_path),
+                    'preprocessor': artifact_version(self.config.preprocessor_path),
+                    'threshold': artifact_version(self.config.threshold_path),
+                }
+                for name in ensemble_members:
+                    versions[name] = artifact_version(self.config.ensemble_model_paths[name])
+                load_time = time.perf_counter() - start
+
+                self._bundle = ModelBundle(
+                    model=model,
+                    preprocessor=preprocessor,
+                    threshold=threshold,
+                    compiled_preprocessor=compiled_preprocessor,
+                    tree_evaluator=tree_evaluator,
+                    ensemble_members=ensemble_members,
+                    ensemble_threshold=ensemble_threshold,
+                    versions=versions,
+                    load_time=load_time,
+                    loaded_at=time.time(),
+                )
+                self._stamp = stamp
+                self._last_check = time.monotonic()
+                logging.info(f"Model registry loaded in {load_time * 1000:.1f} ms. Versions: {versions}")
+                return self._bundle
+            except Exception as e:
+                raise CustomException(e, sys)
+
+    def _artifact_stamp(self):
+        stamps = []
+        paths = (self.config.model_path, self.config.preprocessor_path, self.config.threshold_path,
+                 self.config.ensemble_threshold_path, self.config.ensemble_manifest_path,
+                 *self.config.ensemble_model_paths.values())
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def refresh_if_changed(self):
+        """Reloads the bundle when an artifact file changed on disk. Returns True on reload."""
+        with self._lock:
+            self._last_check = time.monotonic()
+            if self._bundle is None or self._artifact_stamp() == self._stamp:
+                return False
+            try:
+                self.load(force=True)
+                self.reloads += 1
+                return True
+            except CustomException as e:
+                # e.g. a retrain still writing model.pkl; keep serving the old bundle
+                logging.warning(f"Artifact reload failed, keeping current model: {e}")
+                return False
+
+    def get(self):
+        if self._bundle is None:
+            return self.load()
+        interval = self.config.reload_check_interval
+        if interval is not None and time.monotonic() - self._last_check >= interval:
+            self.refresh_if_changed()
+        return self._bundle
+
+    def info(self):
+        bundle = self.get()
+        return {
+            'load_time_ms': round(bundle.load_time * 1000, 3),
+            'loaded_at': bundle.loaded_at,
+            'threshold': bundle.threshold,
+            'ensemble_members': sorted(bundle.ensemble_members),
+            'ensemble_threshold': bundle.ensemble_threshold,
+            'version': bundle.version,
+            'versions': dict(bundle.versions),
+        }
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry():
+    return _registry
+
+
+def collect_model_metrics():
+    """Prometheus collector for the process-wide registry."""
+    bundle = _registry._bundle
+    if bundle is None:
+        return []
+    return [
+        ('hea_model_load_seconds', 'gauge', 'Time taken by the last model artifact load.',
+         [('hea_model_load_seconds', {}, bundle.load_time)]),
+        ('hea_model_info', 'gauge', 'Currently served artifact set.',
+         [('hea_model_info', {'version': bundle.version}, 1)]),
+        ('hea_model_reloads_total', 'counter', 'Hot reloads after artifact changes.',
+         [('hea_model_reloads_total', {}, _registry.reloads)]),
+    ]
+
+
+METRICS.register_collector(collect_model_metrics)
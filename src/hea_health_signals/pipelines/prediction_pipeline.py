@@ -2,60 +2,297 @@ import sys
 import os
 import pandas as pd
 import numpy as np
-import joblib
 from src.hea_health_signals.exception import CustomException
+from src.hea_health_signals.pipelines.model_registry import get_model_registry
+from src.hea_health_signals.pipelines.cascade_ensemble import CascadeEnsemble, CascadeConfig
+from src.hea_health_signals.utils.metrics import STAGE_SECONDS
+
+# Raw payload fields accepted by the API, in columnar order
+INPUT_FIELDS = [
+    'bmi_current', 'bmi_past', 'health_current', 'health_past',
+    'depression_current', 'depression_past', 'high_bp', 'age'
+]
+
+# *_past payload field -> UserBaseline signal that stands in for it when the caller omits it
+BASELINE_FIELDS = {
+    'bmi_past': 'bmi_current',
+    'health_past': 'health_perception',
+    'depression_past': 'depression_index',
+}
+
+# EXACT FEATURES FROM INGESTION (order expected by preprocessor.pkl)
+FEATURE_COLUMNS = [
+    'r10bmi', 'bmi_ratio', 'r10shlt', 'health_decline',
+    'r10cesd', 'cesd_change', 'r10hibp', 'r10agey_e',
+    'age_bmi_interact', 'bp_bmi_interact', 'psycho_somatic'
+]
+
+# 'xgboost' runs XGBClassifier.predict_proba, 'native' the flat-array TreeEnsembleEvaluator
+SCORERS = ('xgboost', 'native')
+
+# Above this many rows XGBoost's C++ predictor beats the NumPy traversal
+NATIVE_MAX_BATCH_ROWS = 32
+
+FEATURES_STAGE = STAGE_SECONDS.labels(stage='features')
+TRANSFORM_STAGE = STAGE_SECONDS.labels(stage='transform')
+PREDICT_STAGE = STAGE_SECONDS.labels(stage='predict_proba')
+BATCH_FEATURES_STAGE = STAGE_SECONDS.labels(stage='batch_features')
+BATCH_TRANSFORM_STAGE = STAGE_SECONDS.labels(stage='batch_transform')
+BATCH_PREDICT_STAGE = STAGE_SECONDS.labels(stage='batch_predict_proba')
+
+
+def batch_rows(inputs):
+    """
+    Number of rows in a batch without parsing it. Columnar dicts must map
+    every INPUT_FIELDS name to a list of one common length; ValueError
+    names the offending column otherwise.
+    """
+    if isinstance(inputs, dict):
+        missing = [name for name in INPUT_FIELDS if name not in inputs]
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+        lengths = {}
+        for name in INPUT_FIELDS:
+            column = inputs[name]
+            if not isinstance(column, (list, tuple, np.ndarray)):
+                raise ValueError(f"Column '{name}' must be a list of values")
+            lengths.setdefault(len(column), name)
+        if len(lengths) != 1:
+            first, *others = lengths.items()
+            raise ValueError(
+                f"All columns must have the same length: '{others[0][1]}' has {others[0][0]} rows, "
+                f"'{first[1]}' has {first[0]}"
+            )
+        return next(iter(lengths))
+    if isinstance(inputs, (list, tuple, np.ndarray)):
+        return len(inputs)
+    raise ValueError("Expected a list of payloads or a columnar dict")
+
+
+def parse_batch(inputs):
+    """
+    Converts a batch of payloads into a float matrix of shape (n, len(INPUT_FIELDS)).
+    Accepts a list of payload dicts, a columnar dict {field: [values]} or a 2D array
+    whose columns follow INPUT_FIELDS. Returns (raw, errors) where rows that failed
+    to parse are NaN and listed in errors as {'index', 'message'}.
+    """
+    errors = []
+
+    if isinstance(inputs, dict):
+        n_rows = batch_rows(inputs)
+        raw = np.empty((n_rows, len(INPUT_FIELDS)), dtype=np.float64)
+        bad_rows = {}
+        for j, name in enumerate(INPUT_FIELDS):
+            column = inputs[name]
+            try:
+                raw[:, j] = np.asarray(column, dtype=np.float64)
+            except (TypeError, ValueError):
+                # Fall back to per-value parsing only for columns with bad entries
+                for i, value in enumerate(column):
+                    try:
+                        raw[i, j] = float(value)
+                    except (TypeError, ValueError) as e:
+                        raw[i, j] = np.nan
+                        bad_rows.setdefault(i, f"{name}: {e}")
+        for i in sorted(bad_rows):
+            raw[i, :] = np.nan
+            errors.append({'index': i, 'message': bad_rows[i]})
+
+    elif isinstance(inputs, (list, tuple)) and (len(inputs) == 0 or isinstance(inputs[0], dict)):
+        raw = np.empty((len(inputs), len(INPUT_FIELDS)), dtype=np.float64)
+        for i, payload in enumerate(inputs):
+            try:
+                raw[i, :] = [float(payload.get(name)) for name in INPUT_FIELDS]
+            except Exception as e:
+                raw[i, :] = np.nan
+                errors.append({'index': i, 'message': str(e)})
+
+    else:
+        raw = np.array(inputs, dtype=np.float64, ndmin=2)
+        if raw.shape[1] != len(INPUT_FIELDS):
+            raise ValueError(f"Expected {len(INPUT_FIELDS)} columns ({INPUT_FIELDS}), got {raw.shape[1]}")
+
+    # high_bp is an integer flag in the single-row path (int() truncates)
+    raw[:, INPUT_FIELDS.index('high_bp')] = np.trunc(raw[:, INPUT_FIELDS.index('high_bp')])
+    return raw, errors
+
+
+def fill_from_baseline(input_data, stats, statistic='ewma'):
+    """
+    Returns (payload, filled): a copy of input_data where each missing
+    *_past field is taken from the user's baseline stats (the EWMA of that
+    signal by default), and the {field: value} pairs that were filled.
+    """
+    payload = dict(input_data)
+    filled = {}
+    for field, signal in BASELINE_FIELDS.items():
+        if payload.get(field) not in (None, ''):
+            continue
+        value = (stats or {}).get(signal, {}).get(statistic)
+        if value is not None:
+            payload[field] = filled[field] = value
+    return payload, filled
+
+
+def derive_features(raw):
+    """Vectorized version of the feature engineering done in DataIngestion."""
+    r10bmi, r9bmi, r10shlt, r9shlt, r10cesd, r9cesd, r10hibp, r10agey_e = raw.T
+
+    features = np.empty((raw.shape[0], len(FEATURE_COLUMNS)), dtype=np.float64)
+    features[:, 0] = r10bmi
+    features[:, 1] = r10bmi / (r9bmi + 0.1)
+    features[:, 2] = r10shlt
+    features[:, 3] = r10shlt - r9shlt
+    features[:, 4] = r10cesd
+    features[:, 5] = r10cesd - r9cesd
+    features[:, 6] = r10hibp
+    features[:, 7] = r10agey_e
+    features[:, 8] = r10agey_e * r10bmi
+    features[:, 9] = r10hibp * r10bmi
+    features[:, 10] = r10cesd * r10shlt
+    return features
+
 
 class PredictPipeline:
-    def __init__(self):
-        self.model_path = os.path.join('artifacts', 'model.pkl')
-        self.thresh_path = os.path.join('artifacts', 'threshold.txt')
-        self.preprocessor_path = os.path.join('artifacts', 'preprocessor.pkl')
-        
-        self.model = joblib.load(self.model_path)
-        self.preprocessor = joblib.load(self.preprocessor_path)
-
-        if os.path.exists(self.thresh_path):
-            with open(self.thresh_path, 'r') as f:
-                self.threshold = float(f.read().strip())
-        else:
-            self.threshold = 0.33
+    def __init__(self, registry=None, scorer='xgboost', ensemble=False, ensemble_band=0.1):
+        # Artifacts are loaded once per process by the registry; building a
+        # pipeline per request only picks up the current bundle.
+        self.registry = registry or get_model_registry()
+        bundle = self.registry.get()
+
+        self.model_path = self.registry.config.model_path
+        self.thresh_path = self.registry.config.threshold_path
+        self.preprocessor_path = self.registry.config.preprocessor_path
+
+        self.model = bundle.model
+        self.preprocessor = bundle.preprocessor
+        self.threshold = bundle.threshold
+        self.compiled_preprocessor = bundle.compiled_preprocessor
+        self.tree_evaluator = bundle.tree_evaluator
+        self.versions = bundle.versions
+        self.model_version = bundle.version
+
+        if scorer not in SCORERS:
+            raise ValueError(f"Unknown scorer '{scorer}', expected one of {SCORERS}")
+        # Fall back to XGBoost when the booster could not be exported
+        self.scorer = scorer if (scorer != 'native' or self.tree_evaluator is not None) else 'xgboost'
+
+        # Cascade: XGBoost first, the other members only near the threshold
+        self.cascade = None
+        if ensemble and bundle.ensemble_members:
+            self.cascade = CascadeEnsemble(
+                bundle.ensemble_members, self.threshold, bundle.ensemble_threshold, CascadeConfig(band=ensemble_band)
+            )
 
     def predict(self, input_data):
         try:
-            r10bmi = float(input_data.get('bmi_current'))
-            r9bmi = float(input_data.get('bmi_past')) 
-            r10shlt = float(input_data.get('health_current')) 
-            r9shlt = float(input_data.get('health_past'))
-            r10cesd = float(input_data.get('depression_current')) 
-            r9cesd = float(input_data.get('depression_past'))
-            r10hibp = int(input_data.get('high_bp')) 
-            r10agey_e = float(input_data.get('age'))
-
-            bmi_ratio = r10bmi / (r9bmi + 0.1)
-            health_decline = r10shlt - r9shlt
-            cesd_change = r10cesd - r9cesd
-            age_bmi_interact = r10agey_e * r10bmi
-            bp_bmi_interact = r10hibp * r10bmi
-            psycho_somatic = r10cesd * r10shlt
-            
-            data_dict = {
-                'r10bmi': [r10bmi], 'bmi_ratio': [bmi_ratio], 'r10shlt': [r10shlt],
-                'health_decline': [health_decline], 'r10cesd': [r10cesd], 'cesd_change': [cesd_change],
-                'r10hibp': [r10hibp], 'r10agey_e': [r10agey_e], 'age_bmi_interact': [age_bmi_interact],
-                'bp_bmi_interact': [bp_bmi_interact], 'psycho_somatic': [psycho_somatic]
-            }
-            
-            df = pd.DataFrame(data_dict)
-            data_scaled = self.preprocessor.transform(df)
-            probs = self.model.predict_proba(data_scaled)[:, 1]
-            risk_score = probs[0]
-            is_risky = risk_score >= self.threshold
-            
-            return {
-                "is_risky": bool(is_risky),
+            with FEATURES_STAGE.time():
+                r10bmi = float(input_data.get('bmi_current'))
+                r9bmi = float(input_data.get('bmi_past')) 
+                r10shlt = float(input_data.get('health_current')) 
+                r9shlt = float(input_data.get('health_past'))
+                r10cesd = float(input_data.get('depression_current')) 
+                r9cesd = float(input_data.get('depression_past'))
+                r10hibp = int(input_data.get('high_bp')) 
+                r10agey_e = float(input_data.get('age'))
+
+                bmi_ratio = r10bmi / (r9bmi + 0.1)
+                health_decline = r10shlt - r9shlt
+                cesd_change = r10cesd - r9cesd
+                age_bmi_interact = r10agey_e * r10bmi
+                bp_bmi_interact = r10hibp * r10bmi
+                psycho_somatic = r10cesd * r10shlt
+
+                # Same order as FEATURE_COLUMNS
+                row = (
+                    r10bmi, bmi_ratio, r10shlt, health_decline, r10cesd, cesd_change,
+                    r10hibp, r10agey_e, age_bmi_interact, bp_bmi_interact, psycho_somatic
+                )
+
+            with TRANSFORM_STAGE.time():
+                data_scaled = self.transform(row)
+            with PREDICT_STAGE.time():
+                probs = self.predict_proba(data_scaled)[:, 1]
+            return self.score(data_scaled, probs)[0]
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def transform(self, row):
+        """Scales one feature row, via the compiled fast path when available."""
+        if self.compiled_preprocessor is not None:
+            return self.compiled_preprocessor.transform_row(row)
+        df = pd.DataFrame([row], columns=FEATURE_COLUMNS)
+        return self.preprocessor.transform(df)
+
+    def predict_proba(self, data_scaled):
+        """Runs the selected scorer on already scaled features."""
+        if self.scorer == 'native' and data_scaled.shape[0] <= NATIVE_MAX_BATCH_ROWS:
+            return self.tree_evaluator.predict_proba(data_scaled)
+        return self.model.predict_proba(data_scaled)
+
+    def score(self, data_scaled, probs):
+        """Result dicts for XGBoost probabilities, after the cascade's second tier if enabled."""
+        thresholds = np.full(probs.shape[0], self.threshold)
+        escalated = None
+        if self.cascade is not None:
+            probs, escalated = self.cascade.score(data_scaled, probs)
+            thresholds[escalated] = self.cascade.ensemble_threshold
+
+        results = []
+        for i, risk_score in enumerate(probs):
+            result = {
+                "is_risky": bool(risk_score >= thresholds[i]),
                 "risk_score": float(risk_score),
-                "threshold_used": self.threshold
+                "threshold_used": float(thresholds[i])
             }
+            if escalated is not None:
+                result["tier"] = 'ensemble' if escalated[i] else 'xgboost'
+            results.append(result)
+        return results
+
+    def transform_batch(self, features):
+        """Scales an (n, len(FEATURE_COLUMNS)) feature matrix."""
+        if self.compiled_preprocessor is not None:
+            return self.compiled_preprocessor.transform(features)
+        return self.preprocessor.transform(pd.DataFrame(features, columns=FEATURE_COLUMNS))
+
+    def predict_batch(self, inputs):
+        """
+        Scores many payloads with a single transform/predict_proba call.
+        Returns (results, errors): results has one entry per input row
+        (None for rows that failed validation), errors lists the failures.
+        """
+        try:
+            raw, errors = parse_batch(inputs)
+        except Exception as e:
+            raise CustomException(e, sys)
+        return self.predict_raw(raw, errors)
+
+    def predict_raw(self, raw, errors=None):
+        """Scores an already parsed (n, len(INPUT_FIELDS)) matrix from parse_batch."""
+        try:
+            errors = list(errors or [])
+            results = [None] * raw.shape[0]
+
+            valid = ~np.isnan(raw).any(axis=1)
+            failed = {error['index'] for error in errors}
+            for i in np.flatnonzero(~valid):
+                if i not in failed:
+                    errors.append({'index': int(i), 'message': 'Missing or non-numeric value'})
+            errors.sort(key=lambda error: error['index'])
+
+            if valid.any():
+                with BATCH_FEATURES_STAGE.time():
+                    features = derive_features(raw[valid])
+                with BATCH_TRANSFORM_STAGE.time():
+                    data_scaled = self.transform_batch(features)
+                with BATCH_PREDICT_STAGE.time():
+                    probs = self.predict_proba(data_scaled)[:, 1]
+
+                for i, result in zip(np.flatnonzero(valid), self.score(data_scaled, probs)):
+                    results[i] = result
+
+            return results, errors
         except Exception as e:
             raise CustomException(e, sys)
 
@@ -0,0 +1,114 @@
+import copy
+import time
+import threading
+from collections import OrderedDict
+from src.hea_health_signals.pipelines.prediction_pipeline import INPUT_FIELDS
+
+
+class AnalysisCache:
+    """
+    LRU + TTL cache of complete analyses (risk score, categories, follow-up).
+    Keys are the normalized analyze inputs plus the model version, and the
+    whole cache is dropped as soon as a different model version is seen.
+    """
+    def __init__(self, max_entries=10000, ttl_seconds=300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_version = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(data, model_version):
+        """
+        Normalized 8-field input tuple + model version. Values are converted
+        the same way PredictPipeline.predict converts them, so "31.5", 31.5
+        and 31.50 share an entry. Returns None for inputs predict() would reject.
+        """
+        try:
+            values = tuple(
+                int(data.get(name)) if name == 'high_bp' else float(data.get(name))
+                for name in INPUT_FIELDS
+            )
+        except (TypeError, ValueError):
+            return None
+        return values + (model_version,)
+
+    def _check_version(self, model_version):
+        # Caller holds the lock
+        if model_version != self._model_version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._model_version = model_version
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            self._check_version(key[-1])
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def put(self, key, value):
+        if key is None:
+            return
+        with self._lock:
+            self._check_version(key[-1])
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'model_version': self._model_version,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache(max_entries=10000, ttl_seconds=300.0):
+    """Process-wide analysis cache, created on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnalysisCache(max_entries, ttl_seconds)
+    return _cache
@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+from datetime import datetime
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+from src.hea_health_signals.exception import CustomException
+from src.hea_health_signals.logger import logging
+from src.hea_health_signals.utils.array_store import save_arrays, save_frame, load_arrays, load_frame, read_schema
+from src.hea_health_signals.utils.common import file_sha256
+
+
+@dataclass
+class Stage:
+    """
+    One step of the training DAG.
+    run(inputs, params) receives the outputs of its deps as
+    {dep_name: {output_name: value}} and returns {output_name: DataFrame or
+    ndarray}. Files it writes outside of its outputs (model.pkl, ...) are
+    listed in artifacts so they can be restored from the cache.
+    """
+    name: str
+    run: object
+    deps: tuple = ()
+    params: dict = field(default_factory=dict)
+    code: tuple = ()       # source files that make up the stage's code version
+    data: tuple = ()       # external input files, hashed by content
+    artifacts: tuple = ()
+
+
+@dataclass
+class StageRunnerConfig:
+    cache_dir: str = os.path.join('artifacts', 'stage_cache')
+
+
+class StageRunner:
+    """
+    Runs stages in dependency order and skips any stage whose cache key is
+    unchanged. The key hashes the stage's params, code files, external data
+    and the keys of its deps, so a change only reruns the stages downstream
+    of it. Stage outputs are read back memory-mapped from the cache, and
+    only if a downstream stage actually runs.
+    """
+    def __init__(self, stages, config=None):
+        self.config = config or StageRunnerConfig()
+        self.stages = {}
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on {missing}, which must be listed before it")
+            self.stages[stage.name] = stage
+        self.keys = {}
+        self._outputs = {}
+
+    def _hash_index_path(self):
+        return os.path.join(self.config.cache_dir, 'file_hashes.json')
+
+    def stage_key(self, stage):
+        payload = {
+            'stage': stage.name,
+            'params': stage.params,
+            'code': {os.path.basename(path): file_sha256(path) for path in stage.code},
+            'data': [file_sha256(path, self._hash_index_path()) for path in stage.data],
+            'deps': {dep: self.keys[dep] for dep in stage.deps},
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()[:16]
+
+    def entry_dir(self, stage_name, key):
+        return os.path.join(self.config.cache_dir, stage_name, key)
+
+    def outputs(self, stage_name):
+        """Outputs of an already resolved stage, read from the cache on first use."""
+        if stage_name not in self._outputs:
+            entry = self.entry_dir(stage_name, self.keys[stage_name])
+            with open(os.path.join(entry, 'stage.json')) as f:
+                names = json.load(f)['outputs']
+            loaded = {}
+            for name in names:
+                path = os.path.join(entry, 'outputs', name)
+                if read_schema(path)['metadata'].get('kind') == 'frame':
+                    loaded[name] = load_frame(path, mmap_mode='r')
+                else:
+                    loaded[name] = load_arrays(path, ['data'])['data']
+            self._outputs[stage_name] = loaded
+        return self._outputs[stage_name]
+
+    def _store(self, stage, key, outputs, seconds):
+        entry = self.entry_dir(stage.name, key)
+        if os.path.exists(entry):
+            shutil.rmtree(entry)
+        for name, value in outputs.items():
+            path = os.path.join(entry, 'outputs', name)
+            if isinstance(value, pd.DataFrame):
+                save_frame(path, value, metadata={'kind': 'frame'})
+            else:
+                save_arrays(path, {'data': np.asarray(value)}, metadata={'kind': 'array'})
+
+        artifacts = {}
+        os.makedirs(os.path.join(entry, 'artifacts'), exist_ok=True)
+        for path in stage.artifacts:
+            artifacts[path] = file_sha256(path)
+            shutil.copy2(path, os.path.join(entry, 'artifacts', os.path.basename(path)))
+
+        # Written last: an entry without stage.json is incomplete and never a hit
+        record = {
+            'stage': stage.name,
+            'key': key,
+            'params': stage.params,
+            'outputs': list(outputs),
+            'artifacts': artifacts,
+            'seconds': seconds,
+            'created': datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(os.path.join(entry, 'stage.json'), 'w') as f:
+            json.dump(record, f, indent=2, default=str)
+
+    def _restore_artifacts(self, stage, key):
+        """Puts cached artifact files back if the working copies differ. Returns True if any were copied."""
+        entry = self.entry_dir(stage.name, key)
+        with open(os.path.join(entry, 'stage.json')) as f:
+            recorded = json.load(f)['artifacts']
+        restored = False
+        for path, digest in recorded.items():
+            if os.path.exists(path) and file_sha256(path) == digest:
+                continue
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            shutil.copy2(os.path.join(entry, 'artifacts', os.path.basename(path)), path)
+            restored = True
+        return restored
+
+    def is_cached(self, stage_name, key):
+        return os.path.exists(os.path.join(self.entry_dir(stage_name, key), 'stage.json'))
+
+    def run(self, force=()):
+        """
+        Resolves every stage; force lists stage names to rerun regardless of
+        the cache. Returns one {'stage', 'key', 'status', 'seconds'} per stage,
+        with status 'ran', 'cached' or 'restored' (cached, artifacts copied back).
+        """
+        report = []
+        for stage in self.stages.values():
+            try:
+                started = time.perf_counter()
+                key = self.stage_key(stage)
+                self.keys[stage.name] = key
+
+                if stage.name not in force and self.is_cached(stage.name, key):
+                    status = 'restored' if self._restore_artifacts(stage, key) else 'cached'
+                    logging.info(f"Stage {stage.name} [{key}]: {status}")
+                else:
+                    logging.info(f"Stage {stage.name} [{key}]: running")
+                    inputs = {dep: self.outputs(dep) for dep in stage.deps}
+                    outputs = stage.run(inputs, stage.params) or {}
+                    self._store(stage, key, outputs, time.perf_counter() - started)
+                    # Downstream stages read the stored copy memory-mapped, so the in-RAM
+                    # outputs (e.g. X_train before an external-memory fit) are freed here
+                    del inputs, outputs
+                    self._outputs.pop(stage.name, None)
+                    status = 'ran'
+
+                report.append({
+                    'stage': stage.name,
+                    'key': key,
+                    'status': status,
+                    'seconds': time.perf_counter() - started,
+                })
+            except Exception as e:
+                raise CustomException(e, sys)
+        return report
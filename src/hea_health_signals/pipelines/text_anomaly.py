@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import threading
+from dataclasses import dataclass
+import joblib
+import numpy as np
+from src.hea_health_signals.exception import CustomException
+from src.hea_health_signals.logger import logging
+from src.hea_health_signals.utils.metrics import STAGE_SECONDS
+
+TEXT_VECTORIZE_STAGE = STAGE_SECONDS.labels(stage='text_vectorize')
+TEXT_SCORE_STAGE = STAGE_SECONDS.labels(stage='text_anomaly_score')
+
+
+@dataclass
+class TextAnomalyConfig:
+    vectorizer_path: str = os.path.join('artifacts', 'vectorizer.pkl')
+    model_path: str = os.path.join('artifacts', 'anomaly_model.pkl')
+    # Texts per vectorize/score call
+    batch_size: int = 5000
+
+
+class TextAnomalyScorer:
+    """
+    Scores diary text (HealthLog.raw_text) with the shipped TF-IDF
+    vectorizer and IsolationForest. Both are loaded once; texts are
+    vectorized into one sparse matrix per batch and scored together.
+
+    The score is the IsolationForest anomaly score in (0, 1]: around 0.5
+    for typical entries, closer to 1 for unusual ones. An entry is flagged
+    when the score passes the model's contamination cut-off.
+    """
+    def __init__(self, config=None):
+        self.config = config or TextAnomalyConfig()
+        try:
+            start = time.perf_counter()
+            self.vectorizer = joblib.load(self.config.vectorizer_path)
+            self.model = joblib.load(self.config.model_path)
+            self.load_time = time.perf_counter() - start
+        except Exception as e:
+            raise CustomException(e, sys)
+        # score_samples is the negated anomaly score; predict flags score_samples < offset_
+        self.cutoff = -float(self.model.offset_)
+        logging.info(f"Text anomaly scorer loaded in {self.load_time * 1000:.1f} ms (cut-off {self.cutoff:.3f})")
+
+    def score(self, texts):
+        """
+        Returns (scores, flagged) arrays for a list of texts; None or
+        empty text scores like an empty entry.
+        """
+        try:
+            texts = ['' if text is None else str(text) for text in texts]
+            scores = np.empty(len(texts), dtype=np.float64)
+            batch_size = self.config.batch_size
+            for start in range(0, len(texts), batch_size):
+                batch = texts[start:start + batch_size]
+                with TEXT_VECTORIZE_STAGE.time():
+                    X = self.vectorizer.transform(batch)
+                with TEXT_SCORE_STAGE.time():
+                    scores[start:start + len(batch)] = -self.model.score_samples(X)
+            return scores, scores > self.cutoff
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def get_text_anomaly_scorer():
+    """Process-wide scorer, loaded on first use."""
+    global _scorer
+    if _scorer is None:
+        with _scorer_lock:
+            if _scorer is None:
+                _scorer = TextAnomalyScorer()
+    return _scorer
@@ -1,32 +1,133 @@
 import sys
-from src.hea_health_signals.components.data_ingestion import DataIngestion
-from src.hea_health_signals.components.data_transformation import DataTransformation
-from src.hea_health_signals.components.model_trainer import ModelTrainer
+import argparse
+from src.hea_health_signals.components import (
+    data_ingestion, data_transformation, model_trainer, ingestion_cache, hyperparameter_search, quantized_training,
+    longitudinal_features, model_evaluation, bootstrap_evaluation,
+)
+from src.hea_health_signals.components.bootstrap_evaluation import BootstrapEvaluationConfig, audit_groups
+from src.hea_health_signals.components.model_evaluation import ModelEvaluation
+from src.hea_health_signals.components.hyperparameter_search import HyperparameterSearchConfig
+from src.hea_health_signals.components.data_ingestion import DataIngestion, DataIngestionConfig
+from src.hea_health_signals.components.data_transformation import DataTransformation, DataTransformationConfig
+from src.hea_health_signals.components.model_trainer import ModelTrainer, ModelTrainerConfig
+from src.hea_health_signals.pipelines import cascade_ensemble
+from src.hea_health_signals.pipelines.cascade_ensemble import member_path
+from src.hea_health_signals.pipelines.stage_runner import Stage, StageRunner, StageRunnerConfig
+from src.hea_health_signals.utils import array_store, benchmark, threshold_optimizer
+from src.hea_health_signals.utils.common import read_yaml
+
+PARAMS_PATH = "params.yaml"
+
+
+def build_stages(params, dta_path=None):
+    """
+    The ingestion -> transformation -> trainer -> evaluation DAG. Each stage is keyed on
+    its params.yaml section and its component's source, so e.g. an XGBoost
+    change only reruns ModelTrainer.
+    """
+    dta_path = dta_path or DataIngestion.find_dataset()
+    ingestion_params = params.get('data_ingestion', {})
+    transformation_params = params.get('data_transformation', {})
+    trainer_params = params.get('model_trainer', {})
+    evaluation_params = params.get('model_evaluation', {})
+
+    def ingest(inputs, stage_params):
+        train_df, test_df = DataIngestion(DataIngestionConfig(**stage_params)).initiate_data_ingestion(dta_path)
+        return {'train': train_df, 'test': test_df}
+
+    def transform(inputs, stage_params):
+        config = DataTransformationConfig(**stage_params)
+        X_train, y_train, X_test, y_test, _ = DataTransformation(config).initiate_data_transformation(
+            inputs['data_ingestion']['train'], inputs['data_ingestion']['test']
+        )
+        return {'X_train': X_train, 'y_train': y_train, 'X_test': X_test, 'y_test': y_test}
+
+    def train(inputs, stage_params):
+        arrays = inputs['data_transformation']
+        defaults = ModelTrainerConfig()
+        search = stage_params.get('search') or {}
+        config = ModelTrainerConfig(
+            xgb_params=stage_params.get('xgboost', defaults.xgb_params),
+            threshold_beta=stage_params.get('threshold_beta', defaults.threshold_beta),
+            search=HyperparameterSearchConfig(**search['settings']) if search.get('enabled') else None,
+            training_mode=stage_params.get('training_mode', defaults.training_mode),
+            chunk_rows=stage_params.get('chunk_rows', defaults.chunk_rows),
+            max_bin=stage_params.get('max_bin', defaults.max_bin),
+            ensemble_members=tuple(stage_params.get('ensemble_members', defaults.ensemble_members)),
+            ensemble_band=stage_params.get('ensemble_band', defaults.ensemble_band),
+        )
+        ModelTrainer(config).initiate_model_trainer(arrays['X_train'], arrays['y_train'], arrays['X_test'], arrays['y_test'])
+        return {}
+
+    def evaluate(inputs, stage_params):
+        arrays = inputs['data_transformation']
+        beta = stage_params.get('threshold_beta', 2.0)
+        settings = dict(stage_params.get('bootstrap') or {})
+        settings['age_bins'] = tuple(settings.get('age_bins', BootstrapEvaluationConfig.age_bins))
+        config = BootstrapEvaluationConfig(beta=beta, **settings)
+        groups = audit_groups(inputs['data_ingestion']['test'], config.age_bins)
+        ModelEvaluation(beta=beta, bootstrap=config).initiate_model_evaluation(
+            arrays['X_test'], arrays['y_test'], audit_groups=groups
+        )
+        return {}
+
+    ensemble_members = tuple(trainer_params.get('ensemble_members', ()))
+    # The manifest is always restored with the model, so a cached run without members never serves stale ones
+    ensemble_artifacts = (ModelTrainerConfig.ensemble_manifest_file_path,) + tuple(member_path(name) for name in ensemble_members)
+    if ensemble_members:
+        ensemble_artifacts += (ModelTrainerConfig.ensemble_threshold_file_path,)
+
+    return [
+        Stage(
+            name='data_ingestion', run=ingest, params=ingestion_params,
+            code=(data_ingestion.__file__, longitudinal_features.__file__, ingestion_cache.__file__, array_store.__file__),
+            data=(dta_path,),
+        ),
+        Stage(
+            name='data_transformation', run=transform, deps=('data_ingestion',), params=transformation_params,
+            code=(data_transformation.__file__, array_store.__file__),
+            artifacts=(DataTransformationConfig.preprocessor_obj_file_path,),
+        ),
+        Stage(
+            name='model_trainer', run=train, deps=('data_transformation',), params=trainer_params,
+            code=(
+                model_trainer.__file__, hyperparameter_search.__file__, quantized_training.__file__,
+                threshold_optimizer.__file__, cascade_ensemble.__file__, benchmark.__file__,
+            ),
+            artifacts=(ModelTrainerConfig.trained_model_file_path, ModelTrainerConfig.threshold_file_path) + ensemble_artifacts,
+        ),
+        Stage(
+            name='model_evaluation', run=evaluate, deps=('data_ingestion', 'data_transformation', 'model_trainer'),
+            params=evaluation_params,
+            code=(model_evaluation.__file__, bootstrap_evaluation.__file__, threshold_optimizer.__file__),
+            artifacts=(BootstrapEvaluationConfig.report_path,),
+        ),
+    ]
+
+
+def run_training_pipeline(params_path=PARAMS_PATH, force=(), dta_path=None, cache_dir=None):
+    params = read_yaml(params_path)
+    config = StageRunnerConfig(cache_dir=cache_dir) if cache_dir else StageRunnerConfig()
+    runner = StageRunner(build_stages(params, dta_path), config)
+    return runner.run(force=force)
+
 
 if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Run the training pipeline, skipping stages whose inputs are unchanged.")
+    parser.add_argument('--params', default=PARAMS_PATH)
+    parser.add_argument('--force', nargs='*', default=[], help="Stage names to rerun regardless of the cache.")
+    parser.add_argument('--data', default=None, help="Path to the RAND .dta file (default: search the usual locations).")
+    args = parser.parse_args()
+
     try:
         print("DEBUG: Pipeline started.")
-        
-        # 1. Ingest Data
-        print("DEBUG: Starting Data Ingestion...")
-        obj = DataIngestion()
-        train_path, test_path = obj.initiate_data_ingestion()
-        print(f"DEBUG: Data Ingestion Done.")
-
-        # 2. Transform Data
-        print("DEBUG: Starting Data Transformation...")
-        data_transformation = DataTransformation()
-        train_arr, test_arr, _ = data_transformation.initiate_data_transformation(train_path, test_path)
-        print(f"DEBUG: Data Transformation Done.")
-
-        # 3. Train Model
-        print("DEBUG: Starting Model Trainer...")
-        trainer = ModelTrainer()
-        trainer.initiate_model_trainer(train_arr, test_arr)
-        
+        report = run_training_pipeline(args.params, force=tuple(args.force), dta_path=args.data)
+        for row in report:
+            print(f"DEBUG: {row['stage']:<20} {row['status']:<9} {row['seconds']:8.2f}s  [{row['key']}]")
         print("DEBUG: Training Pipeline Completed Successfully!")
-        
+
     except Exception as e:
         print(f"CRITICAL ERROR: {e}")
         import traceback
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,152 @@
+import json
+import time
+import numpy as np
+
+
+class TreeEnsembleEvaluator:
+    """
+    Array-based evaluator for a trained binary:logistic XGBoost booster.
+    All trees are flattened into parallel NumPy arrays (feature index,
+    threshold, child index, default direction, leaf value) and every row
+    walks every tree at once, one depth level per step, with no DMatrix.
+
+    XGBoost always allocates the two children of a split next to each
+    other (right == left + 1), so a step is nodes = left[nodes] + go_right.
+    Leaves point to themselves and is_leaf masks out their step, which
+    keeps them in place while deeper trees finish their walk (whatever
+    the input, including +inf).
+    """
+    def __init__(self, feature, threshold, left, default_left, value, roots, max_depth, base_margin, n_features, is_leaf):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.base_margin = base_margin
+        self.n_features = n_features
+        self.is_leaf = is_leaf
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_xgboost(cls, model):
+        """Exports the booster of an XGBClassifier (or a raw Booster) into flat arrays."""
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        learner = json.loads(booster.save_raw(raw_format='json'))['learner']
+
+        objective = learner['objective']['name']
+        if objective != 'binary:logistic':
+            raise ValueError(f"Unsupported objective: {objective}")
+        gbm = learner['gradient_booster']
+        if gbm['name'] != 'gbtree':
+            raise ValueError(f"Unsupported booster: {gbm['name']}")
+
+        trees = gbm['model']['trees']
+        # Honour early stopping the same way XGBClassifier.predict_proba does
+        best_iteration = getattr(model, 'best_iteration', None) if hasattr(model, 'get_booster') else None
+        if best_iteration is not None:
+            num_parallel = int(gbm['model']['gbtree_model_param']['num_parallel_tree'])
+            trees = trees[:(best_iteration + 1) * num_parallel]
+
+        feature, threshold, left, default_left, value, roots, leaves = [], [], [], [], [], [], []
+        max_depth, offset = 0, 0
+        for tree in trees:
+            if any(tree['split_type']):
+                raise ValueError("Categorical splits are not supported")
+            lc = np.asarray(tree['left_children'], dtype=np.int64)
+            rc = np.asarray(tree['right_children'], dtype=np.int64)
+            is_leaf = lc == -1
+            if np.any(rc[~is_leaf] != lc[~is_leaf] + 1):
+                raise ValueError("Expected right child to follow left child")
+            node_ids = np.arange(len(lc))
+
+            feature.append(np.where(is_leaf, 0, tree['split_indices']))
+            threshold.append(np.where(is_leaf, np.inf, tree['split_conditions']))
+            left.append(np.where(is_leaf, node_ids, lc) + offset)
+            default_left.append(np.asarray(tree['default_left'], dtype=bool) | is_leaf)
+            # For leaf nodes XGBoost stores the leaf weight in split_conditions
+            value.append(np.where(is_leaf, tree['split_conditions'], 0.0))
+            leaves.append(is_leaf)
+            roots.append(offset)
+
+            depth = np.zeros(len(lc), dtype=np.int64)
+            for node in node_ids:
+                if not is_leaf[node]:
+                    depth[lc[node]] = depth[rc[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+            offset += len(lc)
+
+        base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+        base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+        return cls(
+            feature=np.concatenate(feature).astype(np.intp),
+            threshold=np.concatenate(threshold).astype(np.float32),
+            left=np.concatenate(left).astype(np.intp),
+            default_left=np.concatenate(default_left),
+            value=np.concatenate(value).astype(np.float32),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            base_margin=base_margin,
+            n_features=int(learner['learner_model_param']['num_feature']),
+            is_leaf=np.concatenate(leaves),
+        )
+
+    def predict_margin(self, X):
+        # XGBoost compares float32 feature values against float32 split values
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+
+        flat = X.ravel()
+        row_offsets = (np.arange(X.shape[0]) * self.n_features)[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+        for _ in range(self.max_depth):
+            x = flat[row_offsets + self.feature[nodes]]
+            go_left = (x < self.threshold[nodes]) | (np.isnan(x) & self.default_left[nodes])
+            nodes = self.left[nodes] + (~go_left & ~self.is_leaf[nodes])
+
+        # Accumulate tree by tree in float32, like XGBoost's predictor
+        leaf_sum = np.cumsum(self.value[nodes], axis=1, dtype=np.float32)[:, -1]
+        return leaf_sum.astype(np.float64) + self.base_margin
+
+    def predict_proba(self, X):
+        """Same (n, 2) layout as XGBClassifier.predict_proba."""
+        positive = 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+        return np.column_stack([1.0 - positive, positive])
+
+
+def compare_latency(model, evaluator, X, repeats=200):
+    """
+    Mean latency (microseconds) of XGBClassifier.predict_proba versus the
+    array evaluator, for a single row and for the whole matrix X.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    single = X[:1]
+
+    def mean_us(fn, data, n):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn(data)
+        return (time.perf_counter() - start) / n * 1e6
+
+    batch_repeats = max(1, repeats // 20)
+    report = {
+        'single_row_us': {
+            'xgboost': mean_us(model.predict_proba, single, repeats),
+            'native': mean_us(evaluator.predict_proba, single, repeats),
+        },
+        'batch_rows': int(X.shape[0]),
+        'batch_us': {
+            'xgboost': mean_us(model.predict_proba, X, batch_repeats),
+            'native': mean_us(evaluator.predict_proba, X, batch_repeats),
+        },
+    }
+    report['max_abs_diff'] = float(np.abs(model.predict_proba(X)[:, 1] - evaluator.predict_proba(X)[:, 1]).max())
+    return report
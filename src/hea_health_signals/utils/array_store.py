@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from src.hea_health_signals.exception import CustomException
+
+SCHEMA_FILE = 'schema.json'
+
+
+def save_arrays(directory, arrays, metadata=None):
+    """
+    Writes each array as <name>.npy plus a schema.json sidecar (names,
+    dtypes, shapes and any metadata). The directory is built under a
+    temporary name and renamed into place, so a reader never sees a
+    partially written store.
+    """
+    staging = None
+    try:
+        directory = os.path.abspath(directory)
+        parent = os.path.dirname(directory)
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(directory)}-")
+
+        schema = {'arrays': [], 'created': datetime.now().isoformat(timespec='seconds'), 'metadata': metadata or {}}
+        for name, values in arrays.items():
+            values = np.asarray(values)
+            if values.dtype == object:
+                raise ValueError(f"Array {name} has dtype object; only numeric arrays can be stored")
+            np.save(os.path.join(staging, f"{name}.npy"), values)
+            schema['arrays'].append({'name': name, 'dtype': values.dtype.str, 'shape': list(values.shape)})
+
+        with open(os.path.join(staging, SCHEMA_FILE), 'w') as f:
+            json.dump(schema, f, indent=2)
+
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.replace(staging, directory)
+        return directory
+    except Exception as e:
+        if staging is not None:
+            shutil.rmtree(staging, ignore_errors=True)
+        raise CustomException(e, sys)
+
+
+def read_schema(directory):
+    """Schema sidecar of a store, or None if the directory holds no complete store."""
+    path = os.path.join(directory, SCHEMA_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_arrays(directory, names=None, mmap_mode='r'):
+    """
+    {name: array} for a store written by save_arrays. With the default
+    mmap_mode the arrays are memory-mapped read-only, so nothing is read
+    from disk until it is touched.
+    """
+    schema = read_schema(directory)
+    if schema is None:
+        raise FileNotFoundError(f"No array store at {directory}")
+    stored = [entry['name'] for entry in schema['arrays']]
+    missing = [name for name in (names or []) if name not in stored]
+    if missing:
+        raise KeyError(f"{directory} has no arrays named {missing}")
+    return {
+        name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in (names or stored)
+    }
+
+
+def save_frame(directory, df, metadata=None):
+    """Stores a numeric DataFrame column by column (column order is kept in the schema)."""
+    return save_arrays(directory, {str(name): df[name].to_numpy() for name in df.columns}, metadata)
+
+
+def load_frame(directory, columns=None, mmap_mode=None):
+    """
+    DataFrame from a store written by save_frame. mmap_mode=None reads the
+    columns into memory; 'r' keeps them memory-mapped (read-only).
+    """
+    return pd.DataFrame(load_arrays(directory, columns, mmap_mode), copy=False)
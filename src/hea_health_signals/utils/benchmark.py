@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import http.client
+from urllib.parse import urlparse
+import numpy as np
+
+
+def summarize(samples_s):
+    """Latency summary (milliseconds) for a list of per-call durations in seconds."""
+    samples = np.asarray(samples_s, dtype=np.float64) * 1000
+    if samples.size == 0:
+        return {'n': 0}
+    return {
+        'n': int(samples.size),
+        'min_ms': float(samples.min()),
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'max_ms': float(samples.max()),
+        'ops_per_s': float(1000.0 / samples.mean()) if samples.mean() > 0 else 0.0,
+    }
+
+
+def measure(fn, repeats=200, warmup=10):
+    """Times fn() repeats times after a warmup, pytest-benchmark style."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def run_http_load(url, payloads, clients=8, total_requests=1000, keep_alive=False):
+    """
+    Closed-loop load test: `clients` threads POST JSON payloads to url until
+    total_requests are done. Returns the latency summary, throughput and
+    the count of non-200 responses.
+
+    Each request opens its own connection unless keep_alive is set: on a
+    reused connection a server that writes headers and body separately
+    without TCP_NODELAY (Django's runserver/ThreadedWSGIServer) stalls
+    every response on Nagle + delayed ACK, adding ~40 ms that is not the
+    app's latency.
+    """
+    target = urlparse(url)
+    bodies = [json.dumps(payload).encode() for payload in payloads]
+    latencies = [[] for _ in range(clients)]
+    failures = [0] * clients
+    counter = iter(range(total_requests))
+    counter_lock = threading.Lock()
+
+    def client(slot):
+        connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            body = bodies[i % len(bodies)]
+            start = time.perf_counter()
+            try:
+                connection.request('POST', target.path, body=body, headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+                if not keep_alive or response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                    connection.close()
+            except (OSError, http.client.HTTPException):
+                ok = False
+                connection.close()
+            latencies[slot].append(time.perf_counter() - start)
+            if not ok:
+                failures[slot] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(slot,)) for slot in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    result = summarize([value for slot in latencies for value in slot])
+    result.update({
+        'clients': clients,
+        'requests': total_requests,
+        'errors': sum(failures),
+        'keep_alive': keep_alive,
+        'wall_s': elapsed,
+        'throughput_rps': total_requests / elapsed if elapsed > 0 else 0.0,
+    })
+    return result
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (VmHWM on Linux, ru_maxrss elsewhere)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KB on Linux/BSD
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def reset_peak_rss():
+    """Resets the kernel's peak-RSS counter so the next reading covers only what follows (Linux only)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class ResourceTracker:
+    """
+    Context manager recording wall time and peak RSS of a block:
+    with ResourceTracker() as usage: ...; usage.report() -> {'wall_s', 'peak_rss_mb', ...}.
+    If the peak counter cannot be reset, peak_rss_mb is the process-lifetime peak.
+    """
+    def __enter__(self):
+        self.peak_reset = reset_peak_rss()
+        self.start_rss_mb = peak_rss_mb()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_s = time.perf_counter() - self.start
+        self.end_peak_rss_mb = peak_rss_mb()
+        return False
+
+    def report(self):
+        return {
+            'wall_s': self.wall_s,
+            'peak_rss_mb': self.end_peak_rss_mb,
+            'start_rss_mb': self.start_rss_mb,
+            'peak_is_per_run': self.peak_reset,
+        }
+
+
+def environment_info():
+    import sklearn
+    import xgboost
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'xgboost': xgboost.__version__,
+    }
+
+
+def flatten_latencies(results, prefix=''):
+    """{'a': {'p50_ms': 1}} -> {'a.p50_ms': 1} for every *_ms metric."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_latencies(value, name + '.'))
+        elif key.endswith('_ms') and isinstance(value, (int, float)):
+            flat[name] = float(value)
+    return flat
+
+
+def compare_results(current, baseline, tolerance=0.10, metrics=('p50_ms', 'p95_ms', 'p99_ms', 'mean_ms'), min_delta_ms=0.5):
+    """
+    Latency metrics that got slower than baseline by more than tolerance
+    (fraction) and by more than min_delta_ms in absolute terms, so timer
+    noise on sub-millisecond operations does not fail the gate.
+    Returns a list of {'metric', 'baseline', 'current', 'change'}.
+    """
+    now = flatten_latencies(current.get('results', current))
+    before = flatten_latencies(baseline.get('results', baseline))
+    regressions = []
+    for name, value in sorted(now.items()):
+        if name.rsplit('.', 1)[-1] not in metrics or name not in before or before[name] <= 0:
+            continue
+        change = value / before[name] - 1.0
+        if change > tolerance and value - before[name] > min_delta_ms:
+            regressions.append({'metric': name, 'baseline': before[name], 'current': value, 'change': change})
+    return regressions
@@ -0,0 +1,40 @@
+import os
+import json
+import hashlib
+import yaml
+
+
+def read_yaml(path):
+    """Parsed YAML file; an empty file gives {}."""
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def file_sha256(path, index_path=None):
+    """
+    SHA-256 of a file. With index_path the digest is remembered per
+    (path, size, mtime) in that JSON file and only recomputed when the
+    file changes, which matters for multi-gigabyte inputs.
+    """
+    stat = os.stat(path)
+    path_key = os.path.abspath(path)
+    index = {}
+    if index_path and os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+
+    known = index.get(path_key)
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        return known['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(8 << 20), b''):
+            digest.update(block)
+
+    if index_path:
+        index[path_key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+        os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+        with open(index_path, 'w') as f:
+            json.dump(index, f, indent=2)
+    return digest.hexdigest()
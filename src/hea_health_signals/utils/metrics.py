@@ -0,0 +1,207 @@
+import bisect
+import threading
+import time
+
+# Seconds; spans the ~5 us compiled transform up to slow multi-second batches
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+
+class Timer:
+    """Context manager observing its elapsed wall time into a histogram."""
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram:
+    """
+    Thread-safe fixed-bucket histogram (Prometheus style upper bounds).
+    Observing is a bisect plus three increments under a lock.
+    """
+    def __init__(self, buckets):
+        self.buckets = sorted(float(b) for b in buckets)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self):
+        return Timer(self)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (approximate)."""
+        with self._lock:
+            counts, total = list(self._counts), self._count
+        if total == 0:
+            return 0.0
+        rank, seen = q * total, 0
+        for bound, count in zip(self.buckets + [float('inf')], counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        with self._lock:
+            counts, total, value_sum = list(self._counts), self._count, self._sum
+        cumulative, running = [], 0
+        for bound, count in zip(self.buckets + [float('inf')], counts):
+            running += count
+            cumulative.append((bound, running))
+        return {
+            'count': total,
+            'sum': value_sum,
+            'mean': value_sum / total if total else 0.0,
+            'buckets': cumulative,
+        }
+
+
+class HistogramFamily:
+    """Named histogram with one child Histogram per label combination."""
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, Histogram(self.buckets))
+        return child
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield from histogram_samples(self.name, child, dict(zip(self.labelnames, key)))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+    metric_type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+def histogram_samples(name, histogram, labels=None):
+    """Prometheus _bucket/_sum/_count samples for a Histogram."""
+    labels = labels or {}
+    snapshot = histogram.snapshot()
+    for bound, count in snapshot['buckets']:
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        yield f"{name}_bucket", dict(labels, le=le), count
+    yield f"{name}_sum", labels, snapshot['sum']
+    yield f"{name}_count", labels, snapshot['count']
+
+
+class MetricsRegistry:
+    """
+    Holds metric families plus collector callbacks and renders them in the
+    Prometheus text exposition format. Collectors return a list of
+    (name, type, help, samples) for values owned by other objects.
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        return self._register(HistogramFamily(name, documentation, buckets, labelnames))
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def register_collector(self, collector):
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self):
+        families = [
+            (metric.name, metric.metric_type, metric.documentation, metric.samples())
+            for metric in list(self._metrics.values())
+        ]
+        for collector in list(self._collectors):
+            families.extend(collector())
+
+        lines = []
+        for name, metric_type, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{format_labels(labels)} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+def format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float) and value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+METRICS = MetricsRegistry()
+
+STAGE_SECONDS = METRICS.histogram(
+    'hea_stage_duration_seconds',
+    'Time spent in each stage of the analyze path.',
+    labelnames=('stage',),
+)
@@ -0,0 +1,42 @@
+import math
+
+
+def empty_state():
+    return {'n': 0, 'mean': 0.0, 'm2': 0.0, 'ewma': None, 'last': None}
+
+
+def update(state, value, alpha=0.3):
+    """
+    Adds one observation in O(1): Welford's update for mean and the sum of
+    squared deviations (m2), an exponentially weighted mean, and the last
+    value. Mutates and returns state; None values are ignored.
+    """
+    if value is None:
+        return state
+    value = float(value)
+    n = state['n'] + 1
+    delta = value - state['mean']
+    mean = state['mean'] + delta / n
+    state['m2'] += delta * (value - mean)
+    state['n'], state['mean'] = n, mean
+    state['ewma'] = value if state['ewma'] is None else alpha * value + (1 - alpha) * state['ewma']
+    state['last'] = value
+    return state
+
+
+def variance(state):
+    """Sample variance (ddof=1); None below two observations."""
+    return state['m2'] / (state['n'] - 1) if state['n'] > 1 else None
+
+
+def std(state):
+    var = variance(state)
+    return math.sqrt(var) if var is not None else None
+
+
+def zscore(state, value):
+    """How many baseline standard deviations value is from the running mean."""
+    sd = std(state)
+    if value is None or not sd:
+        return None
+    return (float(value) - state['mean']) / sd
@@ -0,0 +1,109 @@
+import numpy as np
+
+
+def fbeta_curve(y_true, scores, beta=2.0):
+    """
+    Precision, recall and F-beta at every distinct threshold, in one sort.
+
+    Scores are sorted once in descending order; the confusion counts for
+    "predict positive when score >= t" at each distinct score t are then
+    cumulative sums of the sorted labels. Returns a dict of arrays ordered
+    from the highest threshold to the lowest.
+    """
+    y_true = np.asarray(y_true).ravel() == 1
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    if y_true.shape != scores.shape:
+        raise ValueError(f"y_true and scores differ in length: {y_true.shape[0]} vs {scores.shape[0]}")
+    if scores.size == 0:
+        empty = np.empty(0)
+        return {'thresholds': empty, 'precision': empty, 'recall': empty, 'fbeta': empty,
+                'tp': empty.astype(np.int64), 'fp': empty.astype(np.int64), 'positives': 0}
+
+    order = np.argsort(-scores, kind='mergesort')
+    sorted_scores = scores[order]
+    tp = np.cumsum(y_true[order], dtype=np.int64)
+    fp = np.arange(1, scores.size + 1, dtype=np.int64) - tp
+
+    # Last index of each run of equal scores: everything up to it is predicted positive
+    last = np.r_[np.flatnonzero(np.diff(sorted_scores)), scores.size - 1]
+    tp, fp = tp[last], fp[last]
+    positives = int(y_true.sum())
+    fn = positives - tp
+
+    beta2 = beta * beta
+    # F-beta from counts; the denominator is only 0 when tp = fp = fn = 0
+    denominator = (1 + beta2) * tp + beta2 * fn + fp
+    fbeta = np.divide((1 + beta2) * tp, denominator, out=np.zeros(tp.size), where=denominator > 0)
+    precision = tp / (tp + fp)
+    recall = tp / positives if positives else np.zeros(tp.size)
+
+    return {
+        'thresholds': sorted_scores[last],
+        'precision': precision,
+        'recall': recall,
+        'fbeta': fbeta,
+        'tp': tp,
+        'fp': fp,
+        'positives': positives,
+    }
+
+
+def optimal_threshold(y_true, scores, beta=2.0, min_threshold=None, max_threshold=None):
+    """
+    Exact F-beta maximizing threshold for "score >= threshold".
+    Ties go to the highest threshold (fewest flagged). Returns
+    (threshold, fbeta), or (None, 0.0) when no threshold gets any true
+    positive (e.g. a subgroup without positives).
+    """
+    curve = fbeta_curve(y_true, scores, beta)
+    allowed = np.ones(curve['thresholds'].size, dtype=bool)
+    if min_threshold is not None:
+        allowed &= curve['thresholds'] >= min_threshold
+    if max_threshold is not None:
+        allowed &= curve['thresholds'] <= max_threshold
+    fbeta = np.where(allowed, curve['fbeta'], -1.0)
+    if fbeta.size == 0 or fbeta.max() <= 0:
+        return None, 0.0
+    best = int(np.argmax(fbeta))
+    return float(curve['thresholds'][best]), float(curve['fbeta'][best])
+
+
+def fit_group_thresholds(y_true, scores, groups, beta=2.0, min_samples=50, min_positives=5, fallback=None):
+    """
+    Optimal threshold per subgroup (e.g. ragender or age band). Groups that
+    are too small to fit reliably, or have no usable optimum, get the
+    fallback threshold (by default the threshold fitted on all rows).
+    Returns {group: {'threshold', 'fbeta', 'n', 'positives', 'fitted'}}.
+    """
+    y_true = np.asarray(y_true).ravel()
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    groups = np.asarray(groups).ravel()
+    if fallback is None:
+        fallback, _ = optimal_threshold(y_true, scores, beta)
+
+    results = {}
+    for group in np.unique(groups):
+        mask = groups == group
+        n, positives = int(mask.sum()), int((y_true[mask] == 1).sum())
+        threshold, score = None, 0.0
+        if n >= min_samples and positives >= min_positives:
+            threshold, score = optimal_threshold(y_true[mask], scores[mask], beta)
+        fitted = threshold is not None
+        if not fitted:
+            threshold = fallback
+            score = float(fbeta_at(y_true[mask], scores[mask], threshold, beta)) if threshold is not None else 0.0
+        key = group.item() if hasattr(group, 'item') else group
+        results[key] = {'threshold': threshold, 'fbeta': score, 'n': n, 'positives': positives, 'fitted': fitted}
+    return results
+
+
+def fbeta_at(y_true, scores, threshold, beta=2.0):
+    """F-beta of "score >= threshold" (0 when there is nothing to score)."""
+    y_true = np.asarray(y_true).ravel() == 1
+    predicted = np.asarray(scores).ravel() >= threshold
+    tp = int((y_true & predicted).sum())
+    fp = int((~y_true & predicted).sum())
+    fn = int((y_true & ~predicted).sum())
+    beta2 = beta * beta
+    denominator = (1 + beta2) * tp + beta2 * fn + fp
+    return (1 + beta2) * tp / denominator if denominator else 0.0